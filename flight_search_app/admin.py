@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserContact, PaymentAttempt, UserProfile
+from .models import UserContact, PaymentAttempt, UserProfile, Airport, AirportAlias, DailyFare, FareObservation
 
 @admin.register(UserContact)
 class UserContactAdmin(admin.ModelAdmin):
@@ -17,3 +17,27 @@ class PaymentAttemptAdmin(admin.ModelAdmin):
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'country', 'postal_code', 'phone')
     search_fields = ('user__username', 'user__email', 'country')
+
+@admin.register(Airport)
+class AirportAdmin(admin.ModelAdmin):
+    list_display = ('iata_code', 'name', 'city', 'country', 'popularity')
+    search_fields = ('iata_code', 'name', 'city', 'country')
+    list_filter = ('country',)
+
+@admin.register(AirportAlias)
+class AirportAliasAdmin(admin.ModelAdmin):
+    list_display = ('alias', 'iata_code', 'kind')
+    search_fields = ('alias', 'iata_code')
+    list_filter = ('kind',)
+
+@admin.register(DailyFare)
+class DailyFareAdmin(admin.ModelAdmin):
+    list_display = ('origin', 'destination', 'departure_date', 'travel_class', 'adults', 'min_price', 'latest_price', 'currency', 'observations', 'latest_seen_at')
+    search_fields = ('origin', 'destination')
+    list_filter = ('travel_class', 'departure_date')
+
+@admin.register(FareObservation)
+class FareObservationAdmin(admin.ModelAdmin):
+    list_display = ('origin', 'destination', 'departure_date', 'travel_class', 'adults', 'min_price', 'currency', 'offers', 'observed_at')
+    search_fields = ('origin', 'destination')
+    list_filter = ('travel_class', 'observed_at')
@@ -0,0 +1,231 @@
+"""
+Optional SQLite FTS5 backend for the airport autocomplete.
+
+An external-content FTS5 table mirrors Airport's code, name, city and country
+columns; triggers keep it in sync with every insert, update and delete
+(including the bulk upserts of airport_import). Queries match token prefixes
+("lon" -> London, "int" -> International) and are ranked by bm25 combined
+with popularity, so a cold worker answers from SQLite indexes instead of
+building the in-memory AirportIndex or scanning the table with LIKE.
+
+Unlike the in-memory index it does not match inside words: "ondon" finds nothing.
+
+Create or drop the table with `manage.py build_airport_fts`, then set
+AIRPORT_SEARCH_BACKEND = 'fts'.
+"""
+import logging
+import re
+import time
+
+from django.conf import settings
+from django.db import connection, connections
+
+from .airport_index import fold, is_recent
+from .db_router import read_alias
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'flight_search_app_airport_fts'
+AIRPORT_TABLE = 'flight_search_app_airport'
+
+# bm25() is negative (lower is better) and usually within a few units, so a
+# popularity of 100 is worth about as much as a strong name match.
+POPULARITY_WEIGHT = 0.03
+# Column weights for bm25(): iata_code, name, city, country.
+COLUMN_WEIGHTS = '10.0, 2.0, 4.0, 1.0'
+
+CREATE_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        iata_code, name, city, country,
+        content='{AIRPORT_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_ai AFTER INSERT ON {AIRPORT_TABLE} BEGIN
+        INSERT INTO {TABLE}(rowid, iata_code, name, city, country)
+        VALUES (new.id, new.iata_code, new.name, new.city, new.country);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_ad AFTER DELETE ON {AIRPORT_TABLE} BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, iata_code, name, city, country)
+        VALUES ('delete', old.id, old.iata_code, old.name, old.city, old.country);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_au AFTER UPDATE ON {AIRPORT_TABLE} BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, iata_code, name, city, country)
+        VALUES ('delete', old.id, old.iata_code, old.name, old.city, old.country);
+        INSERT INTO {TABLE}(rowid, iata_code, name, city, country)
+        VALUES (new.id, new.iata_code, new.name, new.city, new.country);
+    END""",
+    # Index everything already in the table.
+    f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {TABLE}_au",
+    f"DROP TABLE IF EXISTS {TABLE}",
+]
+
+_SCORE = f"bm25({TABLE}, {COLUMN_WEIGHTS}) - {POPULARITY_WEIGHT} * a.popularity"
+_MATCHES = f"""
+    SELECT a.iata_code, a.name, a.city, a.country, {_SCORE} AS score
+    FROM {TABLE} JOIN {AIRPORT_TABLE} a ON a.id = {TABLE}.rowid
+    WHERE {TABLE} MATCH %s
+"""
+
+_available = None  # (monotonic time, bool), rechecked after AIRPORT_INDEX_TTL
+_warned_missing = False
+
+
+def create():
+    with connection.cursor() as cursor:
+        for sql in CREATE_SQL:
+            cursor.execute(sql)
+    _reset()
+
+
+def drop():
+    with connection.cursor() as cursor:
+        for sql in DROP_SQL:
+            cursor.execute(sql)
+    _reset()
+
+
+def _reset():
+    global _available, _warned_missing
+    _available = None
+    _warned_missing = False
+
+
+def is_available():
+    """
+    True on SQLite when the FTS table has been created. The answer is cached
+    for AIRPORT_INDEX_TTL seconds, so a table built or dropped by another
+    process is noticed like the airport index notices new data.
+    """
+    global _available
+    cached = _available
+    if cached is None or not is_recent(cached[0]):
+        found = connection.vendor == 'sqlite' and TABLE in connection.introspection.table_names()
+        cached = _available = (time.monotonic(), found)
+    return cached[1]
+
+
+def is_enabled():
+    """True when AIRPORT_SEARCH_BACKEND is 'fts' and the table exists."""
+    global _warned_missing
+    if getattr(settings, 'AIRPORT_SEARCH_BACKEND', 'index') != 'fts':
+        return False
+    if not is_available():
+        if not _warned_missing:
+            _warned_missing = True
+            logger.warning("AIRPORT_SEARCH_BACKEND is 'fts' but %s is missing; run build_airport_fts", TABLE)
+        return False
+    _warned_missing = False
+    return True
+
+
+def match_expression(term, columns):
+    """
+    Turns free text into an FTS5 query matching every word as a prefix within
+    `columns`: ('São Pau', ['city']) -> '{city} : ("sao"* AND "pau"*)'.
+    Returns None when the text has no searchable characters.
+    """
+    tokens = re.findall(r'\w+', fold(term))
+    if not tokens:
+        return None
+    words = " AND ".join(f'"{token}"*' for token in tokens)
+    return "{%s} : (%s)" % (" ".join(columns), words)
+
+
+def _fetch(sql, params):
+    with connections[read_alias()].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def search_airports(term, limit=10):
+    query = match_expression(term, ['iata_code', 'name'])
+    if query is None:
+        return []
+    rows = _fetch(f"{_MATCHES} ORDER BY score LIMIT %s", [query, limit])
+    return [{'code': r[0], 'name': r[1], 'city': r[2], 'country': r[3]} for r in rows]
+
+
+def search_cities(term, limit=10):
+    query = match_expression(term, ['city'])
+    if query is None:
+        return []
+    # The best-scoring `limit` cities, then every airport of each, best first.
+    rows = _fetch(f"""
+        WITH m AS ({_MATCHES}),
+        top AS (SELECT city, country, MIN(score) AS best FROM m GROUP BY city, country ORDER BY best LIMIT %s)
+        SELECT m.iata_code, m.name, m.city, m.country FROM m JOIN top USING (city, country)
+        ORDER BY top.best, m.score
+    """, [query, limit])
+    cities_map = {}
+    for code, name, city, country in rows:
+        key = f"{city}, {country}"
+        if key not in cities_map:
+            cities_map[key] = {'name': city, 'country': country, 'bg_name': key, 'airports': []}
+        cities_map[key]['airports'].append({'code': code, 'name': name})
+    return list(cities_map.values())
+
+
+def search_countries(term, limit=10, airports_per_country=10):
+    query = match_expression(term, ['country'])
+    if query is None:
+        return []
+    rows = _fetch(f"""
+        WITH m AS ({_MATCHES}),
+        top AS (SELECT country, MIN(score) AS best FROM m GROUP BY country ORDER BY best LIMIT %s),
+        ranked AS (
+            SELECT m.*, top.best, ROW_NUMBER() OVER (PARTITION BY m.country ORDER BY m.score) AS n
+            FROM m JOIN top USING (country)
+        )
+        SELECT iata_code, name, city, country FROM ranked WHERE n <= %s ORDER BY best, score
+    """, [query, limit, airports_per_country])
+    countries_map = {}
+    for code, name, city, country in rows:
+        countries_map.setdefault(country, {'name': country, 'airports': []})['airports'].append(
+            {'code': code, 'name': name, 'city': city}
+        )
+    return list(countries_map.values())
+
+
+def search(term):
+    """Same payload as AirportIndex.search(), ranked by relevance and popularity."""
+    return {
+        'airports': search_airports(term),
+        'cities': search_cities(term),
+        'countries': search_countries(term),
+    }
+
+
+def search_city_list(term, country='', limit=10):
+    """
+    The /api/search_cities/ payload: one entry per city (with its most popular
+    airport's code) whose name or airport code starts with `term`, optionally
+    limited to countries matching `country`.
+    """
+    parts = [match_expression(term, ['city', 'iata_code']), match_expression(country, ['country'])]
+    query = " AND ".join(p for p in parts if p)
+    if query:
+        rows = _fetch(f"""
+            SELECT iata_code, city, country FROM (
+                SELECT m.*, ROW_NUMBER() OVER (PARTITION BY city, country ORDER BY score) AS n FROM ({_MATCHES}) m
+            ) WHERE n = 1 ORDER BY score LIMIT %s
+        """, [query, limit])
+    elif term or country:
+        rows = []  # nothing searchable, e.g. only punctuation
+    else:
+        rows = _fetch(f"""
+            SELECT iata_code, city, country FROM (
+                SELECT iata_code, city, country, popularity,
+                       ROW_NUMBER() OVER (PARTITION BY city, country ORDER BY popularity DESC) AS n
+                FROM {AIRPORT_TABLE}
+            ) WHERE n = 1 ORDER BY popularity DESC LIMIT %s
+        """, [limit])
+    return [
+        {'city': city, 'country': country, 'code': code, 'name': f"{city}, {country}"}
+        for code, city, country in rows
+    ]
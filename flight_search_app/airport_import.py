@@ -0,0 +1,191 @@
+"""
+Streaming readers for public airport datasets and a batched upsert into Airport.
+
+Supported inputs:
+  * OurAirports airports.csv (header with 'ident', 'municipality', 'iata_code')
+  * OpenFlights airports.dat (no header)
+  * any CSV with iata_code/code, name, city, country[, popularity] columns
+  * JSON (a list of objects) or JSON Lines with the same keys
+
+Readers yield AirportRow tuples one at a time; upsert_airports() diffs them
+against the table and writes only new or changed rows with
+bulk_create(update_conflicts=True), in batches, inside one transaction.
+"""
+import csv
+import itertools
+import json
+import logging
+import re
+from collections import namedtuple
+
+from django.db import transaction
+
+from .airport_index import AIRPORT_FIELDS, AirportRow, invalidate_airport_index
+from .models import Airport
+
+logger = logging.getLogger(__name__)
+
+IATA_RE = re.compile(r'^[A-Z]{3}$')
+
+# OurAirports has no traffic figures; rank by airport type and scheduled service.
+OURAIRPORTS_POPULARITY = {'large_airport': 60, 'medium_airport': 40, 'small_airport': 20}
+OPENFLIGHTS_COLUMNS = ['id', 'name', 'city', 'country', 'iata_code', 'icao', 'latitude', 'longitude',
+                       'altitude', 'timezone', 'dst', 'tz', 'type', 'source']
+
+ImportStats = namedtuple('ImportStats', ['read', 'invalid', 'duplicates', 'created', 'updated', 'unchanged'])
+
+
+def _clip(value, field):
+    value = (value or '').strip()
+    if value == '\\N':  # OpenFlights null
+        value = ''
+    return value[:Airport._meta.get_field(field).max_length]
+
+
+def _popularity(code, value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        logger.warning("Airport %s: popularity %r is not a whole number; importing it as 0", code, value)
+        return 0
+
+
+def _row(code, name, city, country, popularity=0):
+    code = (code or '').strip().upper()
+    if not IATA_RE.match(code):
+        return None
+    name = _clip(name, 'name')
+    return AirportRow(code, name, _clip(city, 'city') or name[:100], _clip(country, 'country'),
+                      _popularity(code, popularity))
+
+
+def detect_format(path, sample):
+    if path.endswith(('.json', '.jsonl', '.ndjson')):
+        return 'json'
+    first = sample.splitlines()[0] if sample else ''
+    if 'ident' in first and 'municipality' in first:
+        return 'ourairports'
+    if 'iata' not in first.lower() and 'code' not in first.lower():
+        return 'openflights'
+    return 'csv'
+
+
+def read_ourairports(lines, countries=None):
+    countries = countries or {}
+    for rec in csv.DictReader(lines):
+        popularity = OURAIRPORTS_POPULARITY.get(rec.get('type'), 0)
+        if rec.get('scheduled_service') == 'yes':
+            popularity += 10
+        country = countries.get(rec.get('iso_country'), rec.get('iso_country'))
+        yield _row(rec.get('iata_code'), rec.get('name'), rec.get('municipality'), country, popularity)
+
+
+def read_openflights(lines):
+    for values in csv.reader(lines):
+        rec = dict(zip(OPENFLIGHTS_COLUMNS, values))
+        yield _row(rec.get('iata_code'), rec.get('name'), rec.get('city'), rec.get('country'))
+
+
+def _from_mapping(rec):
+    return _row(
+        rec.get('iata_code') or rec.get('code'),
+        rec.get('name'),
+        rec.get('city'),
+        rec.get('country'),
+        rec.get('popularity') or rec.get('pop') or 0,
+    )
+
+
+def read_csv(lines):
+    for rec in csv.DictReader(lines):
+        yield _from_mapping(rec)
+
+
+def read_json(lines):
+    """A top-level JSON array is loaded whole; JSON Lines are parsed one line at a time."""
+    for line in lines:
+        if not line.strip():
+            continue
+        if line.lstrip().startswith('['):
+            records = json.loads(line + lines.read())
+        else:
+            records = itertools.chain([json.loads(line)], (json.loads(rest) for rest in lines if rest.strip()))
+        for rec in records:
+            yield _from_mapping(rec)
+        return
+
+
+def read_countries(path):
+    """OurAirports countries.csv -> {'PK': 'Pakistan', ...}"""
+    with open(path, newline='', encoding='utf-8') as f:
+        return {rec['code']: rec['name'] for rec in csv.DictReader(f)}
+
+
+def read_airports(path, fmt='auto', countries=None):
+    """Yields AirportRow (or None for rows without a valid IATA code) from a dataset file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'auto':
+            fmt = detect_format(path, f.read(4096))
+            f.seek(0)
+        if fmt == 'ourairports':
+            yield from read_ourairports(f, countries)
+        elif fmt == 'openflights':
+            yield from read_openflights(f)
+        elif fmt == 'json':
+            yield from read_json(f)
+        else:
+            yield from read_csv(f)
+
+
+def upsert_airports(rows, batch_size=2000, update_popularity=True, dry_run=False):
+    """
+    Inserts new airports and updates changed ones; unchanged rows are not written.
+    With update_popularity=False existing rows keep their popularity (useful when
+    it was curated by hand and the dataset only has a rough ranking).
+    Returns ImportStats. The airport index is invalidated when anything changed.
+    """
+    existing = {row[0].upper(): AirportRow(*row) for row in Airport.objects.values_list(*AIRPORT_FIELDS).iterator()}
+    update_fields = ['name', 'city', 'country'] + (['popularity'] if update_popularity else [])
+    seen = set()
+    read = invalid = duplicates = created = updated = unchanged = 0
+    batch = []
+
+    def flush():
+        if batch and not dry_run:
+            Airport.objects.bulk_create(
+                batch,
+                update_conflicts=True,
+                unique_fields=['iata_code'],
+                update_fields=update_fields,
+            )
+        batch.clear()
+
+    with transaction.atomic():
+        for row in rows:
+            read += 1
+            if row is None:
+                invalid += 1
+                continue
+            if row.iata_code in seen:
+                duplicates += 1
+                continue
+            seen.add(row.iata_code)
+
+            current = existing.get(row.iata_code)
+            if current is not None:
+                if not update_popularity:
+                    row = row._replace(popularity=current.popularity)
+                if row == current:
+                    unchanged += 1
+                    continue
+                updated += 1
+            else:
+                created += 1
+            batch.append(Airport(**row._asdict()))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+    if (created or updated) and not dry_run:
+        invalidate_airport_index()
+    return ImportStats(read, invalid, duplicates, created, updated, unchanged)
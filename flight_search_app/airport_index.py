@@ -0,0 +1,454 @@
+import hashlib
+import itertools
+import logging
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import namedtuple
+from types import MappingProxyType
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .fuzzy import FuzzyIndex
+
+logger = logging.getLogger(__name__)
+
+# Longest substring kept in the posting lists. Longer terms are answered by
+# intersecting their trigrams and checking the candidates directly.
+GRAM_SIZE = 3
+
+# Same attribute names as the Airport model so callers can use either.
+AirportRow = namedtuple('AirportRow', ['iata_code', 'name', 'city', 'country', 'popularity'])
+AIRPORT_FIELDS = AirportRow._fields
+
+
+def normalize(text):
+    """Lower-cases text for index keys and lookups."""
+    return (text or "").strip().lower()
+
+
+def fold(text):
+    """Accent- and case-folds free text for alias lookups: ' São  Paulo ' -> 'sao paulo'."""
+    text = unicodedata.normalize('NFKD', text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return " ".join(re.split(r"[\s\-_.,']+", text)).strip()
+
+
+def dataset_digest(rows, aliases=()):
+    """
+    Short, order-independent fingerprint of the airport rows and aliases. Every
+    worker computes the same value from the same data, so it can serve as a
+    strong ETag without any shared state.
+    """
+    digest = hashlib.sha1()
+    for row in sorted(tuple(row) for row in rows):
+        digest.update(repr(row).encode())
+    digest.update(b"\x00")
+    for alias in sorted(tuple(alias) for alias in aliases):
+        digest.update(repr(alias).encode())
+    return digest.hexdigest()[:16]
+
+
+def _grams(text):
+    """Returns every distinct substring of text up to GRAM_SIZE characters."""
+    grams = set()
+    for size in range(1, GRAM_SIZE + 1):
+        for start in range(len(text) - size + 1):
+            grams.add(text[start:start + size])
+    return grams
+
+
+class _GramIndex:
+    """
+    Maps every short substring of a field to the airports containing it.
+    Posting lists are stored in the order the results are served in, so a
+    lookup only has to walk candidates until it has enough matches.
+    """
+
+    def __init__(self, keys, order):
+        postings = {}
+        for idx in order:
+            for gram in _grams(keys[idx]):
+                postings.setdefault(gram, array('I')).append(idx)
+        self.keys = keys
+        self.postings = postings
+
+    def candidates(self, term):
+        if len(term) <= GRAM_SIZE:
+            return self.postings.get(term, ())
+        # Walk the rarest trigram's postings and verify the full term.
+        lists = [self.postings.get(term[i:i + GRAM_SIZE], ()) for i in range(len(term) - GRAM_SIZE + 1)]
+        shortest = min(lists, key=len)
+        keys = self.keys
+        return (idx for idx in shortest if term in keys[idx])
+
+
+class AirportIndex:
+    """
+    Process-local substring index over Airport code, name, city and country.
+    Answers the three autocomplete groups of search_airports without touching the database.
+    """
+
+    def __init__(self, rows, aliases=()):
+        # rows: iterable of (iata_code, name, city, country, popularity)
+        # aliases: iterable of (folded alias, iata_code) from AirportAlias
+        self.airports = [AirportRow(*row) for row in rows]
+        self.by_code = {a[0].upper(): a for a in self.airports}
+        self.by_city = {}
+        for a in sorted(self.airports, key=lambda a: -a.popularity):
+            self.by_city.setdefault(fold(a.city), []).append(a)
+        # Read-only: the index is shared by every thread of the process.
+        self.aliases = MappingProxyType({alias: code.upper() for alias, code in aliases})
+
+        n = len(self.airports)
+        code_name = [normalize(a[0]) + "\x00" + normalize(a[1]) for a in self.airports]
+        by_popularity = sorted(range(n), key=lambda i: -self.airports[i][4])
+        self.code_name_index = _GramIndex(code_name, by_popularity)
+
+        # Cities and countries are indexed as groups of airports, so a lookup
+        # touches at most `limit` groups however many airports they hold.
+        # Mirror the ORDER BY clauses of the original queries (binary collation).
+        by_city = sorted(range(n), key=lambda i: (self.airports[i][2], -self.airports[i][4]))
+        by_country = sorted(range(n), key=lambda i: (self.airports[i][3], -self.airports[i][4]))
+        self.city_groups = self._group(by_city, lambda a: (a[2], a[3]))
+        self.country_groups = self._group(by_country, lambda a: a[3])
+        self.city_index = _GramIndex([normalize(key[0]) for key, _ in self.city_groups], range(len(self.city_groups)))
+        self.country_index = _GramIndex([normalize(key) for key, _ in self.country_groups], range(len(self.country_groups)))
+        self._fuzzy = None
+        self.version = dataset_digest(self.airports, self.aliases.items())
+        self.built_at = time.monotonic()
+
+    def _group(self, order, key):
+        """[(group key, array of airport indices)] in order of each group's first airport."""
+        groups = {}
+        for idx in order:
+            groups.setdefault(key(self.airports[idx]), array('I')).append(idx)
+        return list(groups.items())
+
+    @classmethod
+    def from_db(cls):
+        from .models import Airport, AirportAlias
+        return cls(
+            Airport.objects.values_list(*AIRPORT_FIELDS).iterator(),
+            AirportAlias.objects.values_list('alias', 'iata_code'),
+        )
+
+    def is_known(self, code):
+        """True if `code` is an airport in the table (or the table is still empty)."""
+        return not self.by_code or code in self.by_code
+
+    def resolve(self, location, wait_for_fuzzy=True):
+        """
+        Converts user input to a validated IATA code, or None. Accepts a code
+        ("khi"), an alias ("uae", "Bombay", "São Paulo") or a city name served
+        by an airport in the table (most popular airport wins), falling back
+        to the closest city, airport name or alias within one typo ("karachy").
+        The typo fallback waits for the FuzzyIndex (see ensure_fuzzy) unless
+        wait_for_fuzzy is False, in which case it finds nothing until the
+        index is ready.
+        """
+        key = fold(location)
+        if not key:
+            return None
+        if len(key) == 3 and key.isalpha() and key.upper() in self.by_code:
+            return key.upper()
+        code = self.aliases.get(key)
+        if code is None:
+            city = self.by_city.get(key)
+            code = city[0].iata_code.upper() if city else None
+        if code is None and len(key) == 3 and key.isalpha():
+            code = key.upper()
+        if code is None:
+            if wait_for_fuzzy:
+                self.ensure_fuzzy()
+            matches = self.fuzzy_airports(key, limit=1)
+            code = matches[0].iata_code.upper() if matches else None
+        return code if code and self.is_known(code) else None
+
+    @property
+    def fuzzy(self):
+        """
+        FuzzyIndex over folded city names, airport names and aliases, or None
+        while it is being built (see start_fuzzy_build).
+        """
+        return self._fuzzy
+
+    def build_fuzzy(self):
+        """Builds the FuzzyIndex in the calling thread and returns it; a few seconds at 80k airports."""
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyIndex(self._fuzzy_entries())
+        return self._fuzzy
+
+    def ensure_fuzzy(self):
+        """
+        Returns the FuzzyIndex, reusing the last build or building it in the
+        calling thread. A build already running elsewhere is waited for
+        rather than repeated.
+        """
+        global _fuzzy_source
+        if self._fuzzy is not None:
+            return self._fuzzy
+        with _fuzzy_build_lock:
+            if not self._reuse_fuzzy():
+                _fuzzy_source = (self.airports, self.aliases, self.build_fuzzy())
+        return self._fuzzy
+
+    def start_fuzzy_build(self):
+        """
+        Makes the FuzzyIndex available without holding up a request: taken over
+        from the last build when the airports and aliases are unchanged (TTL
+        rebuilds, saves that changed nothing), otherwise built on a background
+        thread. Until then only callers that need a typo match wait for it.
+        """
+        if not self._reuse_fuzzy():
+            threading.Thread(target=self._build_fuzzy_in_background, name='airport-fuzzy', daemon=True).start()
+
+    def _reuse_fuzzy(self):
+        source = _fuzzy_source
+        # Term ids point into self.airports, so the rows must match in order too
+        if source is not None and source[0] == self.airports and source[1] == self.aliases:
+            self._fuzzy = source[2]
+        return self._fuzzy is not None
+
+    def _build_fuzzy_in_background(self):
+        if _index is not self:
+            return  # replaced before the thread started
+        try:
+            self.ensure_fuzzy()
+        except Exception:
+            logger.exception("Building the fuzzy airport index failed")
+
+    def _fuzzy_entries(self):
+        positions = {}
+        for idx, a in enumerate(self.airports):
+            positions.setdefault(a.iata_code.upper(), idx)
+            yield fold(a.city), idx, a.popularity
+            yield fold(a.name), idx, a.popularity
+        for alias, code in self.aliases.items():
+            idx = positions.get(code)
+            if idx is not None:
+                yield alias, idx, self.airports[idx].popularity
+
+    def fuzzy_airports(self, location, limit=10):
+        """
+        Airports whose city, name or alias is within one typo of `location`
+        ("karachy", "frankfort"), best match first. Empty while the FuzzyIndex
+        is not built yet.
+        """
+        fuzzy = self._fuzzy
+        if fuzzy is None:
+            return []
+        seen = set()
+        results = []
+        for _, _, tid in fuzzy.search(fold(location), limit):
+            for idx in fuzzy.targets[tid]:
+                if idx not in seen:
+                    seen.add(idx)
+                    results.append(self.airports[idx])
+        return results[:limit]
+
+    def get(self, code):
+        """Returns the AirportRow for a code, or None."""
+        return self.by_code.get((code or "").upper())
+
+    def city_airports(self, location):
+        """
+        Returns every airport serving the city named by `location`, most popular first.
+        `location` may be a city name ("london") or one of the city's IATA codes ("LGW").
+        Cities that share a name across countries resolve to the country of the given
+        code, or of the most popular match.
+        """
+        key = fold(location)
+        row = self.by_code.get(key.upper()) if len(key) == 3 else None
+        candidates = self.by_city.get(fold(row.city) if row else key, [])
+        if not candidates:
+            return []
+        country = row.country if row else candidates[0].country
+        return [a for a in candidates if a.country == country]
+
+    def search_airports(self, term, limit=10):
+        term = normalize(term)
+        results = []
+        for idx in self.code_name_index.candidates(term):
+            a = self.airports[idx]
+            results.append({'code': a[0], 'name': a[1], 'city': a[2], 'country': a[3]})
+            if len(results) >= limit:
+                break
+        return results
+
+    def search_cities(self, term, limit=10):
+        results = []
+        for gid in itertools.islice(self.city_index.candidates(normalize(term)), limit):
+            (city, country), members = self.city_groups[gid]
+            results.append({
+                'name': city,
+                'country': country,
+                'bg_name': f"{city}, {country}",
+                'airports': [{'code': a[0], 'name': a[1]} for a in map(self.airports.__getitem__, members)],
+            })
+        return results
+
+    def search_countries(self, term, limit=10, airports_per_country=10):
+        results = []
+        for gid in itertools.islice(self.country_index.candidates(normalize(term)), limit):
+            country, members = self.country_groups[gid]
+            results.append({
+                'name': country,
+                'airports': [
+                    {'code': a[0], 'name': a[1], 'city': a[2]}
+                    for a in map(self.airports.__getitem__, members[:airports_per_country])
+                ],
+            })
+        return results
+
+    def search(self, term):
+        """
+        Returns the airports/cities/countries payload for the autocomplete API.
+        When nothing contains the term, the airports group lists typo matches
+        instead; there are none until the FuzzyIndex is ready, which is not
+        waited for here (autocomplete.cached_autocomplete keeps such answers
+        out of HTTP caches).
+        """
+        results = {
+            'airports': self.search_airports(term),
+            'cities': self.search_cities(term),
+            'countries': self.search_countries(term),
+        }
+        if not any(results.values()):
+            results['airports'] = [
+                {'code': a[0], 'name': a[1], 'city': a[2], 'country': a[3]}
+                for a in self.fuzzy_airports(term)
+            ]
+        return results
+
+
+_index = None
+_index_lock = threading.Lock()
+_version = None  # (monotonic time, digest) when computed without building the index
+_fuzzy_source = None  # (airports, aliases, FuzzyIndex) of the last fuzzy build
+_fuzzy_build_lock = threading.Lock()
+
+
+def _is_fresh(index):
+    return index is not None and is_recent(index.built_at)
+
+
+def is_recent(built_at):
+    """True while AIRPORT_INDEX_TTL seconds have not passed since the monotonic time `built_at` (a TTL of 0 never expires)."""
+    ttl = getattr(settings, 'AIRPORT_INDEX_TTL', 300)
+    return not ttl or time.monotonic() - built_at < ttl
+
+
+def peek_airport_index():
+    """Returns the shared AirportIndex if it is already built and fresh, without building it."""
+    index = _index
+    return index if _is_fresh(index) else None
+
+
+def get_airport_index():
+    """
+    Returns the shared AirportIndex, building it on first use.
+    The index is rebuilt after invalidate_airport_index() or once
+    AIRPORT_INDEX_TTL seconds have passed (so other worker processes
+    eventually pick up changes made elsewhere).
+    """
+    global _index
+    index = _index
+    if _is_fresh(index):
+        return index
+    with _index_lock:
+        index = _index
+        if not _is_fresh(index):
+            index = AirportIndex.from_db()
+            _index = index
+            index.start_fuzzy_build()
+    return index
+
+
+async def aget_airport_index():
+    """
+    Async twin of get_airport_index() for async views: a warm index is returned
+    directly. A cold one is built by get_airport_index() in a worker thread, so
+    neither the queries nor the CPU-bound build block the event loop, and
+    concurrent cold requests wait on its lock for one shared build.
+    """
+    index = _index
+    if _is_fresh(index):
+        return index
+    return await sync_to_async(get_airport_index)()
+
+
+def dataset_version():
+    """
+    dataset_digest() of the Airport and AirportAlias tables. Taken from the
+    shared index when it is warm; otherwise computed from the database and
+    kept for AIRPORT_INDEX_TTL seconds, like the index itself.
+    """
+    global _version
+    index = peek_airport_index()
+    if index is not None:
+        return index.version
+    cached = _version
+    if cached is not None and is_recent(cached[0]):
+        return cached[1]
+    from .models import Airport, AirportAlias
+    digest = dataset_digest(
+        Airport.objects.values_list(*AIRPORT_FIELDS).iterator(),
+        AirportAlias.objects.values_list('alias', 'iata_code'),
+    )
+    _version = (time.monotonic(), digest)
+    return digest
+
+
+def invalidate_airport_index():
+    """Drops the shared index so the next lookup rebuilds it from the Airport table."""
+    global _index, _version
+    with _index_lock:
+        _index = None
+        _version = None
+
+
+def collect_iata_codes(offers):
+    """Returns every departure/arrival IATA code mentioned in a list of Amadeus flight offers."""
+    codes = set()
+    for offer in offers:
+        for itinerary in offer.get('itineraries', ()):
+            for seg in itinerary.get('segments', ()):
+                codes.add(seg['departure']['iataCode'])
+                codes.add(seg['arrival']['iataCode'])
+    return codes
+
+
+def resolve_airports(codes):
+    """
+    Resolves a batch of IATA codes to AirportRow objects in a single step.
+    Uses the in-memory index when it is warm, otherwise one iata_code__in query.
+    Unknown codes are simply absent from the returned dict.
+    """
+    codes = {c.upper() for c in codes if c}
+    if not codes:
+        return {}
+    index = peek_airport_index()
+    if index is not None:
+        return {code: index.by_code[code] for code in codes if code in index.by_code}
+
+    from .models import Airport
+    rows = Airport.objects.filter(iata_code__in=codes).values_list(*AIRPORT_FIELDS)
+    return {row[0].upper(): AirportRow(*row) for row in rows}
+
+
+async def aresolve_airports(codes):
+    """Async twin of resolve_airports() using the async ORM when the index is cold."""
+    codes = {c.upper() for c in codes if c}
+    if not codes:
+        return {}
+    index = peek_airport_index()
+    if index is not None:
+        return {code: index.by_code[code] for code in codes if code in index.by_code}
+
+    from .models import Airport
+    rows = Airport.objects.filter(iata_code__in=codes).values_list(*AIRPORT_FIELDS)
+    return {row[0].upper(): AirportRow(*row) async for row in rows}
@@ -0,0 +1,279 @@
+"""
+Process-wide Amadeus client.
+
+The SDK's Client fetches an OAuth token lazily and opens a new urllib
+connection for every call. Building one per request therefore paid for a
+token exchange and a TLS handshake on every search. The manager below keeps
+one Client per process, shares a thread-safe token that is refreshed ahead
+of expiry, and sends all traffic through a pooled keep-alive session.
+Because the token is shared, one revoked early would fail every search
+until its expiry, so flight_offers() fetches a new one after a 401.
+Inside `call_budget(seconds)` every HTTP call's timeouts are capped at the
+time left, so one search cannot block for longer than its budget.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.error import URLError
+
+import requests
+from amadeus import Client, ResponseError
+from django.conf import settings
+
+from .timing import stage
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATH = '/v1/security/oauth2/token'
+
+_deadline = ContextVar('amadeus_deadline', default=None)
+
+
+@contextmanager
+def call_budget(seconds):
+    """Caps the Amadeus calls made inside the block (token fetch included) at `seconds` in total."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def budget_left():
+    """Seconds left in the current call_budget(), or None outside one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class Counters:
+    """A few thread-safe integer counters, readable as a dict."""
+
+    def __init__(self, *names):
+        self._lock = threading.Lock()
+        self._values = dict.fromkeys(names, 0)
+
+    def incr(self, name, delta=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + delta
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class _PooledResponse:
+    """Adapts a requests.Response to the urllib-style object the SDK parser reads."""
+
+    def __init__(self, response):
+        self.status = response.status_code
+        self.code = response.status_code
+        self._headers = response.headers
+        self._body = response.content
+
+    def read(self):
+        return self._body
+
+    def getheaders(self):
+        return list(self._headers.items())
+
+
+class PooledHTTP:
+    """
+    Drop-in replacement for the SDK's `http` option (urllib's urlopen).
+    Sends the prepared urllib Request through a requests.Session so TCP/TLS
+    connections are kept alive and reused across calls.
+    """
+
+    def __init__(self, pool_size=10, timeout=(5, 30), counters=None):
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.adapter = adapter
+        self.timeout = timeout
+        self.counters = counters or Counters()
+
+    def __call__(self, http_request):
+        timeout = self.timeout
+        left = budget_left()
+        if left is not None:
+            if left <= 0:
+                raise URLError(TimeoutError("Amadeus call budget exhausted"))
+            timeout = tuple(min(limit, left) for limit in timeout)
+        try:
+            response = self.session.request(
+                http_request.get_method(),
+                http_request.full_url,
+                data=http_request.data,
+                headers=dict(http_request.header_items()),
+                timeout=timeout,
+            )
+        except requests.RequestException as exc:
+            # The SDK turns URLError into a NetworkError response.
+            raise URLError(exc) from exc
+        self.counters.incr('http_requests')
+        return _PooledResponse(response)
+
+    def connections_opened(self):
+        """Total connections opened by the underlying urllib3 pools."""
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+
+class SharedAccessToken:
+    """
+    Thread-safe replacement for the SDK's per-client AccessToken.
+    The token is refreshed by one thread `refresh_margin` seconds before it
+    expires while the others keep using the still-valid current token.
+    """
+
+    # Never hand out a token this close to its expiry.
+    EXPIRY_SKEW = 5
+
+    def __init__(self, client, refresh_margin=60, counters=None):
+        self.client = client
+        self.refresh_margin = refresh_margin
+        self.counters = counters or Counters()
+        self.access_token = None
+        self.expires_at = 0
+        self._lock = threading.Lock()
+
+    def _bearer_token(self):
+        return f'Bearer {self.token()}'
+
+    def token(self):
+        now = time.time()
+        if self.access_token is None or now >= self.expires_at - self.EXPIRY_SKEW:
+            with self._lock:
+                if self.access_token is None or time.time() >= self.expires_at - self.EXPIRY_SKEW:
+                    self._refresh()
+        elif now >= self.expires_at - self.refresh_margin and self._lock.acquire(blocking=False):
+            try:
+                self._refresh()
+            except Exception:
+                # The current token is still valid; try again on the next call.
+                logger.exception("Proactive Amadeus token refresh failed")
+            finally:
+                self._lock.release()
+        return self.access_token
+
+    def _refresh(self):
+        with stage('oauth'):
+            response = self.client._unauthenticated_request('POST', TOKEN_PATH, {
+                'grant_type': 'client_credentials',
+                'client_id': self.client.client_id,
+                'client_secret': self.client.client_secret,
+            })
+        data = response.result
+        self.expires_at = time.time() + data.get('expires_in', 0)
+        self.access_token = data.get('access_token')
+        self.counters.incr('token_refreshes')
+
+    def invalidate(self):
+        with self._lock:
+            self.access_token = None
+            self.expires_at = 0
+
+
+class AmadeusClientManager:
+    """Builds the shared Client on first use and reports its counters."""
+
+    def __init__(self, client_id, client_secret, refresh_margin=60, pool_size=10, timeout=(5, 30), **client_options):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.client_options = client_options
+        self.counters = Counters('token_refreshes', 'http_requests', 'clients_built')
+        self._client = None
+        self._http = None
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        client = self._client
+        if client is None:
+            with self._lock:
+                client = self._client
+                if client is None:
+                    client = self._build_client()
+                    self._client = client
+        return client
+
+    def _build_client(self):
+        self._http = PooledHTTP(self.pool_size, self.timeout, self.counters)
+        client = Client(
+            client_id=self.client_id,
+            client_secret=self.client_secret,
+            http=self._http,
+            **self.client_options
+        )
+        # The SDK memoizes its token on this attribute; share ours instead.
+        client.access_token = SharedAccessToken(client, self.refresh_margin, self.counters)
+        self.counters.incr('clients_built')
+        return client
+
+    def stats(self):
+        """Counters for token refreshes, HTTP requests and pooled connection reuse."""
+        stats = self.counters.as_dict()
+        opened = self._http.connections_opened() if self._http else 0
+        stats['connections_opened'] = opened
+        stats['pool_reuses'] = max(stats['http_requests'] - opened, 0)
+        return stats
+
+
+def _client_options():
+    options = {}
+    if getattr(settings, 'AMADEUS_HOSTNAME', None):
+        options['hostname'] = settings.AMADEUS_HOSTNAME
+    if getattr(settings, 'AMADEUS_HOST', None):
+        # Point the client at another host, e.g. the local fake in fake_amadeus.py
+        options['host'] = settings.AMADEUS_HOST
+        options['ssl'] = getattr(settings, 'AMADEUS_SSL', True)
+        options['port'] = getattr(settings, 'AMADEUS_PORT', 443)
+    return options
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_client_manager():
+    """Returns the process-wide AmadeusClientManager."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = AmadeusClientManager(
+                    os.getenv("AMADEUS_CLIENT_ID"),
+                    os.getenv("AMADEUS_CLIENT_SECRET"),
+                    refresh_margin=getattr(settings, 'AMADEUS_TOKEN_REFRESH_MARGIN', 60),
+                    pool_size=getattr(settings, 'AMADEUS_POOL_SIZE', 10),
+                    timeout=getattr(settings, 'AMADEUS_TIMEOUT', (5, 30)),
+                    **_client_options()
+                )
+    return _manager
+
+
+def get_amadeus_client():
+    """Returns the shared, already-authenticated (or lazily authenticating) Amadeus client."""
+    return get_client_manager().get_client()
+
+
+def flight_offers(api_params):
+    """
+    client.shopping.flight_offers_search.get(**api_params).data on the shared
+    client, retried once with a new token when Amadeus answers 401.
+    """
+    client = get_amadeus_client()
+    for attempt in range(2):
+        try:
+            return client.shopping.flight_offers_search.get(**api_params).data
+        except ResponseError as error:
+            # Token revoked or expired early: fetch a new one once.
+            if attempt or error.response is None or error.response.status_code != 401:
+                raise
+            client.access_token.invalidate()
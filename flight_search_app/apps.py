@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class FlightSearchAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'flight_search_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
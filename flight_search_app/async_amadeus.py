@@ -0,0 +1,172 @@
+"""
+Async Amadeus transport for the ASGI search path.
+
+The SDK is synchronous (urllib), so an async view calling it would still park
+a thread for the whole round-trip. This module talks to the two endpoints the
+search needs (OAuth token and flight-offers) directly with httpx.AsyncClient,
+so one event loop can keep hundreds of searches in flight. Cancelling the
+awaiting task (e.g. when the client disconnects) aborts the upstream request.
+"""
+import asyncio
+import logging
+import os
+import time
+import weakref
+
+import httpx
+from django.conf import settings
+
+from .amadeus_client import TOKEN_PATH, Counters
+from .timing import stage
+
+logger = logging.getLogger(__name__)
+
+FLIGHT_OFFERS_PATH = '/v2/shopping/flight-offers'
+HOSTS = {'test': 'test.api.amadeus.com', 'production': 'api.amadeus.com'}
+
+
+class UpstreamError(Exception):
+    """Non-2xx answer (or network failure) from Amadeus on the async path."""
+
+    def __init__(self, status_code, errors=None):
+        self.status_code = status_code
+        self.errors = errors or []
+        detail = '; '.join(e.get('detail') or e.get('title', '') for e in self.errors)
+        super().__init__(f"[{status_code}] {detail}".strip())
+
+
+class AsyncAccessToken:
+    """
+    Async counterpart of SharedAccessToken: one refresh at a time, started
+    `refresh_margin` seconds before expiry while other tasks keep using the
+    current token.
+    """
+
+    EXPIRY_SKEW = 5
+
+    def __init__(self, transport, refresh_margin=60):
+        self.transport = transport
+        self.refresh_margin = refresh_margin
+        self.access_token = None
+        self.expires_at = 0
+        self._lock = asyncio.Lock()
+        self._refreshing = None
+
+    async def token(self):
+        now = time.time()
+        if self.access_token is None or now >= self.expires_at - self.EXPIRY_SKEW:
+            async with self._lock:
+                if self.access_token is None or time.time() >= self.expires_at - self.EXPIRY_SKEW:
+                    await self._refresh()
+        elif now >= self.expires_at - self.refresh_margin and not self._lock.locked():
+            if self._refreshing is None or self._refreshing.done():
+                self._refreshing = asyncio.create_task(self._refresh_in_background())
+        return self.access_token
+
+    async def _refresh_in_background(self):
+        async with self._lock:
+            try:
+                await self._refresh()
+            except Exception:
+                # The current token is still valid; try again on the next call.
+                logger.exception("Proactive Amadeus token refresh failed")
+
+    async def _refresh(self):
+        data = await self.transport.fetch_token()
+        self.expires_at = time.time() + data.get('expires_in', 0)
+        self.access_token = data.get('access_token')
+        self.transport.counters.incr('token_refreshes')
+
+    def invalidate(self):
+        self.access_token = None
+        self.expires_at = 0
+
+
+class AsyncAmadeusTransport:
+    """Pooled httpx.AsyncClient plus a shared token, bound to one event loop."""
+
+    def __init__(self, base_url, client_id, client_secret, refresh_margin=60, pool_size=100, timeout=(5, 30)):
+        connect, read = timeout
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.counters = Counters('token_refreshes', 'http_requests')
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read, connect=connect),
+        )
+        self.access_token = AsyncAccessToken(self, refresh_margin)
+
+    async def _request(self, method, path, **kwargs):
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError as exc:
+            raise UpstreamError(0, [{'title': f"Network error: {exc}"}]) from exc
+        self.counters.incr('http_requests')
+        if response.status_code >= 400:
+            try:
+                errors = response.json().get('errors', [])
+            except ValueError:
+                errors = []
+            raise UpstreamError(response.status_code, errors)
+        return response.json()
+
+    async def fetch_token(self):
+        with stage('oauth'):
+            return await self._request('POST', TOKEN_PATH, data={
+                'grant_type': 'client_credentials',
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+            })
+
+    async def flight_offers(self, api_params):
+        """Async equivalent of client.shopping.flight_offers_search.get(**api_params).data."""
+        for attempt in range(2):
+            token = await self.access_token.token()
+            try:
+                with stage('upstream'):
+                    body = await self._request(
+                        'GET', FLIGHT_OFFERS_PATH, params=api_params,
+                        headers={'Authorization': f'Bearer {token}'},
+                    )
+                return body.get('data', [])
+            except UpstreamError as error:
+                # Token revoked or expired early: fetch a new one once.
+                if error.status_code != 401 or attempt:
+                    raise
+                self.access_token.invalidate()
+
+    def stats(self):
+        return self.counters.as_dict()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def _base_url():
+    host = getattr(settings, 'AMADEUS_HOST', None)
+    if host:
+        scheme = 'https' if getattr(settings, 'AMADEUS_SSL', True) else 'http'
+        return f"{scheme}://{host}:{getattr(settings, 'AMADEUS_PORT', 443)}"
+    return f"https://{HOSTS.get(getattr(settings, 'AMADEUS_HOSTNAME', 'test'), HOSTS['test'])}"
+
+
+# httpx clients and asyncio locks belong to the loop that created them.
+_transports = weakref.WeakKeyDictionary()
+
+
+def get_async_transport():
+    """Returns the AsyncAmadeusTransport of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    transport = _transports.get(loop)
+    if transport is None:
+        transport = AsyncAmadeusTransport(
+            _base_url(),
+            os.getenv("AMADEUS_CLIENT_ID"),
+            os.getenv("AMADEUS_CLIENT_SECRET"),
+            refresh_margin=getattr(settings, 'AMADEUS_TOKEN_REFRESH_MARGIN', 60),
+            pool_size=getattr(settings, 'AMADEUS_ASYNC_POOL_SIZE', 100),
+            timeout=getattr(settings, 'AMADEUS_TIMEOUT', (5, 30)),
+        )
+        _transports[loop] = transport
+    return transport
@@ -0,0 +1,216 @@
+"""
+Payloads and HTTP caching for the autocomplete APIs.
+
+Responses only change when the airport data does, so each one carries a
+strong ETag derived from the dataset version (see airport_index.dataset_digest)
+plus `Cache-Control: public, max-age`, and a matching If-None-Match is
+answered with 304 before any search runs. The browser and any reverse proxy
+in front of the app absorb repeated keystrokes.
+
+The shortest prefixes are the most frequent and the most expensive to answer
+(they match the most airports), so `manage.py precompute_autocomplete`
+stores the responses for the top N one- and two-character prefixes in a JSON
+file that every worker serves from memory while its dataset version matches.
+
+Typo matches come from the index's FuzzyIndex, which is built in the
+background after startup or an import. Airport answers given before it is
+ready may be missing them, so they are sent with no-store and no ETag
+rather than cached as if they were complete.
+"""
+import json
+import logging
+import os
+import string
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils.cache import add_never_cache_headers, patch_cache_control
+from django.views.decorators.http import etag
+
+from . import airport_fts
+from .airport_index import dataset_version, fold, get_airport_index, normalize
+
+logger = logging.getLogger(__name__)
+
+PREFIX_ALPHABET = string.ascii_lowercase + string.digits
+
+
+def airports_payload(term):
+    if airport_fts.is_enabled():
+        return airport_fts.search(term)
+    # Served from the in-memory index; no database round-trips per keystroke.
+    return get_airport_index().search(term)
+
+
+def cities_payload(term, country_filter=''):
+    if airport_fts.is_enabled():
+        return {'cities': airport_fts.search_city_list(term, country_filter)}
+
+    from .models import Airport
+
+    query = Airport.objects.all()
+
+    if country_filter:
+        query = query.filter(country__icontains=country_filter)
+
+    if term:
+        query = query.filter(Q(city__icontains=term) | Q(iata_code__icontains=term))
+
+    # Read airports most popular first and keep each city's first one, stopping
+    # at ten cities. SQLite still sorts every matching row (there is no
+    # popularity index), but only rows up to the tenth city are fetched.
+    cities = {}
+    rows = query.order_by('-popularity', 'id').values_list('iata_code', 'city', 'country')
+    for code, city, country in rows.iterator(chunk_size=100):
+        if (city, country) not in cities:
+            cities[city, country] = code
+            if len(cities) == 10:
+                break
+
+    return {'cities': [
+        {
+            'city': city,
+            'country': country,
+            'code': code,  # Use the most popular airport's code as a default
+            'name': f"{city}, {country}",
+        }
+        for (city, country), code in cities.items()
+    ]}
+
+
+PAYLOADS = {
+    'search_airports': airports_payload,
+    'search_cities': cities_payload,
+}
+
+
+def current_version():
+    """Dataset version plus the backend answering, since their rankings differ."""
+    backend = 'fts' if airport_fts.is_enabled() else 'index'
+    return f"{backend}-{dataset_version()}"
+
+
+def autocomplete_etag(request, *args, **kwargs):
+    """etag_func for django.views.decorators.http.etag (the decorator adds the quotes)."""
+    return current_version()
+
+
+def typo_matching_ready():
+    """False while the in-memory index answers without its FuzzyIndex (FTS has no typo matching)."""
+    return airport_fts.is_enabled() or get_airport_index().fuzzy is not None
+
+
+def cached_autocomplete(uses_typo_matching=False):
+    """
+    View decorator adding the dataset ETag and `Cache-Control: public,
+    max-age=AUTOCOMPLETE_MAX_AGE`. With uses_typo_matching, responses given
+    while typo matching is not ready get no-store and no ETag instead.
+    """
+    def decorator(view):
+        conditional = etag(autocomplete_etag)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if uses_typo_matching and not typo_matching_ready():
+                response = view(request, *args, **kwargs)
+                add_never_cache_headers(response)
+                return response
+            response = conditional(request, *args, **kwargs)
+            patch_cache_control(response, public=True, max_age=settings.AUTOCOMPLETE_MAX_AGE)
+            return response
+        return wrapper
+    return decorator
+
+
+def top_prefixes(airports, limit):
+    """
+    The `limit` one- and two-character prefixes users are most likely to type:
+    prefixes of the words of airport codes, names and cities, weighted by the
+    popularity of the airports they lead to.
+    """
+    weights = {}
+    for a in airports:
+        words = set(fold(f"{a.iata_code} {a.name} {a.city}").split())
+        prefixes = {word[:size] for word in words for size in (1, 2) if len(word) >= size}
+        for prefix in prefixes:
+            if all(c in PREFIX_ALPHABET for c in prefix):
+                weights[prefix] = weights.get(prefix, 0) + 1 + a.popularity
+    return sorted(weights, key=lambda p: (-weights[p], p))[:limit]
+
+
+def precompute(limit):
+    """Returns the precomputed-responses document for the current dataset."""
+    index = get_airport_index()
+    index.ensure_fuzzy()  # stored answers must include typo matches
+    prefixes = top_prefixes(index.airports, limit)
+    return {
+        'version': current_version(),
+        'responses': {
+            endpoint: {prefix: payload(prefix) for prefix in prefixes}
+            for endpoint, payload in PAYLOADS.items()
+        },
+    }
+
+
+def _path():
+    return getattr(settings, 'AUTOCOMPLETE_PRECOMPUTED_PATH', None)
+
+
+def write_precomputed(document):
+    path = _path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(document, f)
+    os.replace(tmp, path)  # workers never see a half-written file
+    return path
+
+
+_precomputed = None  # (mtime, version, {endpoint: {prefix: bytes}})
+_precomputed_lock = threading.Lock()
+
+
+def _load_precomputed():
+    """Returns the precomputed document, re-reading the file when it changes."""
+    global _precomputed
+    path = _path()
+    try:
+        mtime = os.stat(path).st_mtime if path else None
+    except FileNotFoundError:
+        mtime = None
+    cached = _precomputed
+    if cached is not None and cached[0] == mtime:
+        return cached
+    with _precomputed_lock:
+        cached = _precomputed
+        if cached is None or cached[0] != mtime:
+            version, bodies = None, {}
+            if mtime is not None:
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        document = json.load(f)
+                    version = document['version']
+                    # Serialized once here rather than on every request.
+                    bodies = {
+                        endpoint: {prefix: json.dumps(payload).encode() for prefix, payload in responses.items()}
+                        for endpoint, responses in document['responses'].items()
+                    }
+                except (OSError, ValueError, KeyError):
+                    logger.warning("Ignoring unreadable precomputed autocomplete file %s", path, exc_info=True)
+            cached = _precomputed = (mtime, version, bodies)
+    return cached
+
+
+def precomputed_response(endpoint, term):
+    """The stored response for `term`, or None when it was not precomputed for the current data."""
+    key = normalize(term)
+    if len(key) > 2:
+        return None
+    _, version, bodies = _load_precomputed()
+    body = bodies.get(endpoint, {}).get(key)
+    if body is None or version != current_version():
+        return None
+    return HttpResponse(body, content_type='application/json')
@@ -0,0 +1,155 @@
+"""
+Django cache backends with an LRU bound on the total size of stored values.
+Used for the flight offers cache (see CACHES['offers'] in settings).
+"""
+import os
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+class _SizeBook:
+    """Pickled size of every stored value and their running total."""
+
+    __slots__ = ('sizes', 'total')
+
+    def __init__(self):
+        self.sizes = {}
+        self.total = 0
+
+    def add(self, key, size):
+        self.total += size - self.sizes.get(key, 0)
+        self.sizes[key] = size
+
+    def discard(self, key):
+        self.total -= self.sizes.pop(key, 0)
+
+    def clear(self):
+        self.sizes.clear()
+        self.total = 0
+
+
+# Per-name size bookkeeping, shared like LocMemCache's own module-level stores
+# and, like them, only changed under the cache's lock.
+_size_books = {}
+
+
+class BoundedLocMemCache(LocMemCache):
+    """
+    LocMemCache that also evicts least recently used entries once the pickled
+    values exceed OPTIONS['MAX_BYTES'] (0 disables the byte bound).
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._max_bytes = int(params.get('OPTIONS', {}).get('MAX_BYTES', 0))
+        self._book = _size_books.setdefault(name, _SizeBook())
+
+    @property
+    def total_bytes(self):
+        return self._book.total
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        super()._set(key, value, timeout)
+        self._book.add(key, len(value))
+        if self._max_bytes:
+            # The newest entry sits at the front; evict from the back.
+            while self._book.total > self._max_bytes and len(self._cache) > 1:
+                old_key, _ = self._cache.popitem()
+                del self._expire_info[old_key]
+                self._book.discard(old_key)
+
+    def _cull(self):
+        super()._cull()
+        # Runs once per MAX_ENTRIES / CULL_FREQUENCY sets, so the scan is amortized
+        for key in [key for key in self._book.sizes if key not in self._cache]:
+            self._book.discard(key)
+
+    def _delete(self, key):
+        self._book.discard(key)
+        return super()._delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._book.clear()
+        super().clear()
+
+
+class BoundedFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache that keeps the cache directory under OPTIONS['MAX_BYTES'],
+    removing the least recently read files first. Reads bump the file mtime.
+
+    A set only stats the file it wrote and adds it to running estimates of the
+    directory's size and entry count; FileBasedCache itself lists the directory
+    on every set. The directory is scanned when an estimate crosses MAX_BYTES
+    or MAX_ENTRIES, or every RESCAN_EVERY sets (other processes write to it
+    too), and culled down to CULL_TO of the limits so the next scan is some way off.
+    """
+
+    RESCAN_EVERY = 100
+    CULL_TO = 0.9
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._max_bytes = int(params.get('OPTIONS', {}).get('MAX_BYTES', 0))
+        # Bytes and files in the directory; None until the first scan
+        self._estimate = None
+        self._entries = None
+        self._sets_since_scan = 0
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, default, version)
+        if value is not default:
+            try:
+                os.utime(self._key_to_file(key, version))
+            except FileNotFoundError:
+                pass
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        super().set(key, value, timeout, version)
+        if not self._max_bytes:
+            return
+        fname = self._key_to_file(key, version)
+        self._sets_since_scan += 1
+        if self._estimate is not None and self._sets_since_scan < self.RESCAN_EVERY:
+            try:
+                # Overwrites are counted twice; that only brings the next scan forward
+                self._estimate += os.stat(fname).st_size
+                self._entries += 1
+            except FileNotFoundError:
+                pass
+            if self._estimate <= self._max_bytes and self._entries < self._max_entries:
+                return
+        self._cull_files(keep=fname)
+
+    def _cull(self):
+        # With MAX_BYTES set() bounds the entry count too, on its own schedule
+        if not self._max_bytes:
+            super()._cull()
+
+    def clear(self):
+        super().clear()
+        self._estimate = self._entries = 0
+
+    def _cull_files(self, keep):
+        files = []
+        for fname in self._list_cache_files():
+            try:
+                st = os.stat(fname)
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, fname))
+        total, entries = sum(size for _, size, _ in files), len(files)
+        over = total > self._max_bytes or entries >= self._max_entries
+        max_bytes = self._max_bytes * self.CULL_TO if over else self._max_bytes
+        max_entries = int(self._max_entries * self.CULL_TO) if over else self._max_entries - 1
+        for _, size, fname in sorted(files):
+            if total <= max_bytes and entries <= max_entries:
+                break
+            if fname != keep and self._delete(fname):
+                total -= size
+                entries -= 1
+        self._estimate, self._entries = total, entries
+        self._sets_since_scan = 0
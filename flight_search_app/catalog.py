@@ -0,0 +1,144 @@
+"""
+Static snapshot of the airport catalog for client-side autocomplete.
+
+`manage.py build_airport_catalog` writes the airports, aliases and the
+city/country groups of AirportIndex to a content-hashed JSON bundle (plus
+pre-compressed .gz, and .br when the optional `brotli` package is installed)
+in AIRPORT_CATALOG_DIR, and a small manifest naming the newest bundle.
+The search page embeds the bundle URL while the bundle's dataset version
+matches the database; the browser fetches it once (it never changes under
+the same name, so it can be cached forever) and answers autocomplete
+locally, calling /api/search_airports/ only for queries the bundle cannot
+answer (typos) or once the data has moved on.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.templatetags.static import static
+
+from . import fuzzy
+from .airport_index import dataset_version, get_airport_index
+
+try:
+    import brotli
+except ImportError:  # optional: only .json and .json.gz are written
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+# Older bundles kept next to the newest, for pages rendered just before a rebuild.
+KEEP_BUNDLES = 2
+
+
+def build_catalog(index):
+    """
+    The bundle document. Airports are listed most popular first (the order
+    search_airports serves them in); cities and countries are groups of
+    indices into that list, in AirportIndex's order, so the browser can
+    reproduce the API's results without sorting anything.
+    """
+    order = sorted(range(len(index.airports)), key=lambda i: -index.airports[i].popularity)
+    position = {idx: pos for pos, idx in enumerate(order)}
+    return {
+        'version': index.version,
+        'airports': [list(index.airports[idx][:4]) for idx in order],
+        'cities': [[city, country, [position[i] for i in members]]
+                   for (city, country), members in index.city_groups],
+        'countries': [[country, [position[i] for i in members]] for country, members in index.country_groups],
+        'aliases': dict(index.aliases),
+        # Shorter queries get no typo matches from the API either.
+        'fuzzy_min_length': fuzzy.MIN_LENGTH,
+    }
+
+
+def _directory():
+    return settings.AIRPORT_CATALOG_DIR
+
+
+def write_catalog(index=None):
+    """Writes the bundle for the current data and returns (file name, manifest)."""
+    index = index or get_airport_index()
+    body = json.dumps(build_catalog(index), separators=(',', ':'), ensure_ascii=False).encode()
+    name = f"airports.{hashlib.sha1(body).hexdigest()[:12]}.json"
+    directory = _directory()
+    os.makedirs(directory, exist_ok=True)
+
+    outputs = {name: body, f"{name}.gz": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        outputs[f"{name}.br"] = brotli.compress(body)
+    for file_name, data in outputs.items():
+        _write_atomic(os.path.join(directory, file_name), data)
+
+    manifest = {'file': name, 'version': index.version, 'airports': len(index.airports),
+                'bytes': {file_name: len(data) for file_name, data in outputs.items()}}
+    # The manifest goes last: a worker never points at a bundle that is not fully written.
+    _write_atomic(os.path.join(directory, MANIFEST), json.dumps(manifest).encode())
+    _prune(directory)
+    return name, manifest
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _prune(directory):
+    bundles = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.startswith('airports.') and entry.name.endswith('.json')),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in bundles[KEEP_BUNDLES:]:
+        for suffix in ('', '.gz', '.br'):
+            try:
+                os.remove(entry.path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+_manifest = None  # (mtime, manifest dict or None)
+_manifest_lock = threading.Lock()
+
+
+def _read_manifest():
+    global _manifest
+    path = os.path.join(_directory(), MANIFEST)
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        mtime = None
+    cached = _manifest
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _manifest_lock:
+        manifest = None
+        if mtime is not None:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                logger.warning("Ignoring unreadable airport catalog manifest %s", path, exc_info=True)
+        _manifest = (mtime, manifest)
+    return manifest
+
+
+def catalog_for_page():
+    """
+    {'url': ..., 'version': ...} for the search page, or None when no bundle
+    was built or the airport data has changed since (the page then uses the API).
+    """
+    manifest = _read_manifest()
+    if not manifest or manifest.get('version') != dataset_version():
+        return None
+    return {
+        'url': static(f"{settings.AIRPORT_CATALOG_URL}{manifest['file']}"),
+        'version': manifest['version'],
+    }
@@ -0,0 +1,52 @@
+"""
+Routes the airport lookups to the 'readonly' database alias when it is configured.
+
+DATABASE_PROFILE=production adds 'readonly' next to 'default': the same SQLite
+file, opened by separate connections with PRAGMA query_only. Reads of Airport
+and AirportAlias (autocomplete, the airport index, FTS searches) go there, so
+they never queue behind or hold up a write transaction on 'default'. With WAL
+they always see the last committed data. Writes, including saves and deletes
+of airports loaded from 'readonly', and every other model stay on 'default'.
+Without the alias the router changes nothing.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+READ_ONLY_ALIAS = 'readonly'
+
+READ_ONLY_MODELS = {'airport', 'airportalias'}
+
+
+def read_alias():
+    """The alias airport lookups read from: 'readonly' when configured, else 'default'."""
+    return READ_ONLY_ALIAS if READ_ONLY_ALIAS in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+def _is_read_only_model(model):
+    return model._meta.app_label == 'flight_search_app' and model._meta.model_name in READ_ONLY_MODELS
+
+
+class ReadOnlyRouter:
+    def db_for_read(self, model, **hints):
+        if _is_read_only_model(model):
+            return read_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Without this, an instance read from 'readonly' would be saved back to it
+        if _is_read_only_model(model):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same file
+        aliases = {DEFAULT_DB_ALIAS, READ_ONLY_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The read-only alias is the same file as 'default', which already has the tables
+        if db == READ_ONLY_ALIAS:
+            return False
+        return None
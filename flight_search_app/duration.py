@@ -0,0 +1,38 @@
+"""
+ISO-8601 durations as returned by Amadeus ('PT2H35M', 'P1DT2H', 'PT45S').
+Parsing is memoized: a results page sees the same few dozen values over and over.
+"""
+import re
+from functools import lru_cache
+
+ISO_DURATION = re.compile(
+    r'P(?:(?P<days>\d+)D)?'
+    r'(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?'
+)
+
+
+@lru_cache(maxsize=4096)
+def parse_minutes(iso_duration):
+    """Converts PT1H30M to 90 and P1DT2H to 1560. Returns None for empty or malformed input."""
+    if not iso_duration:
+        return None
+    match = ISO_DURATION.fullmatch(iso_duration)
+    if match is None:
+        return None
+    days, hours, minutes, seconds = match.groups()
+    total = int(days or 0) * 1440 + int(hours or 0) * 60 + int(minutes or 0)
+    if seconds:
+        total += int(float(seconds)) // 60
+    return total
+
+
+def format_minutes(minutes):
+    """Converts 90 to '1 Hrs 30 Min' (days are folded into hours)."""
+    if minutes is None:
+        return ""
+    return f"{minutes // 60} Hrs {minutes % 60} Min"
+
+
+def format_duration(iso_duration):
+    """Converts PT1H30M to '1 Hrs 30 Min'."""
+    return format_minutes(parse_minutes(iso_duration))
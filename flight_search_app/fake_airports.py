@@ -0,0 +1,53 @@
+"""
+Synthetic airport tables for the search benchmarks: deterministic, made-up
+but plausible city names (a letter-pair model of the tz database's cities),
+with codes AAA, AAB, ... and random popularity.
+"""
+import random
+import zoneinfo
+
+from .airport_index import AirportRow
+
+SUFFIXES = ['International', 'Airport', 'Airfield', 'Regional', 'Heliport']
+COUNTRIES = ['Testland', 'Sampleburg', 'Mockovia', 'Benchistan', 'Fakeland', 'Synthia']
+MAX_CODES = 26 ** 3
+
+
+class CityNames:
+    """Callable returning a new made-up city name each time."""
+
+    def __init__(self, rnd):
+        self.rnd = rnd
+        self.model = {}
+        for zone in sorted(zoneinfo.available_timezones()):
+            if '/' not in zone:
+                continue
+            word = '^^' + zone.split('/')[-1].replace('_', ' ').lower() + '$'
+            for i in range(len(word) - 2):
+                self.model.setdefault(word[i:i + 2], []).append(word[i + 2])
+
+    def __call__(self):
+        word = '^^'
+        while True:
+            c = self.rnd.choice(self.model[word[-2:]])
+            if c == '$' or len(word) > 14:
+                return word[2:].title()
+            word += c
+
+
+def code_for(i):
+    """0 -> 'AAA', 1 -> 'AAB', ...; wraps after 26**3."""
+    return f"{chr(65 + i // 676 % 26)}{chr(65 + i // 26 % 26)}{chr(65 + i % 26)}"
+
+
+def make_airports(count, seed=0):
+    """Returns `count` AirportRows; codes repeat beyond MAX_CODES."""
+    rnd = random.Random(seed)
+    city_name = CityNames(rnd)
+    rows = []
+    for i in range(count):
+        city = city_name()
+        rows.append(AirportRow(
+            code_for(i), f"{city} {rnd.choice(SUFFIXES)}", city, rnd.choice(COUNTRIES), rnd.randint(0, 100)
+        ))
+    return rows
@@ -0,0 +1,207 @@
+"""
+A local stand-in for the Amadeus self-service API.
+
+Serves the OAuth token endpoint and /v2/shopping/flight-offers with
+synthetic, deterministic offers so the client, caching and concurrency code
+can be exercised and benchmarked offline. Start it with
+`python manage.py run_fake_amadeus` and point the app at it with
+AMADEUS_HOST=127.0.0.1 AMADEUS_PORT=8765 AMADEUS_SSL=False.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .amadeus_client import budget_left
+
+HUBS = ['DOH', 'DXB', 'IST', 'JED', 'AUH', 'LHE', 'ISB', 'FRA', 'LHR', 'AMS']
+CARRIERS = ['EK', 'QR', 'PK', 'TK', 'EY', 'FZ', 'SV', 'LH', 'BA', 'KL']
+
+
+def make_offers(origin, destination, departure_date, count=10, seed=None):
+    """Returns `count` Amadeus-shaped flight offers, identical for identical arguments."""
+    rnd = random.Random(seed if seed is not None else f"{origin}{destination}{departure_date}")
+    hubs = [h for h in HUBS if h not in (origin, destination)]
+    offers = []
+    for i in range(count):
+        stops = rnd.choice((0, 0, 1, 1, 2))
+        path = [origin] + rnd.sample(hubs, stops) + [destination]
+        carrier = rnd.choice(CARRIERS)
+        minute = rnd.randint(0, 20 * 60)
+        segments = []
+        total = 0
+        for dep, arr in zip(path, path[1:]):
+            flight = rnd.randint(60, 420)
+            layover = rnd.randint(45, 240) if segments else 0
+            minute += layover
+            total += layover + flight
+            segments.append({
+                'departure': {'iataCode': dep, 'at': _at(departure_date, minute)},
+                'arrival': {'iataCode': arr, 'at': _at(departure_date, minute + flight)},
+                'carrierCode': carrier,
+                'number': str(rnd.randint(100, 9999)),
+                'aircraft': {'code': rnd.choice(('77W', '320', '789', '333'))},
+                'duration': f"PT{flight // 60}H{flight % 60}M",
+            })
+            minute += flight
+        price = rnd.uniform(120, 1800) * (1 + 0.15 * stops)
+        offers.append({
+            'type': 'flight-offer',
+            'id': str(i + 1),
+            'itineraries': [{'duration': f"PT{total // 60}H{total % 60}M", 'segments': segments}],
+            'price': {'currency': 'EUR', 'total': f"{price:.2f}", 'base': f"{price * 0.8:.2f}"},
+            'validatingAirlineCodes': [carrier],
+        })
+    return offers
+
+
+def _at(departure_date, minute):
+    return (datetime.fromisoformat(departure_date) + timedelta(minutes=minute)).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+class FakeTransport:
+    """
+    In-process replacement for search.fetch_offers: takes the Amadeus query
+    params and returns offers after a simulated round-trip. Records call
+    count and peak concurrency so fan-out code can be benchmarked offline.
+
+    Faults are injected through `error_rate` (ConnectionError after the
+    latency) and `latency`, which may be changed between calls to simulate an
+    outage. Like PooledHTTP, a call that would outlast the current
+    amadeus_client.call_budget() gives up when the budget runs out and raises
+    TimeoutError.
+    """
+
+    def __init__(self, latency=0.3, jitter=0.0, error_rate=0.0, offers=10, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.offers = offers
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, api_params):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            fail = self.error_rate and self.random.random() < self.error_rate
+        try:
+            left = budget_left()
+            if left is not None and delay > left:
+                time.sleep(max(left, 0))
+                raise TimeoutError("Injected upstream timeout: call budget exhausted")
+            time.sleep(delay)
+            if fail:
+                raise ConnectionError("Injected upstream failure")
+            return make_offers(
+                api_params['originLocationCode'],
+                api_params['destinationLocationCode'],
+                api_params['departureDate'],
+                min(int(api_params.get('max', self.offers)), 250),
+            )
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class FakeAmadeusServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP/1.1 server with knobs for latency, token lifetime and
+    error injection. Counts tokens issued, requests and TCP connections.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0, token_ttl=1799, error_rate=0.0, offers=10):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.token_ttl = token_ttl
+        self.error_rate = error_rate
+        self.offers = offers
+        self.tokens = {}
+        self.stats = {'tokens_issued': 0, 'requests': 0, 'connections': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def issue_token(self):
+        token = uuid.uuid4().hex
+        with self._lock:
+            self.tokens[token] = time.time() + self.token_ttl
+            self.stats['tokens_issued'] += 1
+        return token
+
+    def token_valid(self, token):
+        return self.tokens.get(token, 0) > time.time()
+
+    def start(self):
+        """Serves from a daemon thread and returns self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/vnd.amadeus+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        self.server.count('requests')
+        if urlparse(self.path).path != '/v1/security/oauth2/token':
+            return self._send(404, {'errors': [{'status': 404, 'title': 'NOT FOUND'}]})
+        self._send(200, {
+            'type': 'amadeusOAuth2Token',
+            'access_token': self.server.issue_token(),
+            'token_type': 'Bearer',
+            'expires_in': self.server.token_ttl,
+        })
+
+    def do_GET(self):
+        self.server.count('requests')
+        url = urlparse(self.path)
+        if url.path != '/v2/shopping/flight-offers':
+            return self._send(404, {'errors': [{'status': 404, 'title': 'NOT FOUND'}]})
+        token = (self.headers.get('Authorization') or '').replace('Bearer ', '')
+        if not self.server.token_valid(token):
+            return self._send(401, {'errors': [{'status': 401, 'code': 38192, 'title': 'Invalid access token'}]})
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            self.server.count('errors')
+            return self._send(500, {'errors': [{'status': 500, 'title': 'SYSTEM ERROR HAS OCCURRED'}]})
+
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        count = min(int(params.get('max', self.server.offers)), 250)
+        data = make_offers(params['originLocationCode'], params['destinationLocationCode'], params['departureDate'], count)
+        self._send(200, {'meta': {'count': len(data)}, 'data': data})
@@ -0,0 +1,243 @@
+"""
+Fare history: the cheapest price of every upstream flight-offers answer.
+
+Each answer fetched from Amadeus (searches, flexible-date and city fan-out,
+pre-warming) is reduced to one observation: route, departure date, cabin,
+number of adults, min price, currency and time. observe() only appends it to an in-memory
+queue. A daemon thread writes the queue every FARE_HISTORY_FLUSH_INTERVAL
+seconds (sooner once FARE_HISTORY_BATCH are waiting), one transaction per
+batch: the raw FareObservation rows, plus an upsert of DailyFare,
+which keeps the cheapest and the latest price per route, cabin, party
+size and date. Amadeus prices are totals for all travellers, so fares of
+different party sizes are kept apart rather than compared.
+fare_calendar() answers "cheapest seen per day" from DailyFare alone,
+through its unique index, without calling Amadeus.
+
+Raw observations older than FARE_OBSERVATION_RETENTION_DAYS are deleted
+hourly; DailyFare keeps the summary. Observations still queued when a
+worker is killed are lost; this is price telemetry, not booking data.
+"""
+import atexit
+import logging
+import operator
+import os
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from functools import reduce
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+# Oldest observations are dropped beyond this many if the database falls behind.
+MAX_QUEUED = 10000
+
+
+def summarize(api_params, offers, observed_at=None):
+    """The observation for one upstream answer, or None when it had no priced offers."""
+    prices = [(Decimal(offer['price']['total']), offer['price']['currency']) for offer in offers if offer.get('price')]
+    if not prices:
+        return None
+    min_price, currency = min(prices)
+    return {
+        'origin': api_params['originLocationCode'],
+        'destination': api_params['destinationLocationCode'],
+        'departure_date': date.fromisoformat(api_params['departureDate']),
+        'travel_class': api_params.get('travelClass', 'ECONOMY'),
+        'adults': int(api_params.get('adults', 1)),
+        'min_price': min_price,
+        'currency': currency,
+        'offers': len(offers),
+        'observed_at': observed_at or datetime.now(timezone.utc),
+    }
+
+
+class FareRecorder:
+    """Queues observations and writes them in batches from a background thread."""
+
+    def __init__(self, batch_size=100, flush_interval=5.0, retention_days=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.queue = deque(maxlen=MAX_QUEUED)
+        self._pruned_at = None
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._pid = None
+        self._thread_lock = threading.Lock()
+
+    def observe(self, api_params, offers):
+        observation = summarize(api_params, offers)
+        if observation is None:
+            return
+        self._ensure_thread()
+        self.queue.append(observation)
+        if len(self.queue) >= self.batch_size:
+            self._wake.set()
+
+    def _ensure_thread(self):
+        """Starts the writer thread lazily, and again in a process forked after it started."""
+        if self._pid == os.getpid():
+            return
+        with self._thread_lock:
+            if self._pid != os.getpid():
+                if self._pid is None:
+                    atexit.register(self._flush_quietly)
+                else:
+                    # The parent still writes what it had queued before the fork.
+                    self.queue = deque(maxlen=MAX_QUEUED)
+                    self._wake = threading.Event()
+                    self._flush_lock = threading.Lock()
+                threading.Thread(target=self._run, name='fare-history', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self._flush_quietly()
+                self._prune()
+            finally:
+                # This thread's connection would otherwise stay open between flushes.
+                connections.close_all()
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Writing fare observations failed")
+
+    def flush(self):
+        """Writes everything queued so far; returns the number of observations written."""
+        written = 0
+        with self._flush_lock:
+            while self.queue:
+                batch = []
+                while self.queue and len(batch) < self.batch_size:
+                    batch.append(self.queue.popleft())
+                try:
+                    write_observations(batch)
+                except IntegrityError:
+                    # Another worker created one of the DailyFare rows first; it is updated on retry.
+                    write_observations(batch)
+                written += len(batch)
+        return written
+
+    def _prune(self):
+        if not self.retention_days:
+            return
+        now = time.monotonic()
+        if self._pruned_at is not None and now - self._pruned_at < 3600:
+            return
+        self._pruned_at = now
+        from .models import FareObservation
+        try:
+            FareObservation.objects.filter(
+                observed_at__lt=datetime.now(timezone.utc) - timedelta(days=self.retention_days),
+            ).delete()
+        except Exception:
+            logger.exception("Pruning fare observations failed")
+
+
+def write_observations(batch):
+    """Inserts the observations and folds them into DailyFare, in one transaction."""
+    from .models import DailyFare, FareObservation
+
+    by_key = {}
+    for observation in batch:
+        key = (observation['origin'], observation['destination'], observation['travel_class'],
+               observation['adults'], observation['departure_date'])
+        by_key.setdefault(key, []).append(observation)
+
+    with transaction.atomic():
+        FareObservation.objects.bulk_create([FareObservation(**observation) for observation in batch])
+        # One query for the batch's current rows, each term matched through the unique index
+        match = reduce(operator.or_, (
+            Q(origin=origin, destination=destination, travel_class=travel_class, adults=adults,
+              departure_date=departure_date)
+            for origin, destination, travel_class, adults, departure_date in by_key
+        ))
+        existing = {
+            (row.origin, row.destination, row.travel_class, row.adults, row.departure_date): row
+            for row in DailyFare.objects.filter(match)
+        }
+
+        created, updated = [], []
+        for key, observations in by_key.items():
+            observations.sort(key=lambda o: o['observed_at'])
+            row = existing.get(key)
+            if row is None:
+                first = observations[0]
+                row = DailyFare(
+                    origin=key[0], destination=key[1], travel_class=key[2], adults=key[3], departure_date=key[4],
+                    min_price=first['min_price'], min_seen_at=first['observed_at'], currency=first['currency'],
+                    latest_price=first['min_price'], latest_seen_at=first['observed_at'], observations=0,
+                )
+                created.append(row)
+            else:
+                updated.append(row)
+            for observation in observations:
+                _fold(row, observation)
+
+        DailyFare.objects.bulk_create(created)
+        DailyFare.objects.bulk_update(updated, [
+            'min_price', 'min_seen_at', 'latest_price', 'latest_seen_at', 'currency', 'observations',
+        ])
+
+
+def _fold(row, observation):
+    if observation['currency'] != row.currency:
+        # Prices in another currency are not comparable: start over from this one.
+        row.currency = observation['currency']
+        row.min_price, row.min_seen_at = observation['min_price'], observation['observed_at']
+    elif observation['min_price'] < row.min_price:
+        row.min_price, row.min_seen_at = observation['min_price'], observation['observed_at']
+    if observation['observed_at'] >= row.latest_seen_at:
+        row.latest_price, row.latest_seen_at = observation['min_price'], observation['observed_at']
+    row.observations += 1
+
+
+def fare_calendar(origin, destination, travel_class, adults, start, days):
+    """DailyFare rows for departure dates start .. start + days - 1, in date order."""
+    from .models import DailyFare
+
+    return list(
+        DailyFare.objects.filter(
+            origin=origin, destination=destination, travel_class=travel_class, adults=adults,
+            departure_date__gte=start, departure_date__lt=start + timedelta(days=days),
+        ).order_by('departure_date')
+    )
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_fare_recorder():
+    """Returns the process-wide FareRecorder configured by the FARE_HISTORY_* settings."""
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = FareRecorder(
+                    batch_size=getattr(settings, 'FARE_HISTORY_BATCH', 100),
+                    flush_interval=getattr(settings, 'FARE_HISTORY_FLUSH_INTERVAL', 5.0),
+                    retention_days=getattr(settings, 'FARE_OBSERVATION_RETENTION_DAYS', None),
+                )
+    return _recorder
+
+
+def observe(api_params, offers):
+    """Queues the cheapest price of an upstream answer for the fare history; never raises."""
+    if not getattr(settings, 'FARE_HISTORY', True):
+        return
+    try:
+        get_fare_recorder().observe(api_params, offers)
+    except Exception:
+        logger.warning("Could not record a fare observation", exc_info=True)
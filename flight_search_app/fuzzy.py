@@ -0,0 +1,119 @@
+"""
+Typo-tolerant lookup over airport names, cities and aliases (SymSpell-style).
+
+Two strings within one edit (insert, delete, substitute or swap adjacent
+letters) always share a "delete variant": the string with one character
+removed, or the string itself. At build time every folded term is expanded
+into its delete variants, and their hashes are kept in one sorted array
+(the term id packed into the low bits). A query then needs only
+len(query) + 1 binary searches, each run in C, so lookups stay well under a
+millisecond at 80k airports while the whole index is a few flat arrays.
+
+Candidates are verified with an exact edit check and ranked by similarity
+plus a small popularity bonus, so "lahor" prefers Lahore's main airport
+over a same-named airstrip.
+"""
+from array import array
+from bisect import bisect_left
+
+# Weight of Airport.popularity (0-100) relative to a similarity of 1.0.
+POPULARITY_WEIGHT = 0.1
+# Shorter queries and terms are too ambiguous for fuzzy matching.
+MIN_LENGTH = 4
+
+_ID_BITS = 20
+_ID_MASK = (1 << _ID_BITS) - 1
+_HASH_MASK = (1 << (63 - _ID_BITS)) - 1
+
+
+def delete_variants(term):
+    """The term itself plus every string with one character removed."""
+    variants = {term[:i] + term[i + 1:] for i in range(len(term))}
+    variants.add(term)
+    return variants
+
+
+def edit_distance_at_most_one(a, b):
+    """0 if equal, 1 if one insert/delete/substitution/adjacent swap apart, else None."""
+    if a == b:
+        return 0
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return None
+    i = 0
+    while i < min(la, lb) and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        if a[i + 1:] == b[i + 1:]:
+            return 1
+        # Adjacent transposition: "karahci" / "karachi"
+        if i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]:
+            return 1
+        return None
+    if la > lb:
+        return 1 if a[i + 1:] == b[i:] else None
+    return 1 if a[i:] == b[i + 1:] else None
+
+
+def _key(variant):
+    return (hash(variant) & _HASH_MASK) << _ID_BITS
+
+
+class FuzzyIndex:
+    """
+    `entries` is an iterable of (folded term, airport index, popularity).
+    A term shared by several airports (a city name) lists the most popular
+    one first.
+    """
+
+    def __init__(self, entries):
+        by_term = {}
+        for term, idx, popularity in entries:
+            if len(term) >= MIN_LENGTH:
+                by_term.setdefault(term, []).append((popularity, idx))
+        if len(by_term) > _ID_MASK:
+            raise ValueError(f"FuzzyIndex supports at most {_ID_MASK} distinct terms")
+
+        self.terms = list(by_term)
+        self.targets = []
+        self.popularity = array('H')
+        keys = []
+        for tid, term in enumerate(self.terms):
+            ranked = sorted(by_term[term], reverse=True)
+            self.targets.append(tuple(idx for _, idx in ranked))
+            self.popularity.append(max(0, min(ranked[0][0], 100)))
+            keys.extend(_key(variant) | tid for variant in delete_variants(term))
+        keys.sort()
+        # Hash values are per process, which is fine: the index never leaves it.
+        self.keys = array('q', keys)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def search(self, term, limit=10):
+        """
+        Returns [(score, distance, term id)] best first for terms within one
+        edit of `term`, which must already be folded (see airport_index.fold).
+        """
+        if len(term) < MIN_LENGTH:
+            return []
+        keys = self.keys
+        candidates = set()
+        for variant in delete_variants(term):
+            start = _key(variant)
+            pos = bisect_left(keys, start)
+            end = start | _ID_MASK
+            while pos < len(keys) and keys[pos] <= end:
+                candidates.add(keys[pos] & _ID_MASK)
+                pos += 1
+
+        scored = []
+        for tid in candidates:
+            candidate = self.terms[tid]
+            distance = edit_distance_at_most_one(term, candidate)
+            if distance is None:
+                continue  # shared a delete variant but is two edits away, or a hash collision
+            similarity = 1 - distance / max(len(term), len(candidate))
+            scored.append((similarity + POPULARITY_WEIGHT * self.popularity[tid] / 100, distance, tid))
+        scored.sort(reverse=True)
+        return scored[:limit]
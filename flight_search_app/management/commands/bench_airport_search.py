@@ -0,0 +1,95 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from flight_search_app import airport_fts
+from flight_search_app.airport_import import upsert_airports
+from flight_search_app.airport_index import AirportIndex
+from flight_search_app.fake_airports import MAX_CODES, make_airports
+from flight_search_app.models import Airport
+
+
+def like_search(term):
+    # The icontains queries search_airports used to run per keystroke.
+    airport_qs = Airport.objects.filter(Q(iata_code__icontains=term) | Q(name__icontains=term)).order_by('-popularity')[:10]
+    airports_data = [{'code': a.iata_code, 'name': a.name, 'city': a.city, 'country': a.country} for a in airport_qs]
+
+    cities_map = {}
+    for a in Airport.objects.filter(city__icontains=term).order_by('city', '-popularity'):
+        key = f"{a.city}, {a.country}"
+        if key not in cities_map:
+            cities_map[key] = {'name': a.city, 'country': a.country, 'bg_name': key, 'airports': []}
+        cities_map[key]['airports'].append({'code': a.iata_code, 'name': a.name})
+
+    countries_map = {}
+    for a in Airport.objects.filter(country__icontains=term).order_by('country', '-popularity'):
+        if a.country not in countries_map:
+            countries_map[a.country] = {'name': a.country, 'airports': []}
+        if len(countries_map[a.country]['airports']) < 10:
+            countries_map[a.country]['airports'].append({'code': a.iata_code, 'name': a.name, 'city': a.city})
+
+    return {'airports': airports_data, 'cities': list(cities_map.values())[:10],
+            'countries': list(countries_map.values())[:10]}
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Compares autocomplete latency of the LIKE queries, the FTS5 backend and the in-memory index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--synthetic', type=int, default=15000,
+                            help=f'Synthetic airports added for the run and rolled back afterwards '
+                                 f'(max {MAX_CODES}); 0 benchmarks the table as it is')
+        parser.add_argument('--queries', type=int, default=100, help='Queries per prefix length')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The FTS5 backend needs SQLite')
+        if options['synthetic'] > MAX_CODES:
+            raise CommandError(f'At most {MAX_CODES} synthetic airports (three-letter codes)')
+        had_fts = airport_fts.is_available()
+        try:
+            with transaction.atomic():
+                self._run(options)
+                transaction.set_rollback(True)
+        finally:
+            if not had_fts:
+                airport_fts.drop()
+
+    def _run(self, options):
+        rnd = random.Random(options['seed'])
+        if options['synthetic']:
+            upsert_airports(make_airports(options['synthetic'], options['seed']))
+
+        start = time.perf_counter()
+        airport_fts.create()
+        fts_build = time.perf_counter() - start
+        start = time.perf_counter()
+        index = AirportIndex.from_db()
+        index_build = time.perf_counter() - start
+        self.stdout.write(
+            f"{len(index.airports)} airports; FTS build {fts_build:.2f}s, in-memory index build {index_build:.2f}s"
+        )
+
+        cities = list({a.city.lower() for a in index.airports if len(a.city) >= 4})
+        backends = (('like', like_search), ('fts', airport_fts.search), ('index', index.search))
+        for length in (1, 2, 3, 4):
+            terms = [rnd.choice(cities)[:length] for _ in range(options['queries'])]
+            for name, search in backends:
+                latencies = []
+                for term in terms:
+                    start = time.perf_counter()
+                    search(term)
+                    latencies.append(time.perf_counter() - start)
+                latencies.sort()
+                self.stdout.write(
+                    f"prefix {length}  {name:<6} p50 {_percentile(latencies, 0.5) * 1e3:8.2f}ms  "
+                    f"p99 {_percentile(latencies, 0.99) * 1e3:8.2f}ms"
+                )
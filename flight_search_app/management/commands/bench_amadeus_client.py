@@ -0,0 +1,44 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from flight_search_app.amadeus_client import AmadeusClientManager
+from flight_search_app.fake_amadeus import FakeAmadeusServer
+
+
+class Command(BaseCommand):
+    help = 'Runs flight searches through the shared Amadeus client against a local fake and reports token/pool counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--token-ttl', type=int, default=1799, help='Short values exercise proactive refresh')
+        parser.add_argument('--refresh-margin', type=int, default=60)
+
+    def handle(self, *args, **options):
+        server = FakeAmadeusServer(token_ttl=options['token_ttl']).start()
+        host, port = server.server_address[:2]
+        manager = AmadeusClientManager(
+            'fake-id', 'fake-secret',
+            refresh_margin=options['refresh_margin'],
+            pool_size=options['threads'],
+            host=host, port=port, ssl=False,
+        )
+
+        def search(i):
+            return manager.get_client().shopping.flight_offers_search.get(
+                originLocationCode='KHI', destinationLocationCode='DXB',
+                departureDate='2026-12-01', adults=1, max=10,
+            )
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['threads']) as pool:
+            list(pool.map(search, range(options['requests'])))
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+        server.server_close()
+
+        self.stdout.write(f"{options['requests']} searches in {elapsed:.2f}s ({options['requests'] / elapsed:.0f}/s)")
+        self.stdout.write(f'client: {manager.stats()}')
+        self.stdout.write(f'fake server: {server.stats}')
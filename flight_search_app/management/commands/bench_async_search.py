@@ -0,0 +1,150 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import httpx
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from flight_search_app.fake_amadeus import FakeAmadeusServer
+
+DESTINATIONS = ['DXB', 'DOH', 'IST', 'JED', 'AUH', 'LHR', 'FRA', 'AMS', 'RUH', 'CAI']
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(ThreadingMixIn, WSGIServer):
+    """wsgiref server with a fixed number of worker threads, like a gunicorn/uWSGI worker."""
+
+    request_queue_size = 1024
+    threads = 8
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(self.threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+
+class Command(BaseCommand):
+    help = 'Load-tests /results/ under a thread-pool WSGI server and under uvicorn (ASGI, async view) against a local fake upstream'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=200, help='Simultaneous client connections')
+        parser.add_argument('--latency', type=float, default=1.0, help='Fake upstream seconds per flight-offers call')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads')
+        parser.add_argument('--modes', default='wsgi,asgi')
+        # Internal: run one of the servers (used by the benchmark itself)
+        parser.add_argument('--serve', choices=['wsgi', 'asgi'], help='Serve the app instead of benchmarking')
+        parser.add_argument('--port', type=int, default=8790)
+
+    def handle(self, *args, **options):
+        if options['serve']:
+            return self.serve(options)
+
+        upstream = FakeAmadeusServer(latency=options['latency']).start()
+        host, upstream_port = upstream.server_address[:2]
+        user, _ = User.objects.get_or_create(username='bench')
+        client = Client()
+        client.force_login(user)
+        session = client.cookies['sessionid'].value
+
+        for i, mode in enumerate(options['modes'].split(',')):
+            port = options['port'] + i
+            env = {
+                **os.environ,
+                'AMADEUS_HOST': host, 'AMADEUS_PORT': str(upstream_port), 'AMADEUS_SSL': 'False',
+                'AMADEUS_CLIENT_ID': 'bench', 'AMADEUS_CLIENT_SECRET': 'bench',
+                'ASYNC_SEARCH': str(mode == 'asgi'),
+            }
+            server = subprocess.Popen(
+                [sys.executable, sys.argv[0], 'bench_async_search', '--serve', mode,
+                 '--port', str(port), '--threads', str(options['threads'])],
+                env=env,
+            )
+            try:
+                before = dict(upstream.stats)
+                result = asyncio.run(self.load(port, session, options, offset=i * options['requests']))
+                calls = upstream.stats['requests'] - before['requests']
+            finally:
+                server.terminate()
+                server.wait()
+            label = f"{mode} ({options['threads']} threads)" if mode == 'wsgi' else f'{mode} (1 event loop)'
+            self.stdout.write(
+                f"{label:<20} {result['ok']}/{options['requests']} ok in {result['elapsed']:.2f}s  "
+                f"{result['ok'] / result['elapsed']:.1f} req/s  p50 {result['p50']:.2f}s  p99 {result['p99']:.2f}s  "
+                f"upstream calls {calls}"
+            )
+        upstream.shutdown()
+        upstream.server_close()
+
+    async def load(self, port, session, options, offset=0):
+        base = f'http://127.0.0.1:{port}'
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        async with httpx.AsyncClient(base_url=base, cookies={'sessionid': session}, limits=limits, timeout=120) as http:
+            await self.wait_until_up(http)
+            start_date = date.today() + timedelta(days=7)
+            latencies = []
+            ok = 0
+            semaphore = asyncio.Semaphore(options['concurrency'])
+
+            async def one(i):
+                nonlocal ok
+                # A distinct route/date per request, so the offers cache never answers
+                n = offset + i
+                params = {
+                    'origin': 'KHI', 'destination': DESTINATIONS[n % len(DESTINATIONS)],
+                    'departure_date': (start_date + timedelta(days=n // len(DESTINATIONS))).isoformat(),
+                }
+                async with semaphore:
+                    t0 = time.perf_counter()
+                    response = await http.get('/results/', params=params, headers={'Host': '127.0.0.1'})
+                    latencies.append(time.perf_counter() - t0)
+                    ok += response.status_code == 200
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(options['requests'])))
+            elapsed = time.perf_counter() - t0
+        latencies.sort()
+        return {
+            'ok': ok,
+            'elapsed': elapsed,
+            'p50': latencies[len(latencies) // 2],
+            'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        }
+
+    async def wait_until_up(self, http):
+        for _ in range(100):
+            try:
+                await http.get('/about/', headers={'Host': '127.0.0.1'})
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+        raise RuntimeError('Benchmark server did not start')
+
+    def serve(self, options):
+        from django.conf import settings
+        settings.ALLOWED_HOSTS.append('127.0.0.1')
+        if options['serve'] == 'asgi':
+            try:
+                import uvicorn
+            except ImportError:
+                raise CommandError('The ASGI benchmark needs uvicorn (pip install uvicorn)')
+            uvicorn.run('flight_search_project.asgi:application', port=options['port'], log_level='warning', lifespan='off')
+            return
+        from django.core.wsgi import get_wsgi_application
+        PooledWSGIServer.threads = options['threads']
+        server = make_server('127.0.0.1', options['port'], get_wsgi_application(), PooledWSGIServer, _QuietHandler)
+        server.serve_forever()
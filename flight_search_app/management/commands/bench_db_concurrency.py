@@ -0,0 +1,151 @@
+import json
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections, transaction
+
+from flight_search_app.airport_index import resolve_airports
+from flight_search_app.autocomplete import cities_payload
+from flight_search_app.models import PaymentAttempt, UserContact
+
+TERMS = ['lon', 'kar', 'dub', 'par', 'new', 'lah', 'isl', 'jed', 'ist', 'doh', 'fra', 'ams']
+CODES = [['KHI', 'DXB'], ['LHE', 'JED'], ['ISB', 'DOH'], ['KHI', 'IST', 'LHR'], ['LHE', 'AUH']]
+
+
+def _read(rng):
+    """An autocomplete request, or the airport lookups of a results page."""
+    if rng.random() < 0.5:
+        cities_payload(rng.choice(TERMS))
+    else:
+        resolve_airports(rng.choice(CODES))
+
+
+def _write(rng):
+    """What payment_page writes for one attempt."""
+    with transaction.atomic():
+        user_contact = UserContact.objects.create(
+            name='Bench User', email='bench@example.com', phone='0000000', postal_code='00000', country='Pakistan',
+        )
+        PaymentAttempt.objects.create(
+            user=user_contact, card_holder_name='Bench User', card_last_four='0000', card_type='visa',
+            amount=rng.randint(100, 900), route='KHI-DXB',
+        )
+
+
+def _copy_database(destination, journal_mode):
+    source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+    target = sqlite3.connect(destination)
+    source.backup(target)
+    target.execute(f'PRAGMA journal_mode={journal_mode}')
+    target.close()
+    source.close()
+
+
+def _percentile(values, fraction):
+    return values[int(fraction * (len(values) - 1))] if values else 0
+
+
+class Command(BaseCommand):
+    help = ('Runs worker processes mixing autocomplete/airport reads with payment writes against a copy of the '
+            'database, once per DATABASE_PROFILE, and reports throughput, latency and "database is locked" errors')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='Worker processes (one per web worker)')
+        parser.add_argument('--threads', type=int, default=4, help='Request threads per process')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Share of requests that are payment writes')
+        parser.add_argument('--profiles', default='default,production', help='DATABASE_PROFILE values to compare')
+        # Internal: one worker process of a run
+        parser.add_argument('--worker', action='store_true', help='(internal) run as a worker process')
+        parser.add_argument('--start-at', type=float, default=0, help='(internal) unix time to start the workload')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self._worker(options)
+            return
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError("This benchmark compares SQLite settings; the default database is not SQLite.")
+        for profile in options['profiles'].split(','):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                # The production profile switches the copy to WAL; the default one runs on a rollback journal
+                _copy_database(path, 'WAL' if profile == 'production' else 'DELETE')
+                results = self._run(profile, path, options)
+            self._report(profile, results, options)
+
+    def _run(self, profile, path, options):
+        env = dict(os.environ, DATABASE_PROFILE=profile, DATABASE_PATH=path)
+        start_at = time.time() + 3  # leaves every worker time to start Django
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'bench_db_concurrency', '--worker',
+            '--threads', str(options['threads']), '--seconds', str(options['seconds']),
+            '--write-ratio', str(options['write_ratio']), '--start-at', str(start_at),
+        ]
+        workers = [subprocess.Popen(command, env=env, stdout=subprocess.PIPE) for _ in range(options['processes'])]
+        results = []
+        for worker in workers:
+            output, _ = worker.communicate()
+            if worker.returncode != 0:
+                raise CommandError(f"A {profile} worker process failed (exit code {worker.returncode})")
+            results.append(json.loads(output))
+        return results
+
+    def _worker(self, options):
+        """Runs the workload from --threads threads and prints the results as JSON."""
+        results = {'read': [], 'write': [], 'locked': 0, 'errors': 0}
+        lock = threading.Lock()
+        time.sleep(max(0, options['start_at'] - time.time()))
+        stop_at = time.perf_counter() + options['seconds']
+
+        def request_loop(seed):
+            rng = random.Random(seed)
+            while time.perf_counter() < stop_at:
+                kind = 'write' if rng.random() < options['write_ratio'] else 'read'
+                start = time.perf_counter()
+                try:
+                    _write(rng) if kind == 'write' else _read(rng)
+                except OperationalError as error:
+                    with lock:
+                        results['locked' if 'locked' in str(error) else 'errors'] += 1
+                    continue
+                finally:
+                    # What Django does at the end of every request: closes connections older than CONN_MAX_AGE
+                    close_old_connections()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    results[kind].append(elapsed)
+            connections.close_all()
+
+        threads = [threading.Thread(target=request_loop, args=(os.getpid() * 100 + n,))
+                   for n in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.stdout.write(json.dumps(results))
+
+    def _report(self, profile, results, options):
+        reads = sorted(elapsed for result in results for elapsed in result['read'])
+        writes = sorted(elapsed for result in results for elapsed in result['write'])
+        locked = sum(result['locked'] for result in results)
+        errors = sum(result['errors'] for result in results)
+        requests = len(reads) + len(writes) + locked + errors
+        self.stdout.write(
+            f"{profile} ({options['processes']} processes x {options['threads']} threads, "
+            f"{options['write_ratio']:.0%} writes): {requests / options['seconds']:.0f} requests/s, "
+            f"database is locked {locked}, other errors {errors}"
+        )
+        for kind, latencies in (('reads', reads), ('writes', writes)):
+            self.stdout.write(
+                f"  {kind:<7} {len(latencies):>6}  p50 {statistics.median(latencies) * 1e3 if latencies else 0:>7.2f} ms  "
+                f"p95 {_percentile(latencies, 0.95) * 1e3:>7.2f} ms  p99 {_percentile(latencies, 0.99) * 1e3:>7.2f} ms"
+            )
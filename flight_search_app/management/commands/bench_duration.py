@@ -0,0 +1,61 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from flight_search_app.duration import format_duration, parse_minutes
+from flight_search_app.fake_amadeus import make_offers
+
+
+def _legacy_minutes(iso_duration):
+    # The per-offer parsing search_results used to do inline.
+    import re
+    hours = 0
+    minutes = 0
+    h_match = re.search(r'(\d+)H', iso_duration)
+    if h_match:
+        hours = int(h_match.group(1))
+    m_match = re.search(r'(\d+)M', iso_duration)
+    if m_match:
+        minutes = int(m_match.group(1))
+    return hours * 60 + minutes
+
+
+def _legacy_format(iso_duration):
+    minutes = _legacy_minutes(iso_duration)
+    return f"{minutes // 60} Hrs {minutes % 60} Min"
+
+
+def legacy(offers):
+    for offer in offers:
+        itinerary = offer['itineraries'][0]
+        _legacy_minutes(itinerary['duration'])
+        _legacy_format(itinerary['duration'])
+        for seg in itinerary['segments']:
+            _legacy_format(seg['duration'])
+
+
+def current(offers):
+    for offer in offers:
+        itinerary = offer['itineraries'][0]
+        parse_minutes(itinerary['duration'])
+        format_duration(itinerary['duration'])
+        for seg in itinerary['segments']:
+            format_duration(seg['duration'])
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark of per-offer ISO-8601 duration handling (legacy regex vs duration module)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offers', type=int, default=250)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        offers = make_offers('KHI', 'DXB', '2026-12-01', options['offers'])
+        n = options['repeat']
+        results = {}
+        for name, func in (('legacy', legacy), ('current', current)):
+            seconds = min(timeit.repeat(lambda: func(offers), number=n, repeat=3))
+            results[name] = seconds / (n * len(offers)) * 1e6
+            self.stdout.write(f"{name:<8} {results[name]:.2f} us/offer")
+        self.stdout.write(f"speedup  {results['legacy'] / results['current']:.1f}x  (cache: {parse_minutes.cache_info()})")
@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from flight_search_app.fake_amadeus import FakeTransport
+from flight_search_app.search import build_api_params, flexible_dates, search_flexible_dates
+
+
+class Command(BaseCommand):
+    help = 'Compares sequential and concurrent ±N day fare searches against a fake upstream'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=3)
+        parser.add_argument('--latency', type=float, default=0.4, help='Simulated upstream seconds per call')
+        parser.add_argument('--jitter', type=float, default=0.4, help='Extra random seconds per call')
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--deadline', type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        departure = (date.today() + timedelta(days=30)).isoformat()
+        api_params = build_api_params('KHI', 'DXB', departure, 1, 'Economy')
+        dates = flexible_dates(departure, options['days'])
+
+        transport = FakeTransport(options['latency'], options['jitter'])
+        start = time.perf_counter()
+        for day in dates:
+            transport({**api_params, 'departureDate': day})
+        sequential = time.perf_counter() - start
+        self.stdout.write(f"sequential: {len(dates)} dates in {sequential:.2f}s")
+
+        transport = FakeTransport(options['latency'], options['jitter'])
+        with ThreadPoolExecutor(options['workers']) as executor:
+            start = time.perf_counter()
+            _, calendar = search_flexible_dates(
+                api_params, options['days'], deadline=options['deadline'],
+                fetch=transport, executor=executor,
+            )
+            concurrent = time.perf_counter() - start
+        answered = sum(1 for entry in calendar if entry['status'] == 'ok')
+        self.stdout.write(
+            f"concurrent: {answered}/{len(dates)} dates in {concurrent:.2f}s "
+            f"(peak in flight {transport.peak_in_flight}, deadline {options['deadline']}s, "
+            f"speedup {sequential / concurrent:.1f}x)"
+        )
+        for entry in calendar:
+            price = f"{entry['min_price']:.2f} {entry['currency']}" if entry['min_price'] is not None else '-'
+            marker = ' <- cheapest' if entry['is_cheapest'] else ''
+            self.stdout.write(f"  {entry['date']}  {entry['status']:<7} {price}{marker}")
@@ -0,0 +1,53 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from flight_search_app.airport_index import AirportIndex
+from flight_search_app.fake_airports import make_airports
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def _typo(rnd, word):
+    i = rnd.randrange(len(word))
+    return word[:i] + rnd.choice(LETTERS) + word[i + 1:]
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Builds synthetic airport indexes and reports fuzzy (one-typo) lookup latency p50/p99 against index size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,80000', help='Comma-separated airport counts')
+        parser.add_argument('--queries', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        for size in (int(s) for s in options['sizes'].split(',')):
+            rnd = random.Random(options['seed'])
+            rows = make_airports(size, options['seed'])
+            index = AirportIndex(rows)
+
+            start = time.perf_counter()
+            fuzzy = index.build_fuzzy()
+            build = time.perf_counter() - start
+
+            queries = [_typo(rnd, row.city.lower()) for row in rnd.choices(rows, k=options['queries'])]
+            queries = [q for q in queries if len(q) >= 4]
+            latencies = []
+            hits = 0
+            for query in queries:
+                start = time.perf_counter()
+                hits += bool(index.fuzzy_airports(query))
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+
+            self.stdout.write(
+                f"{size:>7} airports  {len(fuzzy):>7} terms  {len(fuzzy.keys) * 8 / 1e6:6.1f} MB keys  "
+                f"build {build:5.2f}s  p50 {_percentile(latencies, 0.5) * 1e3:.3f}ms  "
+                f"p99 {_percentile(latencies, 0.99) * 1e3:.3f}ms  hit rate {hits / len(queries):.0%}"
+            )
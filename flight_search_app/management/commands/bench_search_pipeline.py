@@ -0,0 +1,252 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from flight_search_app import search, views
+from flight_search_app.airport_index import collect_iata_codes, invalidate_airport_index, resolve_airports
+from flight_search_app.offer_set import OfferSet, OfferFilters, clear_offer_sets, offers_fingerprint
+from flight_search_app.replay import ReplayTransport, load_fixture, record_fixture, synthetic_fixture
+
+DEFAULT_FIXTURES = settings.BASE_DIR / 'flight_search_app' / 'replay_fixtures'
+STAGES = ('resolve', 'fetch', 'airports', 'parse', 'sort', 'page', 'render', 'view')
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class _Pipeline:
+    """The steps of views.search_results, run one stage at a time against a replayed response."""
+
+    def __init__(self, query, transport):
+        self.transport = transport
+        self.request = RequestFactory().get('/results/', query)
+        self.request.user = User(username='bench')  # authenticated, never saved
+        self.request._messages = CookieStorage(self.request)
+        self.search, error = views._search_input(self.request)
+        if error:
+            raise CommandError(f"{query}: {error}")
+
+    def run(self, measure):
+        """Runs every stage once; `measure(stage)` is a context manager wrapped around each."""
+        s = self.search
+        with measure('resolve'):
+            origin, _ = search.resolve_location(s['raw_origin'])
+            destination, _ = search.resolve_location(s['raw_destination'])
+        api_params = search.build_api_params(origin, destination, s['departure_date'], s['adults'], s['flight_class'])
+        with measure('fetch'):
+            offers = self.transport(api_params)
+        with measure('airports'):
+            airports = resolve_airports(collect_iata_codes(offers))
+        with measure('parse'):
+            flights = search.parse_offers(offers, origin, destination, s['adults'], s['flight_class'], airports)
+        with measure('sort'):
+            offer_set = OfferSet(flights, offers_fingerprint(offers))
+        with measure('page'):
+            page = offer_set.query(OfferFilters(), s['sort_by'], None, settings.RESULTS_PAGE_SIZE)
+        with measure('render'):
+            context = views._results_context(self.request, s, origin, destination, page, [], {})
+            render_to_string('flight_search_app/results.html', context, self.request)
+        # The whole view as routed, with the parsed offer set cache cold
+        clear_offer_sets()
+        original, search.fetch_offers = search.fetch_offers, self.transport
+        try:
+            with measure('view'):
+                views.search_results(self.request)
+        finally:
+            search.fetch_offers = original
+
+
+class Command(BaseCommand):
+    help = ('Replays recorded Amadeus responses through the search_results pipeline and reports '
+            'per-stage timings, query counts and allocations as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offers', default='10,100,250', help='Comma-separated offer counts')
+        parser.add_argument('--route', default='KHI-DXB')
+        parser.add_argument('--date', help='Departure date (default: 30 days from today)')
+        parser.add_argument('--sort', default='cheapest', help='sort_by passed to the results page')
+        parser.add_argument('--runs', type=int, default=20, help='Timed runs per offer count')
+        parser.add_argument('--fixtures', default=str(DEFAULT_FIXTURES), help='Directory of recorded responses')
+        parser.add_argument('--record', action='store_true',
+                            help='Record fixtures from the live Amadeus API first (needs credentials)')
+        parser.add_argument('--cold-index', action='store_true',
+                            help='Drop the airport index before every run so resolution includes loading it')
+        parser.add_argument('--output', help='Write the JSON report to this file (default: stdout)')
+        parser.add_argument('--compare', help='Earlier JSON report to compare median timings against')
+        parser.add_argument('--threshold', type=float, default=0.10,
+                            help='Relative slowdown reported as a regression (default 0.10 = 10%%)')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        origin, destination = options['route'].upper().split('-')
+        departure = options['date'] or (date.today() + timedelta(days=30)).isoformat()
+        counts = [int(n) for n in options['offers'].split(',')]
+
+        results = []
+        sources = {}
+        for count in counts:
+            api_params = search.build_api_params(origin, destination, departure, 1, 'Economy', max_offers=count)
+            if options['record']:
+                record_fixture(options['fixtures'], api_params)
+            fixture = load_fixture(options['fixtures'], api_params) or synthetic_fixture(api_params)
+            sources[count] = fixture['source']
+            pipeline = _Pipeline(
+                {'origin': origin, 'destination': destination, 'departure_date': departure,
+                 'sort_by': options['sort']},
+                ReplayTransport([fixture]),
+            )
+            # The view asks upstream for SEARCH_MAX_OFFERS offers
+            with override_settings(SEARCH_MAX_OFFERS=count):
+                results.extend(self._measure(pipeline, count, len(fixture['result']['data']), options))
+
+        report = {
+            'meta': {
+                'commit': _git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'route': options['route'].upper(),
+                'departure_date': departure,
+                'sort': options['sort'],
+                'runs': options['runs'],
+                'cold_index': options['cold_index'],
+                'fixture_sources': sources,
+            },
+            'results': results,
+        }
+        document = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(document + '\n')
+            self._print_table(results)
+        else:
+            self.stdout.write(document)
+
+        if options['compare']:
+            regressions = self._compare(options['compare'], results, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{regressions} stage(s) slower than the baseline by more than "
+                                   f"{options['threshold']:.0%}")
+
+    def _measure(self, pipeline, count, returned, options):
+        def reset():
+            if options['cold_index']:
+                invalidate_airport_index()
+
+        pipeline.run(self._noop)  # warm imports, templates and the airport index
+
+        timings = {stage: [] for stage in STAGES}
+        for _ in range(options['runs']):
+            reset()
+            pipeline.run(self._timer(timings))
+
+        queries = {}
+        reset()
+        pipeline.run(self._query_counter(queries))
+
+        allocations = {}
+        reset()
+        tracemalloc.start()
+        try:
+            pipeline.run(self._allocation_tracker(allocations))
+        finally:
+            tracemalloc.stop()
+
+        return [
+            {
+                'offers': count,
+                'returned': returned,
+                'stage': stage,
+                'min_ms': round(min(timings[stage]) * 1e3, 4),
+                'median_ms': round(statistics.median(timings[stage]) * 1e3, 4),
+                'p95_ms': round(sorted(timings[stage])[int(0.95 * (len(timings[stage]) - 1))] * 1e3, 4),
+                'queries': queries[stage],
+                'alloc_peak_kb': round(allocations[stage] / 1024, 1),
+            }
+            for stage in STAGES
+        ]
+
+    @staticmethod
+    @contextmanager
+    def _noop(stage):
+        yield
+
+    @staticmethod
+    def _timer(timings):
+        @contextmanager
+        def measure(stage):
+            start = time.perf_counter()
+            yield
+            timings[stage].append(time.perf_counter() - start)
+        return measure
+
+    @staticmethod
+    def _query_counter(queries):
+        @contextmanager
+        def measure(stage):
+            with CaptureQueriesContext(connection) as captured:
+                yield
+            queries[stage] = len(captured.captured_queries)
+        return measure
+
+    @staticmethod
+    def _allocation_tracker(allocations):
+        @contextmanager
+        def measure(stage):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            yield
+            _, peak = tracemalloc.get_traced_memory()
+            allocations[stage] = peak - baseline
+        return measure
+
+    def _print_table(self, results):
+        self.stdout.write(f"{'offers':>6} {'stage':<9} {'median ms':>10} {'p95 ms':>9} {'queries':>7} {'alloc KiB':>9}")
+        for row in results:
+            self.stdout.write(
+                f"{row['offers']:>6} {row['stage']:<9} {row['median_ms']:>10.3f} {row['p95_ms']:>9.3f} "
+                f"{row['queries']:>7} {row['alloc_peak_kb']:>9.1f}"
+            )
+
+    def _compare(self, path, results, threshold):
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        before = {(row['offers'], row['stage']): row for row in baseline['results']}
+        regressions = 0
+        self.stderr.write(f"Compared with {baseline['meta'].get('commit') or path}:")
+        for row in results:
+            old = before.get((row['offers'], row['stage']))
+            if not old or not old['median_ms']:
+                continue
+            change = row['median_ms'] / old['median_ms'] - 1
+            flag = ''
+            if change > threshold:
+                regressions += 1
+                flag = '  REGRESSION'
+            self.stderr.write(
+                f"  {row['offers']:>4} offers {row['stage']:<9} {old['median_ms']:>9.3f} -> {row['median_ms']:>9.3f} ms "
+                f"({change:+.0%})  queries {old['queries']} -> {row['queries']}{flag}"
+            )
+        return regressions
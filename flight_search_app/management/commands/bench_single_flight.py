@@ -0,0 +1,83 @@
+import multiprocessing
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from flight_search_app.cache_backends import BoundedFileBasedCache, BoundedLocMemCache
+from flight_search_app.fake_amadeus import FakeTransport
+from flight_search_app.offer_cache import OfferCache
+from flight_search_app.search import build_api_params
+from flight_search_app.single_flight import SingleFlight
+
+API_PARAMS = build_api_params('KHI', 'DXB', '2026-12-01', 1, 'Economy', max_offers=10)
+
+
+def _burst(offer_cache, transport, threads):
+    """Fires `threads` identical searches at once; returns elapsed seconds."""
+    barrier = threading.Barrier(threads)
+
+    def search():
+        barrier.wait()
+        offer_cache.get_or_fetch(API_PARAMS, lambda: transport(API_PARAMS))
+
+    workers = [threading.Thread(target=search) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def _worker_process(args):
+    cache_dir, lock_dir, threads, latency, start_at = args
+    offer_cache = OfferCache(
+        BoundedFileBasedCache(cache_dir, {}),
+        single_flight=SingleFlight(),
+        lock_dir=lock_dir,
+    )
+    transport = FakeTransport(latency)
+    # Line the processes up so their bursts overlap
+    time.sleep(max(0, start_at - time.time()))
+    _burst(offer_cache, transport, threads)
+    return transport.calls, offer_cache.stats()
+
+
+class Command(BaseCommand):
+    help = 'Fires bursts of identical flight searches and reports upstream calls with and without single-flight coalescing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=50, help='Concurrent identical searches per process')
+        parser.add_argument('--processes', type=int, default=4, help='Worker processes for the cross-process run')
+        parser.add_argument('--latency', type=float, default=0.5, help='Simulated upstream seconds per call')
+
+    def handle(self, *args, **options):
+        threads, latency = options['threads'], options['latency']
+
+        for label, single_flight in (('no coalescing', None), ('single-flight', SingleFlight())):
+            offer_cache = OfferCache(BoundedLocMemCache(f'bench-{label}', {}), single_flight=single_flight)
+            transport = FakeTransport(latency)
+            elapsed = _burst(offer_cache, transport, threads)
+            self.stdout.write(
+                f"1 process x {threads} threads, {label:<14} upstream calls {transport.calls:>3}  "
+                f"{elapsed:.2f}s  {offer_cache.stats()}"
+            )
+
+        # Forked workers sharing a file cache, with and without the cross-process lock
+        context = multiprocessing.get_context('fork')
+        for label, use_lock in (('process only', False), ('file lock', True)):
+            with tempfile.TemporaryDirectory() as cache_dir, tempfile.TemporaryDirectory() as lock_dir:
+                start_at = time.time() + 0.5
+                jobs = [(cache_dir, lock_dir if use_lock else None, threads, latency, start_at)] * options['processes']
+                with context.Pool(options['processes']) as pool:
+                    results = pool.map(_worker_process, jobs)
+            calls = sum(calls for calls, _ in results)
+            totals = {}
+            for _, stats in results:
+                for name, value in stats.items():
+                    totals[name] = totals.get(name, 0) + value
+            self.stdout.write(
+                f"{options['processes']} processes x {threads} threads, {label:<12} upstream calls {calls:>3}  {totals}"
+            )
@@ -0,0 +1,116 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from flight_search_app.cache_backends import BoundedLocMemCache
+from flight_search_app.fake_amadeus import FakeTransport
+from flight_search_app.offer_cache import OfferCache
+from flight_search_app.search import build_api_params
+from flight_search_app.upstream_guard import CircuitBreaker, TokenBucket, UpstreamGuard, UpstreamUnavailable
+
+ROUTES = [('KHI', 'DXB'), ('LHE', 'JED'), ('ISB', 'DOH'), ('KHI', 'IST'), ('LHE', 'LHR'), ('ISB', 'AUH')]
+
+# (name, latency, error_rate): a healthy upstream, hard errors, a hang, then recovery
+PHASES = (
+    ('healthy', 0.05, 0.0),
+    ('errors', 0.05, 1.0),
+    ('slow', 5.0, 0.0),
+    ('recovered', 0.05, 0.0),
+)
+
+
+class _Run:
+    """One offer cache and fake upstream, optionally behind an UpstreamGuard."""
+
+    def __init__(self, guard, transport):
+        self.guard = guard
+        self.transport = transport
+        # Every query refetches (ttl=0); old answers stay available as the fallback.
+        self.cache = OfferCache(BoundedLocMemCache(f'bench-faults-{id(self)}', {}), ttl=0, stale_ttl=0,
+                                fallback_ttl=600, single_flight=None)
+
+    def search(self, api_params):
+        if self.guard is None:
+            fetch = lambda: self.transport(api_params)  # noqa: E731
+        else:
+            fetch = lambda: self.guard.call(lambda: self.transport(api_params))  # noqa: E731
+        start = time.perf_counter()
+        try:
+            _, outcome = self.cache.get_or_fetch(api_params, fetch)
+        except UpstreamUnavailable:
+            outcome = 'unavailable'
+        except Exception:
+            outcome = 'error'
+        return outcome, time.perf_counter() - start
+
+
+def _run_phase(run, seconds, threads, queries):
+    """Searches from `threads` threads for `seconds`; returns [(outcome, elapsed)]."""
+    results = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def worker(offset):
+        i = offset
+        while time.perf_counter() < stop_at:
+            result = run.search(queries[i % len(queries)])
+            with lock:
+                results.append(result)
+            i += 1
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+    return results
+
+
+class Command(BaseCommand):
+    help = ('Drives searches through healthy, failing, hanging and recovered phases of a fault-injecting fake '
+            'upstream, with and without the circuit breaker / rate limiter / call budget, and reports '
+            'latency and outcomes per phase')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent searching threads')
+        parser.add_argument('--phase-seconds', type=float, default=3.0, help='Duration of each phase')
+        parser.add_argument('--budget', type=float, default=0.5, help='Call budget in seconds')
+        parser.add_argument('--threshold', type=int, default=5, help='Consecutive failures that open the breaker')
+        parser.add_argument('--reset', type=float, default=1.0, help='Seconds open before a probe call')
+        parser.add_argument('--rate', type=float, default=100, help='Rate limit in calls per second (0: none)')
+
+    def handle(self, *args, **options):
+        queries = [build_api_params(o, d, '2026-12-01', 1, 'Economy') for o, d in ROUTES]
+        for label in ('unguarded', 'guarded'):
+            transport = FakeTransport(latency=PHASES[0][1])
+            guard = None
+            if label == 'guarded':
+                guard = UpstreamGuard(
+                    CircuitBreaker(options['threshold'], options['reset'], max_reset_timeout=options['reset'] * 4),
+                    TokenBucket(options['rate']) if options['rate'] else None,
+                    budget=options['budget'],
+                )
+            run = _Run(guard, transport)
+            self.stdout.write(f"{label}:")
+            for name, latency, error_rate in PHASES:
+                transport.latency, transport.error_rate = latency, error_rate
+                calls_before = transport.calls
+                results = _run_phase(run, options['phase_seconds'], options['threads'], queries)
+                self._report(name, results, transport.calls - calls_before, guard)
+            if guard is not None:
+                self.stdout.write(f"  guard: {guard.stats()}")
+
+    def _report(self, name, results, upstream_calls, guard):
+        latencies = sorted(elapsed for _, elapsed in results)
+        outcomes = {}
+        for outcome, _ in results:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0
+        state = f"  breaker {guard.breaker.state}" if guard else ''
+        self.stdout.write(
+            f"  {name:<10} searches {len(results):>5}  upstream calls {upstream_calls:>5}  "
+            f"p50 {statistics.median(latencies) * 1e3 if latencies else 0:>7.1f} ms  p95 {p95 * 1e3:>7.1f} ms  "
+            f"{dict(sorted(outcomes.items()))}{state}"
+        )
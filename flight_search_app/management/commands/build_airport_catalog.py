@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from flight_search_app.catalog import write_catalog
+
+
+class Command(BaseCommand):
+    help = 'Exports airports and aliases to a content-hashed static JSON bundle for client-side autocomplete'
+
+    def handle(self, *args, **options):
+        name, manifest = write_catalog()
+        sizes = ', '.join(f"{file_name} {size / 1024:.1f} KiB" for file_name, size in manifest['bytes'].items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {manifest['airports']} airports (dataset {manifest['version']}): {sizes}. "
+            f"Run collectstatic if static files are served from STATIC_ROOT; re-run after importing airports."
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from flight_search_app import airport_fts
+
+
+class Command(BaseCommand):
+    help = 'Creates (or rebuilds) the SQLite FTS5 airport search table and its sync triggers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drop', action='store_true', help='Drop the table and triggers instead')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The FTS5 backend needs SQLite; keep AIRPORT_SEARCH_BACKEND=index')
+        if options['drop']:
+            airport_fts.drop()
+            self.stdout.write(self.style.SUCCESS(f'Dropped {airport_fts.TABLE}'))
+            return
+        airport_fts.create()
+        self.stdout.write(self.style.SUCCESS(
+            f'{airport_fts.TABLE} is ready; set AIRPORT_SEARCH_BACKEND=fts to use it'
+        ))
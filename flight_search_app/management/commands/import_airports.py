@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flight_search_app.airport_import import read_airports, read_countries, upsert_airports
+
+
+class Command(BaseCommand):
+    help = 'Imports airports from an OurAirports/OpenFlights/CSV/JSON dataset, writing only new or changed rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Dataset file (airports.csv, airports.dat, *.csv, *.json, *.jsonl)')
+        parser.add_argument('--format', default='auto', choices=['auto', 'ourairports', 'openflights', 'csv', 'json'])
+        parser.add_argument('--countries', help='OurAirports countries.csv, to store country names instead of ISO codes')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--keep-popularity', action='store_true',
+                            help='Do not overwrite the popularity of airports already in the database')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+
+    def handle(self, *args, **options):
+        countries = read_countries(options['countries']) if options['countries'] else None
+        start = time.perf_counter()
+        try:
+            stats = upsert_airports(
+                read_airports(options['path'], options['format'], countries),
+                batch_size=options['batch_size'],
+                update_popularity=not options['keep_popularity'],
+                dry_run=options['dry_run'],
+            )
+        except FileNotFoundError:
+            raise CommandError(f"No such file: {options['path']}")
+        elapsed = time.perf_counter() - start
+
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{stats.read} rows in {elapsed:.2f}s ({stats.read / elapsed:,.0f} rows/s): "
+            f"{stats.created} created, {stats.updated} updated, {stats.unchanged} unchanged, "
+            f"{stats.invalid} without IATA code, {stats.duplicates} duplicate codes"
+        ))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from flight_search_app.autocomplete import precompute, write_precomputed
+
+
+class Command(BaseCommand):
+    help = 'Precomputes autocomplete responses for the most common one- and two-character prefixes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=300, help='Number of prefixes to store')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        document = precompute(options['top'])
+        path = write_precomputed(document)
+        prefixes = len(next(iter(document['responses'].values()), {}))
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {prefixes} prefixes for dataset {document['version']} in {path} "
+            f"({time.perf_counter() - start:.2f}s). Re-run after importing airports."
+        ))
@@ -0,0 +1,99 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from flight_search_app import search_log
+from flight_search_app.offer_cache import get_offer_cache
+from flight_search_app.search import prefetch_offers
+
+
+def _api_params(key):
+    origin, destination, departure_date, travel_class, adults, max_offers = key
+    return {
+        'originLocationCode': origin,
+        'destinationLocationCode': destination,
+        'departureDate': departure_date,
+        'adults': adults,
+        'travelClass': travel_class,
+        'max': max_offers,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Fetches the most searched route/date combinations from the search log into the offers cache. '
+            'Schedule it (e.g. cron every 5 minutes from shortly before peak hours) so popular searches are hits.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=getattr(settings, 'SEARCH_PREWARM_TOP', 50),
+                            help='Number of route/date combinations to keep warm')
+        parser.add_argument('--window-hours', type=float, default=getattr(settings, 'SEARCH_PREWARM_WINDOW_HOURS', 168),
+                            help='How far back in the search log to count searches')
+        parser.add_argument('--max-calls', type=int, default=getattr(settings, 'SEARCH_PREWARM_MAX_CALLS', 50),
+                            help='Upstream call budget for this run')
+        parser.add_argument('--min-fresh', type=float, default=120,
+                            help='Refetch cached answers with less than this many fresh seconds left')
+        parser.add_argument('--routes', help='Only these routes, e.g. KHI-DXB,LHE-JED,ISB-DOH')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--dry-run', action='store_true', help='List what would be fetched')
+
+    def handle(self, *args, **options):
+        if settings.OFFER_CACHE_BACKEND == 'locmem':
+            self.stderr.write(self.style.WARNING(
+                "The offers cache is per process (OFFER_CACHE_BACKEND=locmem); the web workers will not see "
+                "what this command fetches. Use OFFER_CACHE_BACKEND=file."
+            ))
+        routes = None
+        if options['routes']:
+            routes = {tuple(route.strip().upper().split('-')) for route in options['routes'].split(',')}
+            if any(len(route) != 2 for route in routes):
+                raise CommandError("--routes takes ORIGIN-DESTINATION pairs, e.g. KHI-DXB,LHE-JED")
+
+        records = list(search_log.iter_records(since=time.time() - options['window_hours'] * 3600))
+        if routes:
+            records = [row for row in records if (row.origin, row.destination) in routes]
+        top = search_log.top_queries(records, options['top'])
+        if not top:
+            self.stdout.write("The search log has no upcoming searches to pre-warm.")
+            return
+
+        cache = get_offer_cache()
+        due = []
+        for key, searches in top:
+            fresh_for = cache.fresh_for(_api_params(key))
+            if fresh_for is None or fresh_for < options['min_fresh']:
+                due.append((key, searches))
+        skipped = due[options['max_calls']:]
+        due = due[:options['max_calls']]
+
+        rate = search_log.hit_rate(records, {key for key, _ in top})
+        self.stdout.write(
+            f"{len(records)} searches in the last {options['window_hours']:g}h; top {len(top)} queries "
+            f"had a cache hit rate of {rate:.0%}. {len(due)} to fetch, "
+            f"{len(top) - len(due) - len(skipped)} still fresh, {len(skipped)} over the call budget."
+        )
+        if options['dry_run']:
+            for key, searches in due:
+                self.stdout.write(f"  {'-'.join(key[:2])} {key[2]} {key[3].lower()} x{key[4]}  ({searches} searches)")
+            return
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(self._fetch, [key for key, _ in due]))
+        failed = [(key, error) for key, error in zip((key for key, _ in due), results) if error is not None]
+        for key, error in failed:
+            self.stderr.write(f"  {'-'.join(key[:2])} {key[2]}: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Pre-warmed {len(due) - len(failed)} of {len(due)} queries in {time.perf_counter() - start:.1f}s."
+        ))
+
+    @staticmethod
+    def _fetch(key):
+        """Returns None on success, or the error."""
+        try:
+            prefetch_offers(_api_params(key))
+        except Exception as error:
+            # Includes UpstreamUnavailable: once the breaker opens the remaining calls fail fast
+            return error
+        return None
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from flight_search_app.fake_amadeus import FakeAmadeusServer
+
+
+class Command(BaseCommand):
+    help = 'Runs a local fake of the Amadeus token and flight-offers endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every flight-offers call')
+        parser.add_argument('--token-ttl', type=int, default=1799)
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of flight-offers calls that return 500')
+
+    def handle(self, *args, **options):
+        server = FakeAmadeusServer(
+            ('127.0.0.1', options['port']),
+            latency=options['latency'],
+            token_ttl=options['token_ttl'],
+            error_rate=options['error_rate'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Fake Amadeus listening on {server.url}'))
+        self.stdout.write('Set AMADEUS_HOST=127.0.0.1 AMADEUS_PORT=%d AMADEUS_SSL=False to use it' % options['port'])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'Served: {server.stats}')
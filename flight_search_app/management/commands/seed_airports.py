@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from flight_search_app.models import Airport
+from flight_search_app.airport_import import upsert_airports
+from flight_search_app.airport_index import AirportRow
 
 class Command(BaseCommand):
     help = 'Seeds database with airports'
@@ -38,6 +39,11 @@ class Command(BaseCommand):
             {"code": "MIA", "name": "Miami International", "city": "Miami", "country": "USA", "pop": 85},
             {"code": "SEA", "name": "Seattle-Tacoma", "city": "Seattle", "country": "USA", "pop": 80},
             {"code": "LAS", "name": "Harry Reid International", "city": "Las Vegas", "country": "USA", "pop": 85},
+            {"code": "IAH", "name": "George Bush Intercontinental", "city": "Houston", "country": "USA", "pop": 80},
+            {"code": "IAD", "name": "Washington Dulles", "city": "Washington", "country": "USA", "pop": 80},
+            {"code": "BOS", "name": "Logan International", "city": "Boston", "country": "USA", "pop": 80},
+            {"code": "MCO", "name": "Orlando International", "city": "Orlando", "country": "USA", "pop": 80},
+            {"code": "MEX", "name": "Benito Juárez International", "city": "Mexico City", "country": "Mexico", "pop": 80},
 
             # --- EUROPE (Major Hubs) ---
             {"code": "LHR", "name": "Heathrow", "city": "London", "country": "UK", "pop": 100},
@@ -55,6 +61,7 @@ class Command(BaseCommand):
             {"code": "MXP", "name": "Malpensa", "city": "Milan", "country": "Italy", "pop": 80},
             {"code": "IST", "name": "Istanbul Airport", "city": "Istanbul", "country": "Turkey", "pop": 95},
             {"code": "ZRH", "name": "Zurich Airport", "city": "Zurich", "country": "Switzerland", "pop": 80},
+            {"code": "DUB", "name": "Dublin Airport", "city": "Dublin", "country": "Ireland", "pop": 80},
 
             # --- MIDDLE EAST (Major Hubs) ---
             {"code": "DXB", "name": "Dubai International", "city": "Dubai", "country": "UAE", "pop": 100},
@@ -62,6 +69,8 @@ class Command(BaseCommand):
             {"code": "DOH", "name": "Hamad International", "city": "Doha", "country": "Qatar", "pop": 95},
             {"code": "JED", "name": "King Abdulaziz", "city": "Jeddah", "country": "Saudi Arabia", "pop": 85},
             {"code": "RUH", "name": "King Khalid", "city": "Riyadh", "country": "Saudi Arabia", "pop": 85},
+            {"code": "TLV", "name": "Ben Gurion", "city": "Tel Aviv", "country": "Israel", "pop": 75},
+            {"code": "CAI", "name": "Cairo International", "city": "Cairo", "country": "Egypt", "pop": 80},
 
             # --- ASIA PACIFIC (Major Hubs) ---
             {"code": "HND", "name": "Haneda", "city": "Tokyo", "country": "Japan", "pop": 95},
@@ -75,6 +84,13 @@ class Command(BaseCommand):
             {"code": "MAA", "name": "Chennai International", "city": "Chennai", "country": "India", "pop": 80},
             {"code": "SYD", "name": "Kingsford Smith", "city": "Sydney", "country": "Australia", "pop": 85},
             {"code": "MEL", "name": "Melbourne Airport", "city": "Melbourne", "country": "Australia", "pop": 80},
+            {"code": "AKL", "name": "Auckland Airport", "city": "Auckland", "country": "New Zealand", "pop": 75},
+            {"code": "PEK", "name": "Beijing Capital", "city": "Beijing", "country": "China", "pop": 90},
+            {"code": "PVG", "name": "Shanghai Pudong", "city": "Shanghai", "country": "China", "pop": 85},
+            {"code": "KUL", "name": "Kuala Lumpur International", "city": "Kuala Lumpur", "country": "Malaysia", "pop": 85},
+            {"code": "CGK", "name": "Soekarno–Hatta", "city": "Jakarta", "country": "Indonesia", "pop": 80},
+            {"code": "MNL", "name": "Ninoy Aquino", "city": "Manila", "country": "Philippines", "pop": 80},
+            {"code": "SGN", "name": "Tan Son Nhat", "city": "Ho Chi Minh City", "country": "Vietnam", "pop": 75},
 
             # --- OTHERS ---
             {"code": "GRU", "name": "Guarulhos", "city": "São Paulo", "country": "Brazil", "pop": 85},
@@ -82,28 +98,19 @@ class Command(BaseCommand):
             {"code": "EZE", "name": "Ezeiza", "city": "Buenos Aires", "country": "Argentina", "pop": 80},
             {"code": "JNB", "name": "O.R. Tambo", "city": "Johannesburg", "country": "South Africa", "pop": 80},
             {"code": "CPT", "name": "Cape Town International", "city": "Cape Town", "country": "South Africa", "pop": 75},
+            {"code": "BOG", "name": "El Dorado", "city": "Bogota", "country": "Colombia", "pop": 75},
+            {"code": "LIM", "name": "Jorge Chávez", "city": "Lima", "country": "Peru", "pop": 75},
+            {"code": "SCL", "name": "Arturo Merino Benítez", "city": "Santiago", "country": "Chile", "pop": 75},
+            {"code": "NBO", "name": "Jomo Kenyatta", "city": "Nairobi", "country": "Kenya", "pop": 75},
+            {"code": "LOS", "name": "Murtala Muhammed", "city": "Lagos", "country": "Nigeria", "pop": 75},
+            {"code": "CMN", "name": "Mohammed V", "city": "Casablanca", "country": "Morocco", "pop": 70},
         ]
 
-        count = 0
-        for data in airports:
-            obj, created = Airport.objects.get_or_create(
-                iata_code=data["code"],
-                defaults={
-                    "name": data["name"],
-                    "city": data["city"],
-                    "country": data["country"],
-                    "popularity": data["pop"]
-                }
-            )
-            if created:
-                count += 1
-                self.stdout.write(self.style.SUCCESS(f'Added {data["code"]}'))
-            else:
-                # Update just in case
-                obj.name = data["name"]
-                obj.city = data["city"]
-                obj.country = data["country"]
-                obj.popularity = data["pop"]
-                obj.save()
-        
-        self.stdout.write(self.style.SUCCESS(f'Successfully seeded {count} new airports (Updated others)'))
+        stats = upsert_airports(
+            AirportRow(data["code"], data["name"], data["city"], data["country"], data["pop"])
+            for data in airports
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully seeded {stats.created} new airports '
+            f'({stats.updated} updated, {stats.unchanged} unchanged)'
+        ))
@@ -0,0 +1,166 @@
+from django.db import migrations, models
+
+# Aliases that used to live in utils.IATA_CODES, plus a few historical spellings.
+# Stored accent-folded and lower-case (see airport_index.fold).
+INITIAL_ALIASES = [
+    ("new york", "JFK", "city"),
+    ("nyc", "JFK", "spelling"),
+    ("new york city", "JFK", "spelling"),
+    ("los angeles", "LAX", "city"),
+    ("la", "LAX", "spelling"),
+    ("chicago", "ORD", "city"),
+    ("houston", "IAH", "city"),
+    ("toronto", "YYZ", "city"),
+    ("vancouver", "YVR", "city"),
+    ("mexico city", "MEX", "city"),
+    ("miami", "MIA", "city"),
+    ("san francisco", "SFO", "city"),
+    ("las vegas", "LAS", "city"),
+    ("orlando", "MCO", "city"),
+    ("washington", "IAD", "city"),
+    ("boston", "BOS", "city"),
+    ("london", "LHR", "city"),
+    ("uk", "LHR", "country"),
+    ("united kingdom", "LHR", "country"),
+    ("paris", "CDG", "city"),
+    ("france", "CDG", "country"),
+    ("frankfurt", "FRA", "city"),
+    ("germany", "FRA", "country"),
+    ("amsterdam", "AMS", "city"),
+    ("netherlands", "AMS", "country"),
+    ("madrid", "MAD", "city"),
+    ("spain", "MAD", "country"),
+    ("rome", "FCO", "city"),
+    ("italy", "FCO", "country"),
+    ("istanbul", "IST", "city"),
+    ("turkey", "IST", "country"),
+    ("dublin", "DUB", "city"),
+    ("ireland", "DUB", "country"),
+    ("zurich", "ZRH", "city"),
+    ("switzerland", "ZRH", "country"),
+    ("munich", "MUC", "city"),
+    ("barcelona", "BCN", "city"),
+    ("manchester", "MAN", "city"),
+    ("dubai", "DXB", "city"),
+    ("uae", "DXB", "country"),
+    ("doha", "DOH", "city"),
+    ("qatar", "DOH", "country"),
+    ("abu dhabi", "AUH", "city"),
+    ("riyadh", "RUH", "city"),
+    ("saudi arabia", "RUH", "country"),
+    ("jeddah", "JED", "city"),
+    ("tel aviv", "TLV", "city"),
+    ("israel", "TLV", "country"),
+    ("cairo", "CAI", "city"),
+    ("egypt", "CAI", "country"),
+    ("tokyo", "HND", "city"),
+    ("japan", "HND", "country"),
+    ("singapore", "SIN", "city"),
+    ("hong kong", "HKG", "city"),
+    ("seoul", "ICN", "city"),
+    ("south korea", "ICN", "country"),
+    ("bangkok", "BKK", "city"),
+    ("thailand", "BKK", "country"),
+    ("delhi", "DEL", "city"),
+    ("india", "DEL", "country"),
+    ("mumbai", "BOM", "city"),
+    ("beijing", "PEK", "city"),
+    ("china", "PEK", "country"),
+    ("shanghai", "PVG", "city"),
+    ("karachi", "KHI", "city"),
+    ("pakistan", "KHI", "country"),
+    ("lahore", "LHE", "city"),
+    ("islamabad", "ISB", "city"),
+    ("kuala lumpur", "KUL", "city"),
+    ("malaysia", "KUL", "country"),
+    ("jakarta", "CGK", "city"),
+    ("indonesia", "CGK", "country"),
+    ("manila", "MNL", "city"),
+    ("philippines", "MNL", "country"),
+    ("vietnam", "SGN", "country"),
+    ("ho chi minh", "SGN", "city"),
+    ("sydney", "SYD", "city"),
+    ("australia", "SYD", "country"),
+    ("melbourne", "MEL", "city"),
+    ("auckland", "AKL", "city"),
+    ("new zealand", "AKL", "country"),
+    ("sao paulo", "GRU", "city"),
+    ("brazil", "GRU", "country"),
+    ("bogota", "BOG", "city"),
+    ("colombia", "BOG", "country"),
+    ("lima", "LIM", "city"),
+    ("peru", "LIM", "country"),
+    ("santiago", "SCL", "city"),
+    ("chile", "SCL", "country"),
+    ("buenos aires", "EZE", "city"),
+    ("argentina", "EZE", "country"),
+    ("johannesburg", "JNB", "city"),
+    ("south africa", "JNB", "country"),
+    ("cape town", "CPT", "city"),
+    ("nairobi", "NBO", "city"),
+    ("kenya", "NBO", "country"),
+    ("lagos", "LOS", "city"),
+    ("nigeria", "LOS", "country"),
+    ("casablanca", "CMN", "city"),
+    ("morocco", "CMN", "country"),
+    ("bombay", "BOM", "spelling"),
+    ("new delhi", "DEL", "spelling"),
+    ("peking", "PEK", "spelling"),
+    ("saigon", "SGN", "spelling"),
+    ("ho chi minh city", "SGN", "spelling"),
+]
+
+
+def load_aliases(apps, schema_editor):
+    AirportAlias = apps.get_model("flight_search_app", "AirportAlias")
+    AirportAlias.objects.bulk_create(
+        [AirportAlias(alias=alias, iata_code=code, kind=kind) for alias, code, kind in INITIAL_ALIASES],
+        ignore_conflicts=True,
+    )
+
+
+def unload_aliases(apps, schema_editor):
+    AirportAlias = apps.get_model("flight_search_app", "AirportAlias")
+    AirportAlias.objects.filter(alias__in=[alias for alias, _, _ in INITIAL_ALIASES]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flight_search_app", "0004_airport"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AirportAlias",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("alias", models.CharField(max_length=100, unique=True)),
+                ("iata_code", models.CharField(db_index=True, max_length=3)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("city", "City name"),
+                            ("country", "Country name"),
+                            ("spelling", "Alternate spelling"),
+                        ],
+                        default="city",
+                        max_length=10,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "airport aliases",
+            },
+        ),
+        migrations.RunPython(load_aliases, unload_aliases),
+    ]
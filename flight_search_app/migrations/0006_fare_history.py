@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight_search_app', '0005_airportalias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyFare',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin', models.CharField(max_length=3)),
+                ('destination', models.CharField(max_length=3)),
+                ('departure_date', models.DateField()),
+                ('travel_class', models.CharField(max_length=10)),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('min_seen_at', models.DateTimeField()),
+                ('latest_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('latest_seen_at', models.DateTimeField()),
+                ('currency', models.CharField(max_length=3)),
+                ('observations', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('origin', 'destination', 'travel_class', 'departure_date'), name='daily_fare_route_date')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FareObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin', models.CharField(max_length=3)),
+                ('destination', models.CharField(max_length=3)),
+                ('departure_date', models.DateField()),
+                ('travel_class', models.CharField(max_length=10)),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('currency', models.CharField(max_length=3)),
+                ('offers', models.PositiveIntegerField(default=0)),
+                ('observed_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['origin', 'destination', 'travel_class', 'departure_date'], name='flight_sear_origin_86c437_idx')],
+            },
+        ),
+    ]
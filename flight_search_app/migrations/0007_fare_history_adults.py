@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight_search_app', '0006_fare_history'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='dailyfare',
+            name='daily_fare_route_date',
+        ),
+        migrations.RemoveIndex(
+            model_name='fareobservation',
+            name='flight_sear_origin_86c437_idx',
+        ),
+        migrations.AddField(
+            model_name='dailyfare',
+            name='adults',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='fareobservation',
+            name='adults',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='fareobservation',
+            index=models.Index(fields=['origin', 'destination', 'travel_class', 'adults', 'departure_date'], name='flight_sear_origin_6412f2_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyfare',
+            constraint=models.UniqueConstraint(fields=('origin', 'destination', 'travel_class', 'adults', 'departure_date'), name='daily_fare_route_party_date'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from .airport_index import fold
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -48,3 +49,69 @@ class Airport(models.Model):
     def __str__(self):
         return f"{self.city} ({self.iata_code})" 
 
+
+class AirportAlias(models.Model):
+    KIND_CHOICES = [
+        ('city', 'City name'),
+        ('country', 'Country name'),
+        ('spelling', 'Alternate spelling'),
+    ]
+
+    alias = models.CharField(max_length=100, unique=True)  # Stored accent-folded, e.g. "sao paulo"
+    iata_code = models.CharField(max_length=3, db_index=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='city')
+
+    class Meta:
+        verbose_name_plural = 'airport aliases'
+
+    def save(self, *args, **kwargs):
+        self.alias = fold(self.alias)
+        self.iata_code = self.iata_code.strip().upper()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.alias} -> {self.iata_code}"
+
+
+class FareObservation(models.Model):
+    """The cheapest offer of one upstream flight-offers answer (see fare_history.py)."""
+    origin = models.CharField(max_length=3)
+    destination = models.CharField(max_length=3)
+    departure_date = models.DateField()
+    travel_class = models.CharField(max_length=10)  # Amadeus value, e.g. ECONOMY
+    adults = models.PositiveSmallIntegerField(default=1)  # prices are totals for the whole party
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3)
+    offers = models.PositiveIntegerField(default=0)
+    observed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['origin', 'destination', 'travel_class', 'adults', 'departure_date'])]
+
+    def __str__(self):
+        return f"{self.origin}-{self.destination} {self.departure_date} {self.min_price} {self.currency}"
+
+
+class DailyFare(models.Model):
+    """Per route, cabin, party size and departure date: the cheapest price seen and the latest one."""
+    origin = models.CharField(max_length=3)
+    destination = models.CharField(max_length=3)
+    departure_date = models.DateField()
+    travel_class = models.CharField(max_length=10)
+    adults = models.PositiveSmallIntegerField(default=1)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    min_seen_at = models.DateTimeField()
+    latest_price = models.DecimalField(max_digits=10, decimal_places=2)
+    latest_seen_at = models.DateTimeField()
+    currency = models.CharField(max_length=3)
+    observations = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Also the index the fare calendar reads a route's date range from
+        constraints = [
+            models.UniqueConstraint(fields=['origin', 'destination', 'travel_class', 'adults', 'departure_date'],
+                                    name='daily_fare_route_party_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.origin}-{self.destination} {self.departure_date} from {self.min_price} {self.currency}"
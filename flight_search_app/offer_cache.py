@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from contextvars import copy_context
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from .amadeus_client import Counters
+from .single_flight import FileLock, SingleFlight, fcntl
+
+logger = logging.getLogger(__name__)
+
+HIT = 'hit'
+STALE = 'stale'
+MISS = 'miss'
+COALESCED = 'coalesced'  # missed, but shared another caller's in-flight upstream call
+DEGRADED = 'degraded'  # upstream failed or was unavailable; an expired entry was served instead
+
+
+class OfferCache:
+    """
+    TTL cache for raw flight_offers_search results, keyed by the normalized query.
+    Entries are fresh for `ttl` seconds and are then served for up to another
+    `stale_ttl` seconds while a background thread refreshes them. After that
+    they are kept for `fallback_ttl` more seconds as the last known answer,
+    returned (as DEGRADED) only when fetching a new one fails.
+    Sorting and paging happen after this layer, so they never reach Amadeus.
+
+    Misses go through `single_flight`, so identical queries arriving together
+    make one upstream call. With `lock_dir` set, the leaders of different
+    worker processes also serialize on a per-key file lock and the later ones
+    read the first one's answer from the cache (which must then be shared,
+    i.e. the file backend).
+    """
+
+    def __init__(self, cache, ttl=300, stale_ttl=600, refresh_timeout=30,
+                 single_flight=None, lock_dir=None, lock_timeout=30, fallback_ttl=0):
+        self.cache = cache
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.fallback_ttl = fallback_ttl
+        self.refresh_timeout = refresh_timeout
+        self.single_flight = single_flight
+        self.lock_dir = lock_dir
+        self.lock_timeout = lock_timeout
+        self.counters = Counters('coalesced_across_processes', 'degraded')
+        self._tasks = set()
+
+    @staticmethod
+    def make_key(params):
+        """Builds a cache key from the query fields that change the upstream answer."""
+        normalized = {
+            'origin': str(params.get('originLocationCode', '')).upper(),
+            'destination': str(params.get('destinationLocationCode', '')).upper(),
+            'date': str(params.get('departureDate', '')),
+            'adults': int(params.get('adults', 1)),
+            'class': str(params.get('travelClass', 'ECONOMY')).upper(),
+            'max': int(params.get('max', 10)),
+        }
+        digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+        return f"offers:{digest}"
+
+    def get(self, params):
+        """Returns (data, status) for a cached query, or (None, MISS)."""
+        entry = self.cache.get(self.make_key(params))
+        if entry is None:
+            return None, MISS
+        return entry['data'], HIT if time.time() < entry['fresh_until'] else STALE
+
+    def set(self, params, data):
+        self._store(self.make_key(params), data)
+
+    def fresh_for(self, params):
+        """Seconds until the cached answer for a query stops being fresh (negative once it has), or None."""
+        entry = self.cache.get(self.make_key(params))
+        return None if entry is None else entry['fresh_until'] - time.time()
+
+    def get_or_fetch(self, params, fetch):
+        """
+        Returns (data, status) where status is HIT, STALE, MISS, COALESCED or DEGRADED.
+        `fetch` is a zero-argument callable that performs the upstream call.
+        """
+        key = self.make_key(params)
+        entry = self.cache.get(key)
+        if entry is not None:
+            now = time.time()
+            if now < entry['fresh_until']:
+                return entry['data'], HIT
+            if now < entry['fresh_until'] + self.stale_ttl:
+                self._revalidate(key, fetch)
+                return entry['data'], STALE
+
+        try:
+            if self.single_flight is None:
+                return self._fetch_and_store(key, fetch), MISS
+            data, shared = self.single_flight.do(key, lambda: self._fetch_and_store(key, fetch))
+            return data, COALESCED if shared else MISS
+        except Exception as error:
+            return self._fallback(key, entry, error)
+
+    def _fallback(self, key, entry, error):
+        """The expired entry in place of a failed fetch, or the fetch's error if there is none."""
+        if entry is None:
+            raise error
+        self.counters.incr('degraded')
+        logger.info("Serving %s from %.0fs ago: %s", key, time.time() - entry['fresh_until'] + self.ttl, error)
+        return entry['data'], DEGRADED
+
+    def _fetch_and_store(self, key, fetch):
+        if not self.lock_dir:
+            data = fetch()
+            self._store(key, data)
+            return data
+        lock = FileLock(self.lock_dir, key, self.lock_timeout)
+        try:
+            lock.acquire()
+            if lock.waited:
+                # Another process held the lock, so it has probably just stored the answer.
+                entry = self.cache.get(key)
+                if entry is not None and time.time() < entry['fresh_until']:
+                    self.counters.incr('coalesced_across_processes')
+                    return entry['data']
+            data = fetch()
+            self._store(key, data)
+            return data
+        finally:
+            lock.release()
+
+    def stats(self):
+        """Single-flight leaders, in-process coalesced waiters and cross-process coalesced hits."""
+        stats = self.single_flight.stats() if self.single_flight else {}
+        stats.update(self.counters.as_dict())
+        return stats
+
+    async def aget_or_fetch(self, params, fetch):
+        """
+        Async variant of get_or_fetch(): `fetch` is a zero-argument coroutine
+        function, and stale entries are refreshed by a task on the running loop.
+        """
+        key = self.make_key(params)
+        entry = await self.cache.aget(key)
+        if entry is not None:
+            now = time.time()
+            if now < entry['fresh_until']:
+                return entry['data'], HIT
+            if now < entry['fresh_until'] + self.stale_ttl:
+                if await self.cache.aadd(f"{key}:refresh", 1, timeout=self.refresh_timeout):
+                    task = asyncio.create_task(self._arefresh(key, fetch))
+                    # The loop only keeps weak references to tasks.
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                return entry['data'], STALE
+
+        try:
+            if self.single_flight is None:
+                return await self._afetch_and_store(key, fetch), MISS
+            data, shared = await self.single_flight.ado(key, lambda: self._afetch_and_store(key, fetch))
+            return data, COALESCED if shared else MISS
+        except Exception as error:
+            return self._fallback(key, entry, error)
+
+    async def _afetch_and_store(self, key, fetch):
+        lock = FileLock(self.lock_dir, key, self.lock_timeout) if self.lock_dir else None
+        try:
+            if lock is not None:
+                await lock.aacquire()
+                entry = await self.cache.aget(key) if lock.waited else None
+                if entry is not None and time.time() < entry['fresh_until']:
+                    self.counters.incr('coalesced_across_processes')
+                    return entry['data']
+            data = await fetch()
+            await self.cache.aset(key, self._entry(data), timeout=self._timeout())
+            return data
+        finally:
+            if lock is not None:
+                lock.release()
+
+    async def _arefresh(self, key, fetch):
+        try:
+            data = await fetch()
+            await self.cache.aset(key, self._entry(data), timeout=self._timeout())
+        except Exception:
+            logger.exception("Background refresh of %s failed", key)
+        finally:
+            await self.cache.adelete(f"{key}:refresh")
+
+    def _entry(self, data):
+        return {'data': data, 'fresh_until': time.time() + self.ttl}
+
+    def _timeout(self):
+        return self.ttl + self.stale_ttl + self.fallback_ttl
+
+    def _store(self, key, data):
+        self.cache.set(key, self._entry(data), timeout=self._timeout())
+
+    def _revalidate(self, key, fetch):
+        # cache.add() doubles as a lock so only one refresh runs per key.
+        if not self.cache.add(f"{key}:refresh", 1, timeout=self.refresh_timeout):
+            return
+        # Run in a copy of the caller's context (call budget, degraded tracking, timing stages)
+        context = copy_context()
+        threading.Thread(target=context.run, args=(self._refresh, key, fetch), daemon=True).start()
+
+    def _refresh(self, key, fetch):
+        try:
+            self._store(key, fetch())
+        except Exception:
+            logger.exception("Background refresh of %s failed", key)
+        finally:
+            self.cache.delete(f"{key}:refresh")
+            # fetch() reaches the ORM (fare history); this thread's connections would otherwise leak
+            connections.close_all()
+
+
+_offer_cache = None
+
+
+def get_offer_cache():
+    """Returns the process-wide OfferCache configured by the OFFER_CACHE_* settings."""
+    global _offer_cache
+    if _offer_cache is None:
+        mode = getattr(settings, 'OFFER_SINGLE_FLIGHT', 'process')
+        if mode == 'file' and fcntl is None:
+            logger.warning("OFFER_SINGLE_FLIGHT='file' needs fcntl; coalescing within the process only")
+            mode = 'process'
+        _offer_cache = OfferCache(
+            caches[getattr(settings, 'OFFER_CACHE_ALIAS', 'offers')],
+            ttl=getattr(settings, 'OFFER_CACHE_TTL', 300),
+            stale_ttl=getattr(settings, 'OFFER_CACHE_STALE_TTL', 600),
+            fallback_ttl=getattr(settings, 'OFFER_CACHE_FALLBACK_TTL', 0),
+            single_flight=SingleFlight() if mode in ('process', 'file') else None,
+            lock_dir=getattr(settings, 'OFFER_LOCK_DIR', None) if mode == 'file' else None,
+        )
+    return _offer_cache
@@ -0,0 +1,257 @@
+"""
+Filtering, facet counts and cursor pagination over a parsed offer list.
+
+An OfferSet is built once per distinct upstream answer and kept in a small
+process-local LRU, so changing filters, sort order or page re-uses the parsed
+offers and their precomputed sort orders instead of parsing or fetching again.
+"""
+import base64
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+from .airport_index import aresolve_airports, collect_iata_codes
+from .search import parse_offers
+
+SORT_KEYS = {
+    'cheapest': lambda f: (f.total_price, f.duration_minutes),
+    'fastest': lambda f: (f.duration_minutes, f.total_price),
+    'departure': lambda f: (f.departure_at, f.total_price),
+    'arrival': lambda f: (f.arrival_at, f.total_price),
+}
+
+# Stop counts of 2 and above share one facet/filter bucket.
+MAX_STOPS_BUCKET = 2
+
+Page = namedtuple('Page', ['flights', 'total', 'facets', 'next_cursor', 'prev_cursor'])
+
+
+def _minute_of_day(epoch):
+    return epoch % 86400 // 60
+
+
+def _parse_hhmm(value):
+    """'06:30' -> 390; returns None for blank or malformed values."""
+    try:
+        hours, minutes = value.split(':')
+        return int(hours) * 60 + int(minutes)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _parse_float(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+
+def _in_window(minute, start, end):
+    if start is None and end is None:
+        return True
+    start = 0 if start is None else start
+    end = 1439 if end is None else end
+    if start <= end:
+        return start <= minute <= end
+    # Windows such as 22:00-06:00 wrap past midnight.
+    return minute >= start or minute <= end
+
+
+@dataclass
+class OfferFilters:
+    stops: set = field(default_factory=set)  # stop buckets 0, 1, 2 (= 2+)
+    carriers: set = field(default_factory=set)
+    departure_from: int = None  # minutes after midnight, local time
+    departure_to: int = None
+    arrival_from: int = None
+    arrival_to: int = None
+    max_duration: int = None  # minutes
+    min_price: float = None
+    max_price: float = None
+
+    # Query string parameters understood by from_query()
+    PARAMS = ('stops', 'carrier', 'dep_from', 'dep_to', 'arr_from', 'arr_to', 'max_duration', 'min_price', 'max_price')
+
+    @classmethod
+    def from_query(cls, query):
+        """Builds filters from a QueryDict, ignoring malformed values."""
+        stops = {int(s) for s in query.getlist('stops') if s.isdigit()}
+        max_duration = _parse_float(query.get('max_duration'))
+        return cls(
+            stops={min(s, MAX_STOPS_BUCKET) for s in stops},
+            carriers={c.upper() for c in query.getlist('carrier') if c},
+            departure_from=_parse_hhmm(query.get('dep_from')),
+            departure_to=_parse_hhmm(query.get('dep_to')),
+            arrival_from=_parse_hhmm(query.get('arr_from')),
+            arrival_to=_parse_hhmm(query.get('arr_to')),
+            max_duration=int(max_duration) if max_duration is not None else None,
+            min_price=_parse_float(query.get('min_price')),
+            max_price=_parse_float(query.get('max_price')),
+        )
+
+    def matches(self, flight):
+        """Checks a single offer against every filter (used when streaming unsorted offers)."""
+        return (
+            (not self.carriers or flight.airline in self.carriers)
+            and (not self.stops or min(flight.stops_count, MAX_STOPS_BUCKET) in self.stops)
+            and _in_window(_minute_of_day(flight.departure_at), self.departure_from, self.departure_to)
+            and _in_window(_minute_of_day(flight.arrival_at), self.arrival_from, self.arrival_to)
+            and (self.max_duration is None or flight.duration_minutes <= self.max_duration)
+            and (self.min_price is None or flight.total_price >= self.min_price)
+            and (self.max_price is None or flight.total_price <= self.max_price)
+        )
+
+
+class OfferSet:
+    """
+    Immutable list of parsed offers plus everything needed to filter, facet
+    and page through it cheaply: per-offer filter attributes and one
+    precomputed index order per sort key.
+    """
+
+    def __init__(self, flights, fingerprint):
+        self.flights = tuple(flights)
+        self.fingerprint = fingerprint
+        self.carriers = tuple(f.airline for f in self.flights)
+        self.stops = tuple(min(f.stops_count, MAX_STOPS_BUCKET) for f in self.flights)
+        self.departure_minutes = tuple(_minute_of_day(f.departure_at) for f in self.flights)
+        self.arrival_minutes = tuple(_minute_of_day(f.arrival_at) for f in self.flights)
+        natural = tuple(range(len(self.flights)))
+        self.orders = {'': natural}
+        for name, key in SORT_KEYS.items():
+            self.orders[name] = tuple(sorted(natural, key=lambda i: key(self.flights[i])))
+
+    def __len__(self):
+        return len(self.flights)
+
+    def price_range(self):
+        prices = [f.total_price for f in self.flights]
+        return (min(prices), max(prices)) if prices else (None, None)
+
+    def query(self, filters, sort_by='', cursor=None, limit=20):
+        """
+        Returns a Page of offers matching `filters` in `sort_by` order.
+        Facet counts are disjunctive: each facet counts offers matching every
+        filter except its own, so selecting one carrier still shows the others.
+        """
+        order = self.orders.get(sort_by, self.orders[''])
+        offset = self._decode_cursor(cursor)
+        matches = []
+        carrier_counts = {}
+        stop_counts = {}
+
+        for i in order:
+            flight = self.flights[i]
+            carrier_ok = not filters.carriers or self.carriers[i] in filters.carriers
+            stops_ok = not filters.stops or self.stops[i] in filters.stops
+            others_ok = (
+                _in_window(self.departure_minutes[i], filters.departure_from, filters.departure_to)
+                and _in_window(self.arrival_minutes[i], filters.arrival_from, filters.arrival_to)
+                and (filters.max_duration is None or flight.duration_minutes <= filters.max_duration)
+                and (filters.min_price is None or flight.total_price >= filters.min_price)
+                and (filters.max_price is None or flight.total_price <= filters.max_price)
+            )
+            if not others_ok:
+                continue
+            if stops_ok:
+                carrier_counts[self.carriers[i]] = carrier_counts.get(self.carriers[i], 0) + 1
+            if carrier_ok:
+                stop_counts[self.stops[i]] = stop_counts.get(self.stops[i], 0) + 1
+            if carrier_ok and stops_ok:
+                matches.append(flight)
+
+        total = len(matches)
+        offset = offset if offset < total else 0
+        facets = {
+            'carriers': sorted(carrier_counts.items()),
+            'stops': sorted(stop_counts.items()),
+        }
+        next_offset = offset + limit
+        return Page(
+            flights=matches[offset:next_offset],
+            total=total,
+            facets=facets,
+            next_cursor=self._encode_cursor(next_offset) if next_offset < total else None,
+            prev_cursor=self._encode_cursor(max(offset - limit, 0)) if offset else None,
+        )
+
+    def _encode_cursor(self, offset):
+        return base64.urlsafe_b64encode(f"{self.fingerprint[:12]}:{offset}".encode()).decode().rstrip('=')
+
+    def _decode_cursor(self, cursor):
+        """Cursors from a different offer set (e.g. after a refresh) restart at the first page."""
+        if not cursor:
+            return 0
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            fingerprint, offset = raw.split(':')
+            return int(offset) if fingerprint == self.fingerprint[:12] else 0
+        except ValueError:
+            return 0
+
+
+def offers_fingerprint(offers):
+    """
+    Cheap identity for a raw offer list; changes whenever upstream returns something new.
+    Amadeus numbers the offers of every answer from "1", so the segments' departure
+    times and flights are part of it: equal fares on another day are a different set.
+    """
+    digest = hashlib.sha1()
+    for offer in offers:
+        digest.update(f"{offer['id']}|{offer['price']['total']}".encode())
+        for itinerary in offer['itineraries']:
+            for segment in itinerary['segments']:
+                digest.update(f"|{segment['departure']['at']}|{segment['carrierCode']}{segment.get('number', '')}".encode())
+        digest.update(b";")
+    return digest.hexdigest()
+
+
+_offer_sets = OrderedDict()
+_offer_sets_lock = threading.Lock()
+
+
+def get_offer_set(offers, origin, destination, departure_date, adults, flight_class):
+    """Returns the parsed OfferSet for a raw offer list, re-using a cached one when possible."""
+    fingerprint = offers_fingerprint(offers)
+    key = (fingerprint, origin, destination, departure_date, adults, flight_class)
+    offer_set = _cached_offer_set(key)
+    if offer_set is None:
+        offer_set = _store_offer_set(key, OfferSet(parse_offers(offers, origin, destination, adults, flight_class), fingerprint))
+    return offer_set
+
+
+async def aget_offer_set(offers, origin, destination, departure_date, adults, flight_class):
+    """Async get_offer_set(): airports are resolved with the async ORM when the index is cold."""
+    fingerprint = offers_fingerprint(offers)
+    key = (fingerprint, origin, destination, departure_date, adults, flight_class)
+    offer_set = _cached_offer_set(key)
+    if offer_set is None:
+        airports = await aresolve_airports(collect_iata_codes(offers))
+        flights = parse_offers(offers, origin, destination, adults, flight_class, airports)
+        offer_set = _store_offer_set(key, OfferSet(flights, fingerprint))
+    return offer_set
+
+
+def _cached_offer_set(key):
+    with _offer_sets_lock:
+        offer_set = _offer_sets.get(key)
+        if offer_set is not None:
+            _offer_sets.move_to_end(key)
+        return offer_set
+
+
+def _store_offer_set(key, offer_set):
+    with _offer_sets_lock:
+        _offer_sets[key] = offer_set
+        while len(_offer_sets) > getattr(settings, 'PARSED_OFFER_SETS_MAX', 128):
+            _offer_sets.popitem(last=False)
+    return offer_set
+
+
+def clear_offer_sets():
+    """Empties the parsed offer set cache (benchmarks measure the parse path)."""
+    with _offer_sets_lock:
+        _offer_sets.clear()
@@ -0,0 +1,210 @@
+"""
+Compact, typed representation of parsed flight offers.
+
+Values are kept in their native form (float prices, minutes, epoch seconds)
+so sorting and filtering never re-parse strings; the display strings the
+templates use are produced lazily by properties at render time.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from .airport_index import AirportRow
+from .duration import format_minutes
+
+
+def wall_clock_epoch(at):
+    """
+    Converts an Amadeus local timestamp ('2026-01-10T08:45:00') to epoch seconds.
+    Amadeus times are airport-local without an offset, so they are read as UTC
+    wall-clock values: comparable with each other, and formatted back unchanged.
+    """
+    return int(datetime.fromisoformat(at).replace(tzinfo=timezone.utc).timestamp())
+
+
+def format_epoch(epoch):
+    """Formats a wall_clock_epoch() value as 'YYYY-MM-DD HH:MM'."""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%d %H:%M')
+
+
+def iso_epoch(epoch):
+    """Formats a wall_clock_epoch() value back to Amadeus' 'YYYY-MM-DDTHH:MM:SS'."""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def _endpoint(code, airport, epoch):
+    return {
+        'airport': code,
+        'name': airport.name if airport else None,
+        'city': airport.city if airport else None,
+        'at': iso_epoch(epoch),
+    }
+
+
+def _airport_name(airport, code):
+    return airport.name if airport else code
+
+
+@dataclass(slots=True)
+class Segment:
+    carrier: str
+    number: str
+    aircraft: str
+    duration_minutes: int
+    departure_airport: str
+    departure_at: int
+    arrival_airport: str
+    arrival_at: int
+    departure_info: AirportRow = None
+    arrival_info: AirportRow = None
+
+    @property
+    def flight_number(self):
+        return self.number
+
+    @property
+    def departure_time(self):
+        return format_epoch(self.departure_at)
+
+    @property
+    def arrival_time(self):
+        return format_epoch(self.arrival_at)
+
+    @property
+    def duration(self):
+        return format_minutes(self.duration_minutes)
+
+    @property
+    def departure_airport_name(self):
+        return _airport_name(self.departure_info, self.departure_airport)
+
+    @property
+    def departure_city(self):
+        return self.departure_info.city if self.departure_info else ''
+
+    @property
+    def arrival_airport_name(self):
+        return _airport_name(self.arrival_info, self.arrival_airport)
+
+    @property
+    def arrival_city(self):
+        return self.arrival_info.city if self.arrival_info else ''
+
+    def as_dict(self):
+        """JSON-ready form used by the search API."""
+        return {
+            'carrier': self.carrier,
+            'number': self.number,
+            'aircraft': self.aircraft,
+            'duration_minutes': self.duration_minutes,
+            'departure': _endpoint(self.departure_airport, self.departure_info, self.departure_at),
+            'arrival': _endpoint(self.arrival_airport, self.arrival_info, self.arrival_at),
+        }
+
+
+@dataclass(slots=True)
+class FlightOffer:
+    id: str
+    total_price: float
+    currency: str
+    duration_minutes: int
+    segments: tuple
+    adults: int
+    flight_class: str
+    origin: str
+    destination: str
+
+    @property
+    def first_segment(self):
+        return self.segments[0]
+
+    @property
+    def last_segment(self):
+        return self.segments[-1]
+
+    @property
+    def stops_count(self):
+        return len(self.segments) - 1
+
+    @property
+    def departure_at(self):
+        return self.segments[0].departure_at
+
+    @property
+    def arrival_at(self):
+        return self.segments[-1].arrival_at
+
+    # --- Display values used by results.html ---
+
+    @property
+    def airline(self):
+        return self.segments[0].carrier
+
+    @property
+    def flight_number(self):
+        first = self.segments[0]
+        return f"{first.carrier}-{first.number}"
+
+    @property
+    def departure_airport(self):
+        return self.segments[0].departure_airport
+
+    @property
+    def departure_airport_name(self):
+        return self.segments[0].departure_airport_name
+
+    @property
+    def departure_time(self):
+        return format_epoch(self.departure_at)
+
+    @property
+    def arrival_airport(self):
+        return self.segments[-1].arrival_airport
+
+    @property
+    def arrival_airport_name(self):
+        return self.segments[-1].arrival_airport_name
+
+    @property
+    def arrival_city(self):
+        last = self.segments[-1]
+        return last.arrival_info.city if last.arrival_info else "Unknown City"
+
+    @property
+    def arrival_time(self):
+        return format_epoch(self.arrival_at)
+
+    @property
+    def duration(self):
+        return format_minutes(self.duration_minutes)
+
+    @property
+    def stops(self):
+        stops_count = len(self.segments) - 1
+        return "NON-STOP" if stops_count == 0 else f"{stops_count} STOP{'S' if stops_count > 1 else ''}"
+
+    @property
+    def price(self):
+        return f"{self.total_price:.2f}"
+
+    @property
+    def price_per_adult(self):
+        per_adult = self.total_price / self.adults if self.adults > 0 else self.total_price
+        return f"{per_adult:.2f}"
+
+    def as_dict(self):
+        """JSON-ready form used by the search API: numbers stay numbers, times are ISO local."""
+        first = self.segments[0]
+        last = self.segments[-1]
+        return {
+            'id': self.id,
+            'price': round(self.total_price, 2),
+            'price_per_adult': round(self.total_price / self.adults if self.adults > 0 else self.total_price, 2),
+            'currency': self.currency,
+            'duration_minutes': self.duration_minutes,
+            'stops': len(self.segments) - 1,
+            'carrier': first.carrier,
+            'flight_number': self.flight_number,
+            'departure': _endpoint(first.departure_airport, first.departure_info, first.departure_at),
+            'arrival': _endpoint(last.arrival_airport, last.arrival_info, last.arrival_at),
+            'segments': [seg.as_dict() for seg in self.segments],
+        }
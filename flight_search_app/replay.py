@@ -0,0 +1,84 @@
+"""
+Recorded Amadeus responses for offline benchmarks.
+
+A fixture is one raw flight_offers_search response (the full JSON body,
+including `dictionaries`) plus the query that produced it:
+
+    {"params": {...}, "recorded_at": "...", "source": "amadeus", "result": {...}}
+
+record_fixture() captures one from the live API; ReplayTransport serves them
+back in place of search.fetch_offers, so the whole pipeline runs against real
+response shapes without network access. Fixtures can be synthesized from
+fake_amadeus.make_offers when nothing has been recorded yet ("source":
+"synthetic"), which keeps the harness usable in CI.
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+from .fake_amadeus import make_offers
+
+
+def fixture_name(api_params):
+    return (f"{api_params['originLocationCode']}-{api_params['destinationLocationCode']}-"
+            f"{api_params['departureDate']}-{api_params.get('travelClass', 'ECONOMY').lower()}-"
+            f"{api_params.get('adults', 1)}ad-{api_params['max']}.json")
+
+
+def _fixture(api_params, result, source):
+    return {
+        'params': api_params,
+        'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'source': source,
+        'result': result,
+    }
+
+
+def save_fixture(directory, fixture):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, fixture_name(fixture['params']))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(fixture, f)
+    return path
+
+
+def record_fixture(directory, api_params):
+    """Calls the live API once and stores the raw response; returns the fixture path."""
+    from .amadeus_client import get_amadeus_client
+    response = get_amadeus_client().shopping.flight_offers_search.get(**api_params)
+    return save_fixture(directory, _fixture(api_params, response.result, 'amadeus'))
+
+
+def synthetic_fixture(api_params):
+    offers = make_offers(
+        api_params['originLocationCode'], api_params['destinationLocationCode'],
+        api_params['departureDate'], int(api_params['max']),
+    )
+    return _fixture(api_params, {'meta': {'count': len(offers)}, 'data': offers}, 'synthetic')
+
+
+def load_fixture(directory, api_params):
+    """The stored fixture for `api_params`, or None."""
+    try:
+        with open(os.path.join(directory, fixture_name(api_params)), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class ReplayTransport:
+    """
+    Drop-in for search.fetch_offers: returns the `data` of the fixture matching
+    the query's route, date, class, passengers and offer count.
+    """
+
+    def __init__(self, fixtures):
+        self.responses = {fixture_name(f['params']): f['result']['data'] for f in fixtures}
+        self.calls = 0
+
+    def __call__(self, api_params):
+        self.calls += 1
+        try:
+            return self.responses[fixture_name(api_params)]
+        except KeyError:
+            raise LookupError(f"No recorded response for {fixture_name(api_params)}") from None
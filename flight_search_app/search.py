@@ -0,0 +1,515 @@
+"""
+Flight search pipeline shared by the results page and the flexible-date mode:
+building Amadeus parameters, fetching (through the offers cache), and turning
+raw offers into the FlightOffer objects the templates render.
+"""
+import asyncio
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed, wait
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import fare_history, search_log
+from .airport_index import aget_airport_index, collect_iata_codes, get_airport_index, resolve_airports
+from .duration import parse_minutes
+from .amadeus_client import flight_offers
+from .async_amadeus import get_async_transport
+from .offer_cache import DEGRADED, get_offer_cache
+from .offers import FlightOffer, Segment, wall_clock_epoch
+from .timing import stage
+from .upstream_guard import get_upstream_guard
+from .utils import get_iata_code
+
+# Map UI class names to Amadeus API values
+CLASS_MAPPING = {
+    'Economy': 'ECONOMY',
+    'Business': 'BUSINESS',
+    'First Class': 'FIRST'
+}
+
+
+def build_api_params(origin, destination, departure_date, adults, flight_class, max_offers=None):
+    if max_offers is None:
+        max_offers = getattr(settings, 'SEARCH_MAX_OFFERS', 10)
+    return {
+        'originLocationCode': origin,
+        'destinationLocationCode': destination,
+        'departureDate': departure_date,
+        'adults': adults,
+        'travelClass': CLASS_MAPPING.get(flight_class, 'ECONOMY'),
+        'max': max_offers
+    }
+
+
+_degraded = ContextVar('degraded_queries', default=None)
+
+
+@contextmanager
+def track_degraded():
+    """
+    Yields a list that receives the query of every answer served from the
+    offers cache's fallback (upstream unavailable) inside the block, including
+    the fan-out searches it starts (see _submit).
+    """
+    degraded = []
+    token = _degraded.set(degraded)
+    try:
+        yield degraded
+    finally:
+        _degraded.reset(token)
+
+
+def _note(api_params, status):
+    degraded = _degraded.get()
+    if status == DEGRADED and degraded is not None:
+        degraded.append(api_params)
+
+
+def fetch_offers(api_params):
+    """
+    Returns the raw offer list for a query. Served from the offers cache when
+    the same query was seen recently; sorting is applied later and never
+    reaches Amadeus.
+    """
+    start = time.perf_counter()
+    offers, status = get_offer_cache().get_or_fetch(api_params, lambda: _fetch_upstream(api_params))
+    search_log.record(api_params, status, time.perf_counter() - start)
+    _note(api_params, status)
+    return offers
+
+
+def prefetch_offers(api_params):
+    """Fetches a query from Amadeus into the offers cache, replacing what is cached; not logged as a search."""
+    offers = _fetch_upstream(api_params)
+    get_offer_cache().set(api_params, offers)
+    return offers
+
+
+def _fetch_upstream(api_params):
+    with stage('upstream'):
+        offers = get_upstream_guard().call(lambda: flight_offers(api_params))
+    fare_history.observe(api_params, offers)
+    return offers
+
+
+def resolve_location(raw_location, city_mode=False):
+    """
+    Converts user input to (iata_code, city_codes). In city mode city_codes lists
+    every airport of the city (e.g. London -> ['LHR', 'LGW']); otherwise it is None.
+    """
+    code = get_iata_code(raw_location)
+    if not city_mode:
+        return code, None
+    codes = [a.iata_code for a in get_airport_index().city_airports(code or raw_location)] or None
+    return code or (codes and codes[0]), codes
+
+
+def parse_offer(offer, airports, origin, destination, adults, flight_class):
+    """Builds one FlightOffer from a raw Amadeus offer; `airports` maps IATA code -> AirportRow."""
+    # We only process the first itinerary (one-way logic for now)
+    itinerary = offer['itineraries'][0]
+
+    segments = tuple(
+        Segment(
+            carrier=seg['carrierCode'],
+            number=seg['number'],
+            aircraft=seg.get('aircraft', {}).get('code', 'N/A'),
+            duration_minutes=parse_minutes(seg.get('duration')),
+            departure_airport=seg['departure']['iataCode'],
+            departure_at=wall_clock_epoch(seg['departure']['at']),
+            arrival_airport=seg['arrival']['iataCode'],
+            arrival_at=wall_clock_epoch(seg['arrival']['at']),
+            departure_info=airports.get(seg['departure']['iataCode']),
+            arrival_info=airports.get(seg['arrival']['iataCode']),
+        )
+        for seg in itinerary['segments']
+    )
+
+    return FlightOffer(
+        id=offer['id'],
+        total_price=float(offer['price']['total']),
+        currency=offer['price']['currency'],
+        duration_minutes=parse_minutes(itinerary['duration']) or 0,
+        segments=segments,
+        adults=adults,
+        flight_class=flight_class,
+        origin=origin,
+        destination=destination,
+    )
+
+
+def iter_parsed_offers(offers, origin, destination, adults, flight_class, airports=None):
+    """
+    Yields FlightOffer objects one at a time, so callers can stream them out.
+    `airports` may be passed in when already resolved (e.g. by the async path).
+    """
+    if airports is None:
+        # Resolve every airport in the response up front (one query at most)
+        airports = resolve_airports(collect_iata_codes(offers))
+    origin = origin.upper()
+    destination = destination.upper()
+    for offer in offers:
+        yield parse_offer(offer, airports, origin, destination, adults, flight_class)
+
+
+def parse_offers(offers, origin, destination, adults, flight_class, airports=None):
+    """Turns raw Amadeus offers into the FlightOffer objects rendered by results.html."""
+    return list(iter_parsed_offers(offers, origin, destination, adults, flight_class, airports))
+
+
+def gather_offers(api_params, flex_days=0, origin_codes=None, destination_codes=None):
+    """
+    Runs the search a request asked for and returns (offers, calendar, pair_statuses):
+    a ±flex_days window, every airport pair of two cities, or a single query.
+    """
+    if flex_days:
+        offers_by_date, calendar = search_flexible_dates(api_params, flex_days)
+        offers = [offer for day in sorted(offers_by_date) for offer in offers_by_date[day]]
+        return offers, calendar, {}
+    if is_multi_airport(origin_codes, destination_codes):
+        offers, pair_statuses = search_city_pairs(api_params, origin_codes, destination_codes)
+        return offers, [], pair_statuses
+    return fetch_offers(api_params), [], {}
+
+
+def is_multi_airport(origin_codes, destination_codes):
+    return bool(origin_codes and destination_codes and (len(origin_codes) > 1 or len(destination_codes) > 1))
+
+
+# --- Flexible dates -------------------------------------------------------
+
+class SearchTimeout(Exception):
+    """No date of a flexible-date search answered before the deadline."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_search_executor():
+    """Shared thread pool for upstream fan-out, sized by SEARCH_MAX_WORKERS."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'SEARCH_MAX_WORKERS', 8),
+                    thread_name_prefix='flight-search',
+                )
+    return _executor
+
+
+def _submit(executor, fn, *args):
+    """
+    executor.submit() running `fn` in a copy of the caller's context, so
+    track_degraded() and the request's timing stages follow it into the pool.
+    """
+    return executor.submit(copy_context().run, fn, *args)
+
+
+def flexible_dates(departure_date, days, today=None):
+    """Returns the dates departure_date ± days, skipping any in the past."""
+    center = date.fromisoformat(departure_date)
+    today = today or date.today()
+    window = (center + timedelta(days=offset) for offset in range(-days, days + 1))
+    return [d.isoformat() for d in window if d >= today]
+
+
+def search_flexible_dates(api_params, days, deadline=None, fetch=None, executor=None):
+    """
+    Runs one flight-offers search per date in the ±days window concurrently.
+
+    Dates still pending when `deadline` seconds have passed are reported as
+    'timeout': calls already running keep going and still fill the offers
+    cache, dates still queued behind them are cancelled.
+    Returns (offers_by_date, calendar): the raw offers for every date that
+    answered, and one calendar entry per date with the cheapest total price.
+    If no date answered, the first error is raised, or SearchTimeout when
+    none failed either.
+    """
+    if deadline is None:
+        deadline = getattr(settings, 'FLEX_SEARCH_DEADLINE', 8)
+    fetch = fetch or fetch_offers
+    executor = executor or get_search_executor()
+    dates = flexible_dates(api_params['departureDate'], days)
+
+    futures = {
+        _submit(executor, fetch, {**api_params, 'departureDate': day}): day
+        for day in dates
+    }
+    done, pending = wait(futures, timeout=deadline)
+    for future in pending:
+        future.cancel()
+
+    offers_by_date = {}
+    statuses = {}
+    errors = []
+    for future in done:
+        day = futures[future]
+        try:
+            offers_by_date[day] = future.result()
+            statuses[day] = 'ok'
+        except Exception as error:
+            errors.append(error)
+            statuses[day] = 'error'
+    _raise_if_unanswered(api_params, offers_by_date, errors, pending, deadline)
+    return offers_by_date, build_calendar(api_params, dates, offers_by_date, statuses)
+
+
+def _raise_if_unanswered(api_params, offers_by_date, errors, pending, deadline):
+    if offers_by_date:
+        return
+    if errors:
+        raise errors[0]
+    if pending:
+        raise SearchTimeout(
+            f"No date of {api_params['originLocationCode']}-{api_params['destinationLocationCode']} "
+            f"around {api_params['departureDate']} answered within {deadline}s"
+        )
+
+
+def build_calendar(api_params, dates, offers_by_date, statuses):
+    """One entry per date with its status and cheapest total price; dates without a status timed out."""
+    calendar = []
+    for day in dates:
+        offers = offers_by_date.get(day) or []
+        prices = [float(offer['price']['total']) for offer in offers]
+        calendar.append({
+            'date': day,
+            'status': statuses.get(day, 'timeout'),
+            'offers': len(offers),
+            'min_price': min(prices) if prices else None,
+            'currency': offers[0]['price']['currency'] if offers else None,
+            'is_selected': day == api_params['departureDate'],
+            'is_cheapest': False,
+        })
+    priced = [entry for entry in calendar if entry['min_price'] is not None]
+    if priced:
+        min(priced, key=lambda entry: entry['min_price'])['is_cheapest'] = True
+    return calendar
+
+
+# --- Multi-airport cities -------------------------------------------------
+
+PairResult = namedtuple('PairResult', ['origin', 'destination', 'offers', 'error'])
+
+
+def offer_signature(offer):
+    """Identifies the same physical itinerary returned by different airport-pair searches."""
+    return tuple(
+        (seg['carrierCode'], seg['number'], seg['departure']['iataCode'], seg['departure']['at'])
+        for seg in offer['itineraries'][0]['segments']
+    )
+
+
+class OfferMerger:
+    """Accumulates offers from several searches, keeping the cheapest copy of each itinerary."""
+
+    def __init__(self):
+        self._by_signature = {}
+
+    def add(self, offers):
+        """Merges offers in and returns the ones that were new or cheaper than before."""
+        added = []
+        for offer in offers:
+            signature = offer_signature(offer)
+            current = self._by_signature.get(signature)
+            if current is None or float(offer['price']['total']) < float(current['price']['total']):
+                self._by_signature[signature] = offer
+                added.append(offer)
+        return added
+
+    def offers(self):
+        """All merged offers, cheapest first."""
+        return sorted(self._by_signature.values(), key=lambda offer: float(offer['price']['total']))
+
+
+def airport_pairs(origins, destinations, limit=None):
+    """Origin×destination pairs, most popular airports first, skipping same-airport pairs."""
+    if limit is None:
+        limit = getattr(settings, 'CITY_SEARCH_MAX_PAIRS', 9)
+    pairs = [(o, d) for o in origins for d in destinations if o != d]
+    return pairs[:limit]
+
+
+def iter_pair_searches(api_params, pairs, deadline=None, fetch=None, executor=None):
+    """
+    Starts one flight-offers search per (origin, destination) pair on the
+    shared executor and yields a PairResult for each as soon as it finishes,
+    fastest first. Pairs still running at `deadline` are cancelled/abandoned.
+    """
+    if deadline is None:
+        deadline = getattr(settings, 'CITY_SEARCH_DEADLINE', 8)
+    fetch = fetch or fetch_offers
+    executor = executor or get_search_executor()
+    futures = {
+        _submit(executor, fetch, {**api_params, 'originLocationCode': o, 'destinationLocationCode': d}): (o, d)
+        for o, d in pairs
+    }
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            o, d = futures[future]
+            try:
+                yield PairResult(o, d, future.result(), None)
+            except Exception as error:
+                yield PairResult(o, d, None, error)
+    except TimeoutError:
+        pass
+    finally:
+        # Also reached when the consumer stops iterating early.
+        for future in futures:
+            future.cancel()
+
+
+def search_city_pairs(api_params, origins, destinations, deadline=None, fetch=None, executor=None):
+    """
+    Searches every airport pair between two cities concurrently and returns
+    (offers, pair_statuses): the deduplicated offers, cheapest first, and a
+    {(origin, destination): 'ok' | 'error' | 'timeout'} map.
+    If every pair failed, the first error is raised.
+    """
+    pairs = airport_pairs(origins, destinations)
+    statuses = dict.fromkeys(pairs, 'timeout')
+    merger = OfferMerger()
+    errors = []
+    for result in iter_pair_searches(api_params, pairs, deadline, fetch, executor):
+        if result.error is not None:
+            errors.append(result.error)
+            statuses[(result.origin, result.destination)] = 'error'
+        else:
+            merger.add(result.offers)
+            statuses[(result.origin, result.destination)] = 'ok'
+    if errors and len(errors) == len(pairs):
+        raise errors[0]
+    return merger.offers(), statuses
+
+
+# --- Async (ASGI) path ----------------------------------------------------
+#
+# Mirrors the functions above for async views: upstream calls go through the
+# httpx transport and run as tasks on the request's event loop instead of the
+# thread pool. Cancelling the caller (client disconnect) cancels every task.
+
+async def afetch_offers(api_params):
+    """Async fetch_offers(): offers cache first, then the async Amadeus transport."""
+    start = time.perf_counter()
+    offers, status = await get_offer_cache().aget_or_fetch(api_params, lambda: _afetch_upstream(api_params))
+    search_log.record(api_params, status, time.perf_counter() - start)
+    _note(api_params, status)
+    return offers
+
+
+async def _afetch_upstream(api_params):
+    transport = get_async_transport()
+    offers = await get_upstream_guard().acall(lambda: transport.flight_offers(api_params))
+    fare_history.observe(api_params, offers)
+    return offers
+
+
+async def aresolve_location(raw_location, city_mode=False):
+    """
+    Async resolve_location(). A cold airport index, and a FuzzyIndex that a
+    typo needs but is not ready yet, are built off the event loop; once
+    built, lookups are sub-millisecond.
+    """
+    index = await aget_airport_index()
+    code = index.resolve(raw_location, wait_for_fuzzy=False) if raw_location else None
+    if code is None and raw_location and index.fuzzy is None:
+        await sync_to_async(index.ensure_fuzzy)()
+        code = index.resolve(raw_location)
+    if not city_mode:
+        return code, None
+    codes = [a.iata_code for a in index.city_airports(code or raw_location)] or None
+    return code or (codes and codes[0]), codes
+
+
+async def agather_offers(api_params, flex_days=0, origin_codes=None, destination_codes=None):
+    """Async gather_offers()."""
+    if flex_days:
+        offers_by_date, calendar = await asearch_flexible_dates(api_params, flex_days)
+        offers = [offer for day in sorted(offers_by_date) for offer in offers_by_date[day]]
+        return offers, calendar, {}
+    if is_multi_airport(origin_codes, destination_codes):
+        offers, pair_statuses = await asearch_city_pairs(api_params, origin_codes, destination_codes)
+        return offers, [], pair_statuses
+    return await afetch_offers(api_params), [], {}
+
+
+async def _cancel(tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def asearch_flexible_dates(api_params, days, deadline=None, fetch=None):
+    """
+    Async search_flexible_dates(). Dates still pending at `deadline` are
+    cancelled rather than left running, since they would outlive the request.
+    """
+    if deadline is None:
+        deadline = getattr(settings, 'FLEX_SEARCH_DEADLINE', 8)
+    fetch = fetch or afetch_offers
+    dates = flexible_dates(api_params['departureDate'], days)
+    tasks = {
+        asyncio.ensure_future(fetch({**api_params, 'departureDate': day})): day
+        for day in dates
+    }
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=deadline) if tasks else (set(), set())
+    finally:
+        await _cancel([task for task in tasks if not task.done()])
+
+    offers_by_date = {}
+    statuses = {}
+    errors = []
+    for task in done:
+        day = tasks[task]
+        if task.exception() is not None:
+            errors.append(task.exception())
+            statuses[day] = 'error'
+        else:
+            offers_by_date[day] = task.result()
+            statuses[day] = 'ok'
+    _raise_if_unanswered(api_params, offers_by_date, errors, pending, deadline)
+    return offers_by_date, build_calendar(api_params, dates, offers_by_date, statuses)
+
+
+async def asearch_city_pairs(api_params, origins, destinations, deadline=None, fetch=None):
+    """Async search_city_pairs(): merges each pair's offers as soon as it answers."""
+    if deadline is None:
+        deadline = getattr(settings, 'CITY_SEARCH_DEADLINE', 8)
+    fetch = fetch or afetch_offers
+
+    async def search_pair(o, d):
+        try:
+            return PairResult(o, d, await fetch({**api_params, 'originLocationCode': o, 'destinationLocationCode': d}), None)
+        except Exception as error:
+            return PairResult(o, d, None, error)
+
+    pairs = airport_pairs(origins, destinations)
+    statuses = dict.fromkeys(pairs, 'timeout')
+    merger = OfferMerger()
+    errors = []
+    tasks = [asyncio.ensure_future(search_pair(o, d)) for o, d in pairs]
+    try:
+        for next_result in asyncio.as_completed(tasks, timeout=deadline):
+            result = await next_result
+            if result.error is not None:
+                errors.append(result.error)
+                statuses[(result.origin, result.destination)] = 'error'
+            else:
+                merger.add(result.offers)
+                statuses[(result.origin, result.destination)] = 'ok'
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await _cancel([task for task in tasks if not task.done()])
+    if errors and len(errors) == len(pairs):
+        raise errors[0]
+    return merger.offers(), statuses
@@ -0,0 +1,214 @@
+"""
+Append-only log of the flight-offers queries users run, for pre-warming.
+
+Every query answered by search.fetch_offers / afetch_offers appends one JSON
+line to the file of the current hour in SEARCH_LOG_DIR:
+
+    [unix time, origin, destination, departure date, travel class, adults, max offers, latency ms, cache status]
+
+A search only puts its line on an in-memory queue; a background thread per
+process drains it and appends whatever has piled up with a single O_APPEND
+write, so no disk I/O happens on a request thread or the event loop, and the
+worker processes of one machine can share a file without locking. The same
+thread starts each hour's segment and deletes files older than
+SEARCH_LOG_RETENTION_HOURS, which makes the directory a ring buffer of
+hourly segments. When the queue is full (the disk is stuck) lines are
+dropped rather than slowing searches down.
+`manage.py prewarm_offers` reads it back with top_queries().
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import date
+from itertools import groupby
+
+from django.conf import settings
+
+from .offer_cache import HIT, STALE
+
+logger = logging.getLogger(__name__)
+
+SearchRecord = namedtuple('SearchRecord', [
+    'at', 'origin', 'destination', 'departure_date', 'travel_class', 'adults', 'max_offers', 'latency_ms', 'status',
+])
+
+PREFIX = 'searches-'
+SUFFIX = '.jsonl'
+QUEUE_SIZE = 10000  # lines waiting for the writer thread
+
+
+def _directory():
+    return getattr(settings, 'SEARCH_LOG_DIR', None)
+
+
+def _segment_name(hour):
+    return f"{PREFIX}{hour}{SUFFIX}"
+
+
+def _segment_hour(name):
+    if name.startswith(PREFIX) and name.endswith(SUFFIX):
+        try:
+            return int(name[len(PREFIX):-len(SUFFIX)])
+        except ValueError:
+            pass
+    return None
+
+
+class _Writer:
+    """
+    Owns the log's background thread: takes lines from a queue, keeps the
+    current hour's segment open for appending and starts a new one each hour.
+    """
+
+    def __init__(self):
+        self.hour = None
+        self.fd = None
+        self.dropped = 0
+        self._queue = queue.Queue(QUEUE_SIZE)
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def put(self, line, now):
+        """Queues a line without blocking; the thread is (re)started lazily, also after a fork."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    if self.fd is not None:
+                        os.close(self.fd)  # inherited from the parent process
+                    self._queue = queue.Queue(QUEUE_SIZE)
+                    self.hour = self.fd = None
+                    threading.Thread(target=self._run, args=(self._queue,), name='search-log', daemon=True).start()
+                    self._pid = os.getpid()
+        try:
+            self._queue.put_nowait((line, now))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Blocks until every queued line has been written."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def _run(self, lines):
+        while True:
+            batch = [lines.get()]
+            while True:
+                try:
+                    batch.append(lines.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except (OSError, TypeError, ValueError):
+                logger.warning("Could not append to the search log", exc_info=True)
+            finally:
+                for _ in batch:
+                    lines.task_done()
+
+    def _write(self, batch):
+        # One write per hour present in the batch; normally a single one.
+        for hour, group in groupby(batch, key=lambda item: int(item[1] // 3600)):
+            if hour != self.hour:
+                self._rotate(hour)
+            os.write(self.fd, b''.join(line for line, _ in group))
+
+    def _rotate(self, hour):
+        directory = _directory()
+        os.makedirs(directory, exist_ok=True)
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        self.fd = os.open(os.path.join(directory, _segment_name(hour)), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.hour = hour
+        _prune(directory, hour - getattr(settings, 'SEARCH_LOG_RETENTION_HOURS', 168))
+
+
+def _prune(directory, oldest_hour):
+    for entry in os.scandir(directory):
+        hour = _segment_hour(entry.name)
+        if hour is not None and hour < oldest_hour:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # another worker pruned it first
+
+
+_writer = _Writer()
+
+
+def record(api_params, status, seconds):
+    """Queues one query for the log's writer thread; never blocks or raises, since it runs on the search path."""
+    if not _directory():
+        return
+    now = time.time()
+    line = json.dumps([
+        int(now),
+        api_params['originLocationCode'],
+        api_params['destinationLocationCode'],
+        api_params['departureDate'],
+        api_params.get('travelClass', 'ECONOMY'),
+        int(api_params.get('adults', 1)),
+        int(api_params.get('max', 10)),
+        round(seconds * 1e3, 1),
+        status,
+    ], separators=(',', ':')) + '\n'
+    _writer.put(line.encode(), now)
+
+
+def flush():
+    """Waits until the queries recorded so far are on disk (for commands and tests reading the log back)."""
+    _writer.flush()
+
+
+def iter_records(since=None):
+    """Yields SearchRecords from the segments covering `since` (unix time) onwards, oldest first."""
+    directory = _directory()
+    if not directory or not os.path.isdir(directory):
+        return
+    first_hour = int(since // 3600) if since else None
+    segments = []
+    for entry in os.scandir(directory):
+        hour = _segment_hour(entry.name)
+        if hour is not None and (first_hour is None or hour >= first_hour):
+            segments.append((hour, entry.path))
+    for _, path in sorted(segments):
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        row = SearchRecord(*json.loads(line))
+                    except (ValueError, TypeError):
+                        continue  # a line cut short by a crash
+                    if since is None or row.at >= since:
+                        yield row
+        except FileNotFoundError:
+            continue  # pruned while we were reading
+
+
+def query_key(row):
+    """The fields that make up an offers-cache key (see OfferCache.make_key)."""
+    return (row.origin, row.destination, row.departure_date, row.travel_class, row.adults, row.max_offers)
+
+
+def top_queries(records, limit, today=None):
+    """
+    The `limit` most searched queries whose departure date has not passed,
+    as [(query key, searches)], most searched first.
+    """
+    today = (today or date.today()).isoformat()
+    counts = Counter(query_key(row) for row in records if row.departure_date >= today)
+    return counts.most_common(limit)
+
+
+def hit_rate(records, keys=None):
+    """Share of searches (optionally only those for `keys`) answered from the offers cache."""
+    total = hits = 0
+    for row in records:
+        if keys is None or query_key(row) in keys:
+            total += 1
+            hits += row.status in (HIT, STALE)
+    return hits / total if total else None
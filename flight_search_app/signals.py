@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .airport_index import invalidate_airport_index
+from .models import Airport, AirportAlias
+
+
+@receiver(post_save, sender=Airport)
+@receiver(post_delete, sender=Airport)
+@receiver(post_save, sender=AirportAlias)
+@receiver(post_delete, sender=AirportAlias)
+def airport_changed(sender, **kwargs):
+    """Rebuild the in-memory airport index (and alias map) after any edit (admin, shell, seed)."""
+    invalidate_airport_index()
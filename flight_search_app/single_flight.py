@@ -0,0 +1,160 @@
+"""
+Single-flight: concurrent callers asking for the same key share one call.
+
+The first caller for a key (the leader) runs the function; callers arriving
+while it is in flight wait and receive the leader's result, or its exception.
+Nothing is remembered once the call returns; caching is the OfferCache's job.
+
+SingleFlight works across the threads (or, via ado(), the tasks of one event
+loop) of a single process. FileLock extends the idea across worker processes
+on one machine: the leader of each process takes an flock on a per-key file,
+and whoever gets it second finds the result in the shared (file) cache.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import weakref
+
+from .amadeus_client import Counters
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-process mode is unavailable
+    fcntl = None
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key within one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = weakref.WeakKeyDictionary()  # event loop -> {key: [Task, waiters]}
+        self.counters = Counters('leaders', 'coalesced')
+
+    def do(self, key, fn):
+        """Returns (result, shared): `shared` is True when another caller's call was reused."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self.counters.incr('coalesced')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        self.counters.incr('leaders')
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, fn):
+        """
+        Async do(): `fn` is a zero-argument coroutine function. The shared call
+        runs as its own task, so one waiter being cancelled (its client went
+        away) does not cancel the call for the others; it is cancelled only
+        when no waiter is left.
+        """
+        loop = asyncio.get_running_loop()
+        calls = self._tasks.setdefault(loop, {})
+        call = calls.get(key)
+        if call is not None and call[0].cancelled():
+            call = None  # cancelled by its last waiter; the done callback has not run yet
+        shared = call is not None
+        if shared:
+            self.counters.incr('coalesced')
+        else:
+            self.counters.incr('leaders')
+            call = calls[key] = [asyncio.ensure_future(fn()), 0]
+
+            def forget(_, call=call):
+                if calls.get(key) is call:
+                    del calls[key]
+            call[0].add_done_callback(forget)
+        task = call[0]
+        call[1] += 1
+        try:
+            return await asyncio.shield(task), shared
+        finally:
+            call[1] -= 1
+            if not call[1] and not task.done():
+                task.cancel()
+                # The task finishes cancelling on a later loop iteration; callers
+                # arriving before then start a new call rather than join this one.
+                if calls.get(key) is call:
+                    del calls[key]
+
+    def stats(self):
+        return self.counters.as_dict()
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on `<directory>/<sha1(key)>.lock`, shared by every
+    process on the machine. Acquiring gives up after `timeout` seconds so a
+    stuck leader cannot hold the other workers forever.
+    """
+
+    POLL_INTERVAL = 0.02
+
+    def __init__(self, directory, key, timeout=30):
+        self.path = os.path.join(directory, hashlib.sha1(key.encode()).hexdigest() + '.lock')
+        self.timeout = timeout
+        self.fd = None
+        self.waited = False
+        os.makedirs(directory, exist_ok=True)
+
+    def _try_lock(self):
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            self.waited = True
+            return False
+
+    def acquire(self):
+        """Returns True once locked, False on timeout (the caller then proceeds unlocked)."""
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        while not self._try_lock():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.POLL_INTERVAL)
+        return True
+
+    async def aacquire(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        while not self._try_lock():
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(self.POLL_INTERVAL)
+        return True
+
+    def release(self):
+        if self.fd is not None:
+            # Closing the descriptor drops the flock.
+            os.close(self.fd)
+            self.fd = None
@@ -0,0 +1,22 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def assert_num_queries(expected, using=DEFAULT_DB_ALIAS, at_most=False):
+    """
+    Fails if the wrapped block runs a different number of queries than expected
+    (or more than expected when at_most=True). Usable outside TestCase, e.g.
+
+        with assert_num_queries(1):
+            client.get('/results/?origin=KHI&destination=DXB&departure_date=2026-01-10')
+    """
+    with CaptureQueriesContext(connections[using]) as ctx:
+        yield ctx
+    executed = len(ctx.captured_queries)
+    if executed > expected if at_most else executed != expected:
+        queries = "\n".join(f"{i}. {q['sql']}" for i, q in enumerate(ctx.captured_queries, start=1))
+        bound = "at most " if at_most else ""
+        raise AssertionError(f"{executed} queries executed, {bound}{expected} expected\nCaptured queries were:\n{queries}")
@@ -0,0 +1,34 @@
+import io
+
+from django.test import SimpleTestCase
+
+from flight_search_app.airport_import import read_csv, read_json
+from flight_search_app.airport_index import AirportRow
+
+KHI = AirportRow('KHI', 'Jinnah International', 'Karachi', 'Pakistan', 80)
+DXB = AirportRow('DXB', 'Dubai International', 'Dubai', 'United Arab Emirates', 0)
+
+
+class ReadJsonTests(SimpleTestCase):
+    def test_array(self):
+        text = ('[{"code": "KHI", "name": "Jinnah International", "city": "Karachi", "country": "Pakistan",'
+                ' "popularity": 80},\n {"iata_code": "dxb", "name": "Dubai International", "city": "Dubai",'
+                ' "country": "United Arab Emirates"}]')
+        self.assertEqual(list(read_json(io.StringIO(text))), [KHI, DXB])
+
+    def test_json_lines_are_read_one_line_at_a_time(self):
+        lines = iter([
+            '{"code": "KHI", "name": "Jinnah International", "city": "Karachi", "country": "Pakistan", "popularity": 80}\n',
+            '\n',
+            '{"code": "DXB", "name": "Dubai International", "city": "Dubai", "country": "United Arab Emirates"}\n',
+        ])
+        rows = read_json(lines)
+        self.assertEqual(next(rows), KHI)
+        self.assertEqual(len(list(lines)), 2)  # nothing read past the first record
+
+
+class ReadCsvTests(SimpleTestCase):
+    def test_bad_popularity_is_imported_as_zero(self):
+        text = "code,name,city,country,popularity\nKHI,Jinnah International,Karachi,Pakistan,high\n"
+        with self.assertLogs('flight_search_app.airport_import', 'WARNING'):
+            self.assertEqual(list(read_csv(io.StringIO(text))), [KHI._replace(popularity=0)])
@@ -0,0 +1,58 @@
+from unittest import mock
+
+from amadeus import ResponseError
+from django.test import SimpleTestCase
+
+from flight_search_app import amadeus_client
+from flight_search_app.amadeus_client import AmadeusClientManager
+from flight_search_app.fake_amadeus import FakeAmadeusServer
+
+PARAMS = {'originLocationCode': 'KHI', 'destinationLocationCode': 'DXB', 'departureDate': '2030-01-10', 'adults': 1}
+
+
+class SharedTokenTests(SimpleTestCase):
+    """The shared client against the local fake token and flight-offers endpoints."""
+
+    def start(self, token_ttl=1799, refresh_margin=60):
+        self.server = FakeAmadeusServer(token_ttl=token_ttl).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        host, port = self.server.server_address[:2]
+        self.manager = AmadeusClientManager('id', 'secret', refresh_margin=refresh_margin,
+                                            host=host, port=port, ssl=False)
+        patcher = mock.patch.object(amadeus_client, 'get_amadeus_client', self.manager.get_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self):
+        return amadeus_client.flight_offers(PARAMS)
+
+    def test_token_is_fetched_once_and_shared(self):
+        self.start()
+        self.assertEqual(len(self.search()), 10)
+        self.search()
+        self.assertEqual(self.server.stats['tokens_issued'], 1)
+        self.assertEqual(self.manager.stats()['token_refreshes'], 1)
+
+    def test_token_is_refreshed_ahead_of_expiry(self):
+        # Every token is within the refresh margin as soon as it is issued
+        self.start(token_ttl=30, refresh_margin=60)
+        self.search()
+        self.search()
+        self.assertEqual(self.server.stats['tokens_issued'], 2)
+
+    def test_revoked_token_is_replaced_after_a_401(self):
+        self.start()
+        self.search()
+        self.server.tokens.clear()
+        self.assertEqual(len(self.search()), 10)
+        self.assertEqual(self.server.stats['tokens_issued'], 2)
+        self.search()
+        self.assertEqual(self.server.stats['tokens_issued'], 2)
+
+    def test_second_401_is_raised(self):
+        self.start(token_ttl=0)  # every token is already expired on the server
+        with self.assertRaises(ResponseError) as raised:
+            self.search()
+        self.assertEqual(raised.exception.response.status_code, 401)
+        self.assertEqual(self.server.stats['tokens_issued'], 2)
@@ -0,0 +1,32 @@
+from django.test import TestCase
+
+from flight_search_app.autocomplete import cities_payload
+from flight_search_app.models import Airport
+
+
+class CitiesPayloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rows = [
+            ('LHR', 'Heathrow', 'London', 'United Kingdom', 100),
+            ('LGW', 'Gatwick', 'London', 'United Kingdom', 70),
+            ('YXU', 'London International', 'London', 'Canada', 10),
+            ('LCY', 'City', 'London', 'United Kingdom', 20),
+            ('LDY', 'City of Derry', 'Londonderry', 'United Kingdom', 5),
+        ]
+        rows += [(f'C{n:02d}', f'Airport {n}', f'City {n}', 'Testland', n) for n in range(12)]
+        Airport.objects.bulk_create(Airport(iata_code=c, name=n, city=ci, country=co, popularity=p)
+                                    for c, n, ci, co, p in rows)
+
+    def test_one_entry_per_city_with_its_most_popular_airport(self):
+        cities = cities_payload('lon')['cities']
+        self.assertEqual([(c['code'], c['name']) for c in cities], [
+            ('LHR', 'London, United Kingdom'), ('YXU', 'London, Canada'), ('LDY', 'Londonderry, United Kingdom'),
+        ])
+
+    def test_country_filter(self):
+        self.assertEqual([c['code'] for c in cities_payload('lon', 'canada')['cities']], ['YXU'])
+
+    def test_at_most_ten_cities_most_popular_first(self):
+        codes = [c['code'] for c in cities_payload('city')['cities']]
+        self.assertEqual(codes, [f'C{n:02d}' for n in range(11, 1, -1)])
@@ -0,0 +1,34 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from flight_search_app.db_router import READ_ONLY_ALIAS, ReadOnlyRouter
+from flight_search_app.models import Airport, AirportAlias, UserContact
+
+
+def loaded_from(alias, model=Airport):
+    obj = model()
+    obj._state.db = alias
+    return obj
+
+
+@mock.patch('flight_search_app.db_router.read_alias', return_value=READ_ONLY_ALIAS)
+class ReadOnlyRouterTests(SimpleTestCase):
+    router = ReadOnlyRouter()
+
+    def test_airport_reads_go_to_the_read_only_alias(self, _):
+        self.assertEqual(self.router.db_for_read(Airport), READ_ONLY_ALIAS)
+        self.assertEqual(self.router.db_for_read(AirportAlias), READ_ONLY_ALIAS)
+        self.assertIsNone(self.router.db_for_read(UserContact))
+
+    def test_writes_stay_on_default(self, _):
+        self.assertEqual(self.router.db_for_write(Airport, instance=loaded_from(READ_ONLY_ALIAS)), 'default')
+        self.assertIsNone(self.router.db_for_write(UserContact))
+
+    def test_relations_between_the_aliases_are_allowed(self, _):
+        self.assertTrue(self.router.allow_relation(loaded_from(READ_ONLY_ALIAS), loaded_from('default', UserContact)))
+        self.assertIsNone(self.router.allow_relation(loaded_from('other'), loaded_from('default')))
+
+    def test_read_only_alias_is_never_migrated(self, _):
+        self.assertFalse(self.router.allow_migrate(READ_ONLY_ALIAS, 'flight_search_app'))
+        self.assertIsNone(self.router.allow_migrate('default', 'flight_search_app'))
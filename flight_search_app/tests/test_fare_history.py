@@ -0,0 +1,85 @@
+import os
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.db import IntegrityError
+from django.test import TestCase
+
+from flight_search_app.fare_history import FareRecorder, fare_calendar, summarize, write_observations
+from flight_search_app.models import DailyFare, FareObservation
+
+START = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+def observation(price, minutes=0, adults=1, departure_date=date(2030, 1, 10), currency='EUR'):
+    params = {'originLocationCode': 'KHI', 'destinationLocationCode': 'DXB',
+              'departureDate': departure_date.isoformat(), 'adults': adults}
+    offers = [{'price': {'total': price, 'currency': currency}}]
+    return summarize(params, offers, observed_at=START + timedelta(minutes=minutes))
+
+
+class DailyFareUpsertTests(TestCase):
+    def test_keeps_the_cheapest_and_the_latest_price(self):
+        write_observations([observation('300.00', 0), observation('250.00', 1)])
+        write_observations([observation('280.00', 2)])
+        row = DailyFare.objects.get()
+        self.assertEqual((row.min_price, row.latest_price, row.observations), (Decimal('250.00'), Decimal('280.00'), 3))
+        self.assertEqual(row.min_seen_at, START + timedelta(minutes=1))
+        self.assertEqual(FareObservation.objects.count(), 3)
+
+    def test_party_sizes_and_dates_are_kept_apart(self):
+        write_observations([
+            observation('300.00'), observation('600.00', adults=2),
+            observation('200.00', departure_date=date(2030, 1, 11)),
+        ])
+        self.assertEqual(DailyFare.objects.count(), 3)
+        calendar = fare_calendar('KHI', 'DXB', 'ECONOMY', 1, date(2030, 1, 10), 7)
+        self.assertEqual([(r.departure_date.day, r.min_price) for r in calendar],
+                         [(10, Decimal('300.00')), (11, Decimal('200.00'))])
+
+    def test_other_currency_starts_over(self):
+        write_observations([observation('300.00', 0), observation('900.00', 1, currency='PKR')])
+        row = DailyFare.objects.get()
+        self.assertEqual((row.currency, row.min_price), ('PKR', Decimal('900.00')))
+
+
+class FareRecorderTests(TestCase):
+    def test_flush_retries_a_batch_after_an_integrity_error(self):
+        recorder = FareRecorder()
+        recorder.queue.extend([observation('300.00'), observation('250.00', 1)])
+        bulk_create = DailyFare.objects.bulk_create
+        calls = []
+
+        def conflicting_bulk_create(rows, *args, **kwargs):
+            # The first attempt loses the race for the row to another worker
+            calls.append(len(rows))
+            if len(calls) == 1:
+                raise IntegrityError('UNIQUE constraint failed')
+            return bulk_create(rows, *args, **kwargs)
+
+        with mock.patch.object(DailyFare.objects, 'bulk_create', side_effect=conflicting_bulk_create):
+            self.assertEqual(recorder.flush(), 2)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(DailyFare.objects.get().observations, 2)
+        self.assertEqual(FareObservation.objects.count(), 2)  # the failed attempt was rolled back
+
+    @mock.patch('flight_search_app.fare_history.atexit')
+    @mock.patch('flight_search_app.fare_history.threading.Thread')
+    def test_writer_thread_is_started_again_after_a_fork(self, thread, atexit):
+        recorder = FareRecorder()
+        recorder.observe(*self.answer())
+        self.assertEqual(thread.call_count, 1)
+        recorder.observe(*self.answer())
+        self.assertEqual(thread.call_count, 1)
+
+        recorder._pid = os.getpid() + 1  # as if this process had been forked from the one that started it
+        recorder.observe(*self.answer())
+        self.assertEqual(thread.call_count, 2)
+        self.assertEqual(len(recorder.queue), 1)  # the parent's queue is left to the parent
+        atexit.register.assert_called_once_with(recorder._flush_quietly)
+
+    @staticmethod
+    def answer():
+        params = {'originLocationCode': 'KHI', 'destinationLocationCode': 'DXB', 'departureDate': '2030-01-10'}
+        return params, [{'price': {'total': '300.00', 'currency': 'EUR'}}]
@@ -0,0 +1,60 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from flight_search_app.airport_index import AirportIndex, get_airport_index, invalidate_airport_index
+from flight_search_app.models import Airport
+
+ROWS = [
+    ('KHI', 'Jinnah International', 'Karachi', 'Pakistan', 80),
+    ('FRA', 'Frankfurt am Main', 'Frankfurt', 'Germany', 90),
+    ('LHR', 'Heathrow', 'London', 'United Kingdom', 100),
+]
+
+
+class FuzzyLookupTests(SimpleTestCase):
+    def test_resolve_builds_the_fuzzy_index_when_a_typo_needs_it(self):
+        index = AirportIndex(ROWS)
+        self.assertIsNone(index.fuzzy)
+        self.assertEqual(index.resolve('karachy'), 'KHI')
+        self.assertIsNotNone(index.fuzzy)
+
+    def test_resolve_can_skip_the_typo_fallback_until_ready(self):
+        index = AirportIndex(ROWS)
+        self.assertIsNone(index.resolve('frankfort', wait_for_fuzzy=False))
+        self.assertIsNone(index.fuzzy)
+        self.assertEqual(index.resolve('frankfort'), 'FRA')
+
+    def test_search_lists_typo_matches_when_nothing_contains_the_term(self):
+        index = AirportIndex(ROWS)
+        index.build_fuzzy()
+        self.assertEqual([a['code'] for a in index.search('karachy')['airports']], ['KHI'])
+
+
+class AutocompleteCachingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Airport.objects.bulk_create(
+            Airport(iata_code=code, name=name, city=city, country=country, popularity=popularity)
+            for code, name, city, country, popularity in ROWS
+        )
+
+    def setUp(self):
+        invalidate_airport_index()
+        self.addCleanup(invalidate_airport_index)
+
+    def get(self, term, **headers):
+        return self.client.get('/api/search_airports/', {'q': term}, HTTP_HOST='hassan4080.pythonanywhere.com', **headers)
+
+    def test_answers_without_typo_matching_are_not_cached(self):
+        with mock.patch.object(AirportIndex, 'start_fuzzy_build'):
+            response = self.get('karachy')
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_complete_answers_carry_an_etag(self):
+        get_airport_index().ensure_fuzzy()
+        response = self.get('karachy')
+        self.assertEqual([a['code'] for a in response.json()['airports']], ['KHI'])
+        self.assertIn('public', response['Cache-Control'])
+        self.assertEqual(self.get('karachy', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
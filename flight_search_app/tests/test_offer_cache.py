@@ -0,0 +1,80 @@
+import threading
+from contextvars import ContextVar
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+from flight_search_app.cache_backends import BoundedLocMemCache
+from flight_search_app.offer_cache import HIT, MISS, STALE, OfferCache
+
+PARAMS = {'originLocationCode': 'KHI', 'destinationLocationCode': 'DXB', 'departureDate': '2030-01-10', 'adults': 1}
+
+
+def failing_fetch():
+    raise RuntimeError('upstream down')
+
+
+class OfferCacheTests(SimpleTestCase):
+    def make_cache(self, **options):
+        return OfferCache(LocMemCache(f'test-offers-{self.id()}', {}), **options)
+
+    def test_miss_then_hit(self):
+        cache = self.make_cache()
+        self.assertEqual(cache.get_or_fetch(PARAMS, lambda: ['offer']), (['offer'], MISS))
+        self.assertEqual(cache.get_or_fetch(PARAMS, failing_fetch), (['offer'], HIT))
+
+    def test_key_ignores_case_but_not_the_date(self):
+        lower = dict(PARAMS, originLocationCode='khi')
+        later = dict(PARAMS, departureDate='2030-01-11')
+        self.assertEqual(OfferCache.make_key(PARAMS), OfferCache.make_key(lower))
+        self.assertNotEqual(OfferCache.make_key(PARAMS), OfferCache.make_key(later))
+
+    def test_stale_entry_is_served_while_it_is_refreshed(self):
+        cache = self.make_cache(ttl=0, stale_ttl=60)
+        cache.get_or_fetch(PARAMS, lambda: ['old'])
+        self.assertEqual(cache.get_or_fetch(PARAMS, lambda: ['new']), (['old'], STALE))
+
+    def test_background_refresh_runs_in_the_callers_context(self):
+        cache = self.make_cache(ttl=0, stale_ttl=60)
+        cache.get_or_fetch(PARAMS, lambda: ['old'])
+        request_id = ContextVar('request_id', default=None)
+        seen = []
+        refreshed = threading.Event()
+
+        def fetch():
+            seen.append(request_id.get())
+            refreshed.set()
+            return ['new']
+
+        request_id.set('r1')
+        cache.get_or_fetch(PARAMS, fetch)
+        self.assertTrue(refreshed.wait(5))
+        self.assertEqual(seen, ['r1'])
+
+    def test_failed_fetch_without_an_entry_raises(self):
+        cache = self.make_cache()
+        with self.assertRaises(RuntimeError):
+            cache.get_or_fetch(PARAMS, failing_fetch)
+
+
+class BoundedLocMemCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used_entries_over_max_bytes(self):
+        cache = BoundedLocMemCache(f'test-bounded-{self.id()}', {'OPTIONS': {'MAX_BYTES': 3000}})
+        value = 'x' * 900
+        for key in 'abc':
+            cache.set(key, value)
+        cache.get('a')  # now more recently used than 'b'
+        cache.set('d', value)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual([cache.get(key) is not None for key in 'acd'], [True] * 3)
+        self.assertLessEqual(cache.total_bytes, 3000)
+
+    def test_total_bytes_follows_deletes_and_clear(self):
+        cache = BoundedLocMemCache(f'test-bounded-{self.id()}', {'OPTIONS': {'MAX_BYTES': 10000}})
+        cache.set('a', 'x' * 100)
+        cache.set('b', 'x' * 100)
+        both = cache.total_bytes
+        cache.delete('a')
+        self.assertLess(cache.total_bytes, both)
+        cache.clear()
+        self.assertEqual(cache.total_bytes, 0)
@@ -0,0 +1,81 @@
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+
+from flight_search_app.fake_amadeus import make_offers
+from flight_search_app.offer_set import OfferFilters, clear_offer_sets, get_offer_set, offers_fingerprint
+
+NO_FILTERS = OfferFilters()
+
+
+class OfferSetTestCase(TestCase):
+    def setUp(self):
+        clear_offer_sets()
+        self.addCleanup(clear_offer_sets)
+
+    def offer_set(self, departure_date='2030-01-10', adults=1, count=10, seed=1):
+        offers = make_offers('KHI', 'DXB', departure_date, count=count, seed=seed)
+        return get_offer_set(offers, 'KHI', 'DXB', departure_date, adults, 'Economy')
+
+
+class CursorTests(OfferSetTestCase):
+    def test_pages_round_trip(self):
+        offer_set = self.offer_set()
+        first = offer_set.query(NO_FILTERS, 'cheapest', limit=4)
+        second = offer_set.query(NO_FILTERS, 'cheapest', first.next_cursor, limit=4)
+        last = offer_set.query(NO_FILTERS, 'cheapest', second.next_cursor, limit=4)
+        ordered = list(offer_set.query(NO_FILTERS, 'cheapest', limit=10).flights)
+        self.assertEqual(list(first.flights + second.flights + last.flights), ordered)
+        self.assertIsNone(first.prev_cursor)
+        self.assertIsNone(last.next_cursor)
+        self.assertEqual(offer_set.query(NO_FILTERS, 'cheapest', second.prev_cursor, limit=4).flights, first.flights)
+
+    def test_cursor_of_another_offer_set_restarts_at_the_first_page(self):
+        stale = self.offer_set(seed=1).query(NO_FILTERS, limit=4).next_cursor
+        current = self.offer_set(seed=2)
+        self.assertEqual(current.query(NO_FILTERS, cursor=stale, limit=4).flights,
+                         current.query(NO_FILTERS, limit=4).flights)
+
+    def test_malformed_cursor_restarts_at_the_first_page(self):
+        offer_set = self.offer_set()
+        for cursor in ('garbage', '!!', 'Zm9vOmJhcg'):
+            self.assertEqual(offer_set.query(NO_FILTERS, cursor=cursor, limit=4).flights,
+                             offer_set.query(NO_FILTERS, limit=4).flights)
+
+
+class FacetTests(OfferSetTestCase):
+    def test_facets_ignore_their_own_filter(self):
+        offer_set = self.offer_set(count=30)
+        everything = offer_set.query(NO_FILTERS)
+        carrier = everything.facets['carriers'][0][0]
+        page = offer_set.query(OfferFilters.from_query(QueryDict(f'carrier={carrier}')))
+        self.assertEqual(page.facets['carriers'], everything.facets['carriers'])
+        self.assertEqual(page.total, dict(everything.facets['carriers'])[carrier])
+        self.assertTrue(all(f.airline == carrier for f in page.flights))
+        self.assertEqual(sum(count for _, count in page.facets['stops']), page.total)
+
+
+class OfferSetCacheTests(OfferSetTestCase):
+    def test_same_answer_is_parsed_once(self):
+        self.assertIs(self.offer_set(), self.offer_set())
+
+    def test_sets_are_kept_apart_by_date_and_adults(self):
+        base = self.offer_set()
+        self.assertIsNot(self.offer_set(departure_date='2030-01-11'), base)
+        self.assertIsNot(self.offer_set(adults=2), base)
+        self.assertIs(self.offer_set(), base)
+
+    def test_fingerprint_covers_segment_times(self):
+        # Same seed: identical ids, prices and flights, one day apart
+        day1 = make_offers('KHI', 'DXB', '2030-01-10', seed=1)
+        day2 = make_offers('KHI', 'DXB', '2030-01-11', seed=1)
+        self.assertEqual([o['price'] for o in day1], [o['price'] for o in day2])
+        self.assertNotEqual(offers_fingerprint(day1), offers_fingerprint(day2))
+
+    @override_settings(PARSED_OFFER_SETS_MAX=2)
+    def test_least_recently_used_set_is_evicted(self):
+        first = self.offer_set(seed=1)
+        second = self.offer_set(seed=2)
+        self.offer_set(seed=1)  # now more recent than seed 2
+        self.offer_set(seed=3)
+        self.assertIs(self.offer_set(seed=1), first)
+        self.assertIsNot(self.offer_set(seed=2), second)
@@ -0,0 +1,55 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from flight_search_app.airport_index import get_airport_index, invalidate_airport_index, resolve_airports
+from flight_search_app.fake_amadeus import HUBS, make_offers
+from flight_search_app.models import Airport
+from flight_search_app.testing import assert_num_queries
+
+CODES = ['KHI'] + HUBS  # HUBS includes DXB
+
+
+class QueryCountTests(TestCase):
+    """The query counts promised when airport lookups were batched for the results page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Airport.objects.bulk_create(
+            Airport(iata_code=code, name=f'{code} International', city=f'{code} City', country='Testland')
+            for code in CODES
+        )
+        cls.user = User.objects.create_user('traveller', password='secret')
+
+    def setUp(self):
+        invalidate_airport_index()
+        self.addCleanup(invalidate_airport_index)
+
+    def test_resolve_airports_cold_index_is_one_query(self):
+        with assert_num_queries(1):
+            airports = resolve_airports(CODES + ['XXX'])
+        self.assertEqual(sorted(airports), sorted(CODES))
+
+    def test_resolve_airports_warm_index_is_no_query(self):
+        get_airport_index()
+        with assert_num_queries(0):
+            self.assertEqual(len(resolve_airports(CODES)), len(CODES))
+
+    def results(self, departure_date, count):
+        offers = make_offers('KHI', 'DXB', departure_date, count=count)
+        with mock.patch('flight_search_app.search.fetch_offers', return_value=offers):
+            return self.client.get('/results/', {
+                'origin': 'KHI', 'destination': 'DXB', 'departure_date': departure_date,
+            }, HTTP_HOST='hassan4080.pythonanywhere.com')
+
+    def test_results_page_query_count_does_not_grow_with_offers(self):
+        self.client.force_login(self.user)
+        get_airport_index()
+        # Session and user only: every airport comes from the warm index
+        with assert_num_queries(2):
+            response = self.results('2030-01-10', count=2)
+        self.assertEqual(response.context['total'], 2)
+        with assert_num_queries(2):
+            response = self.results('2030-01-11', count=20)
+        self.assertEqual(response.context['total'], 20)
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+from flight_search_app.offer_cache import COALESCED, MISS, OfferCache
+from flight_search_app.single_flight import SingleFlight
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_error_reaches_the_caller(self):
+        def fail():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            SingleFlight().do('key', fail)
+
+    def test_sequential_calls_are_not_shared(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do('key', lambda: 1), (1, False))
+        self.assertEqual(flight.do('key', lambda: 2), (2, False))
+
+    def test_tasks_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'offers'
+
+        async def run():
+            return await asyncio.gather(*(flight.ado('key', fetch) for _ in range(3)))
+
+        results = asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True])
+
+    def test_caller_arriving_after_the_last_waiter_cancelled_starts_a_new_call(self):
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return 'offers'
+
+        async def run():
+            first = asyncio.create_task(flight.ado('key', fetch))
+            await asyncio.sleep(0)
+            first.cancel()
+            # Joins before the cancelled call has finished unwinding
+            second = asyncio.create_task(flight.ado('key', fetch))
+            with self.assertRaises(asyncio.CancelledError):
+                await first
+            return await second
+
+        self.assertEqual(asyncio.run(run()), ('offers', False))
+
+
+class OfferCacheCoalescingTests(SimpleTestCase):
+    def test_concurrent_misses_make_one_upstream_call(self):
+        cache = OfferCache(LocMemCache(f'test-offers-{self.id()}', {}), single_flight=SingleFlight())
+        params = {'originLocationCode': 'KHI', 'destinationLocationCode': 'DXB', 'departureDate': '2030-01-10'}
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return ['offer']
+
+        statuses = []
+        threads = [threading.Thread(target=lambda: statuses.append(cache.get_or_fetch(params, fetch)[1]))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while cache.single_flight.stats()['coalesced'] < 3:
+            threading.Event().wait(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(statuses), [COALESCED] * 3 + [MISS])
@@ -0,0 +1,146 @@
+import asyncio
+from unittest import mock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+from flight_search_app.offer_cache import DEGRADED, MISS, OfferCache
+from flight_search_app.upstream_guard import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, UpstreamGuard, UpstreamUnavailable,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch('flight_search_app.upstream_guard.logger')  # quiet the open/close messages
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, max_reset_timeout=25, clock=self.clock)
+
+    def fail(self, times):
+        for _ in range(times):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record(True)
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail(2)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.fail(1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_after(), 10)
+
+    def test_success_resets_the_failure_count(self):
+        self.fail(2)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(False)
+        self.fail(2)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_lets_one_probe_through(self):
+        self.fail(3)
+        self.clock.advance(10)
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_successful_probe_closes(self):
+        self.fail(3)
+        self.clock.advance(10)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(False)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.failures, 0)
+        self.assertEqual(self.breaker.counters.as_dict()['closed'], 1)
+
+    def test_failed_probe_reopens_for_longer_up_to_the_maximum(self):
+        self.fail(3)
+        self.clock.advance(10)
+        self.fail(1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.retry_after(), 20)
+        self.clock.advance(20)
+        self.fail(1)
+        self.assertEqual(self.breaker.retry_after(), 25)
+
+    def test_abandoned_probe_frees_its_slot(self):
+        self.fail(3)
+        self.clock.advance(10)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(None)
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+
+
+class UpstreamGuardTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch('flight_search_app.upstream_guard.logger')  # quiet the open/close messages
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rejects_without_calling_while_open(self):
+        clock = FakeClock()
+        guard = UpstreamGuard(CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock))
+        with self.assertRaises(OSError):
+            guard.call(self.raise_os_error)
+        calls = []
+        with self.assertRaises(UpstreamUnavailable) as raised:
+            guard.call(lambda: calls.append(1))
+        self.assertEqual(calls, [])
+        self.assertEqual(raised.exception.retry_after, 30)
+
+    @staticmethod
+    def raise_os_error():
+        raise OSError('connection reset')
+
+
+class DegradedFallbackTests(SimpleTestCase):
+    """OfferCache serves the last known answer when the guard rejects or the call fails."""
+
+    params = {'originLocationCode': 'KHI', 'destinationLocationCode': 'DXB', 'departureDate': '2030-01-10'}
+
+    def setUp(self):
+        # Entries expire at once and are then kept only as the fallback
+        self.cache = OfferCache(LocMemCache(f'test-degraded-{self.id()}', {}), ttl=0, stale_ttl=0, fallback_ttl=60)
+
+    @staticmethod
+    def unavailable():
+        raise UpstreamUnavailable('circuit open', 30)
+
+    def test_expired_entry_is_served_as_degraded(self):
+        self.cache.get_or_fetch(self.params, lambda: ['old'])
+        self.assertEqual(self.cache.get_or_fetch(self.params, self.unavailable), (['old'], DEGRADED))
+        self.assertEqual(self.cache.stats()['degraded'], 1)
+
+    def test_expired_entry_is_replaced_when_the_call_succeeds(self):
+        self.cache.get_or_fetch(self.params, lambda: ['old'])
+        self.assertEqual(self.cache.get_or_fetch(self.params, lambda: ['new']), (['new'], MISS))
+
+    def test_error_is_raised_without_a_fallback(self):
+        with self.assertRaises(UpstreamUnavailable):
+            self.cache.get_or_fetch(self.params, self.unavailable)
+
+    def test_async_fallback(self):
+        async def old():
+            return ['old']
+
+        async def unavailable():
+            self.unavailable()
+
+        async def run():
+            await self.cache.aget_or_fetch(self.params, old)
+            return await self.cache.aget_or_fetch(self.params, unavailable)
+
+        self.assertEqual(asyncio.run(run()), (['old'], DEGRADED))
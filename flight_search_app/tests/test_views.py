@@ -0,0 +1,29 @@
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.test import TestCase
+
+
+class SearchInputTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('traveller', password='secret')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def results(self, **params):
+        query = {'origin': 'KHI', 'destination': 'DXB', 'departure_date': '2030-01-10', **params}
+        return self.client.get('/results/', query, HTTP_HOST='hassan4080.pythonanywhere.com')
+
+    def assert_sent_home(self, response, message):
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)], [message])
+
+    def test_missing_field(self):
+        self.assert_sent_home(self.results(destination=''), "Please fill in all required fields.")
+
+    def test_non_numeric_flex_days(self):
+        self.assert_sent_home(self.results(flex_days='abc'), "Adults and flexible days must be whole numbers.")
+
+    def test_non_numeric_adults(self):
+        self.assert_sent_home(self.results(adults='x'), "Adults and flexible days must be whole numbers.")
@@ -0,0 +1,206 @@
+"""
+Per-request stage timing, Server-Timing headers and in-process histograms.
+
+ServerTimingMiddleware gives every request a recorder in a ContextVar (so it
+follows the request across awaits in async views, and into the fan-out
+searches' pool threads, which run in a copy of the request's context). Code on
+the hot path wraps its work in `with stage('upstream'):`; when no recorder is
+active (management commands) that is a single ContextVar lookup. Concurrent
+blocks of one stage add up, so 'upstream' can exceed the request's total.
+
+When the response leaves, the stage totals are sent as a Server-Timing
+header (visible in the browser's network panel) and added to fixed-bucket
+histograms per route and stage. `metrics` renders those in the Prometheus
+text format, with p50/p95/p99 estimated from the buckets. Histograms are
+per worker process.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# Upper bounds in seconds, roughly x2.5 apart: 0.5ms up to 30s.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_recorder = ContextVar('stage_recorder', default=None)
+# Fan-out threads of one request update its stages concurrently
+_stages_lock = threading.Lock()
+
+
+@contextmanager
+def stage(name):
+    """Adds the time spent in the block to stage `name` of the current request, if any."""
+    stages = _recorder.get()
+    if stages is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _stages_lock:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is a bisect and three additions under a lock."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        slot = bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[slot] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.sum
+
+    @staticmethod
+    def quantile(q, counts, count, bounds=BUCKETS):
+        """Estimates a quantile by linear interpolation inside its bucket, as Prometheus does."""
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for slot, n in enumerate(counts):
+            if seen + n >= rank and n:
+                if slot == len(bounds):
+                    return bounds[-1]  # beyond the largest bucket: report its bound
+                lower = bounds[slot - 1] if slot else 0.0
+                return lower + (bounds[slot] - lower) * (rank - seen) / n
+            seen += n
+        return bounds[-1]
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def observe(route, name, seconds):
+    key = (route, name)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(key, Histogram())
+    histogram.observe(seconds)
+
+
+def histograms():
+    """{(route, stage): (bucket counts, count, sum)}"""
+    with _histograms_lock:
+        items = list(_histograms.items())
+    return {key: histogram.snapshot() for key, histogram in items}
+
+
+def reset():
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def server_timing_header(stages, total):
+    parts = [f"{name};dur={seconds * 1e3:.2f}" for name, seconds in stages.items()]
+    parts.append(f"total;dur={total * 1e3:.2f}")
+    return ", ".join(parts)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """All histograms in the Prometheus text exposition format (version 0.0.4)."""
+    lines = [
+        "# HELP flight_search_stage_seconds Time spent per request in each instrumented stage.",
+        "# TYPE flight_search_stage_seconds histogram",
+    ]
+    snapshots = sorted(histograms().items())
+    for (route, name), (counts, count, total) in snapshots:
+        labels = f'route="{_label(route)}",stage="{_label(name)}"'
+        cumulative = 0
+        for bound, n in zip(BUCKETS, counts):
+            cumulative += n
+            lines.append(f'flight_search_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'flight_search_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f'flight_search_stage_seconds_sum{{{labels}}} {total:.6f}')
+        lines.append(f'flight_search_stage_seconds_count{{{labels}}} {count}')
+
+    lines += [
+        "# HELP flight_search_stage_quantile_seconds Quantiles estimated from flight_search_stage_seconds buckets.",
+        "# TYPE flight_search_stage_quantile_seconds gauge",
+    ]
+    for (route, name), (counts, count, _) in snapshots:
+        for q in QUANTILES:
+            value = Histogram.quantile(q, counts, count)
+            if value is not None:
+                lines.append(
+                    f'flight_search_stage_quantile_seconds{{route="{_label(route)}",stage="{_label(name)}",'
+                    f'quantile="{q}"}} {value:.6f}'
+                )
+    return "\n".join(lines) + "\n"
+
+
+class ServerTimingMiddleware:
+    """
+    Times each request and its stages, adds a Server-Timing header and feeds
+    the histograms. Requests to unnamed routes (static files, 404s) only get
+    the header. Disabled entirely with SERVER_TIMING = False.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stages = {}
+        token = _recorder.set(stages)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self._finish(request, response, stages, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        stages = {}
+        token = _recorder.set(stages)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self._finish(request, response, stages, time.perf_counter() - start)
+
+    @staticmethod
+    def _finish(request, response, stages, total):
+        response['Server-Timing'] = server_timing_header(stages, total)
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else None
+        if route:
+            for name, seconds in stages.items():
+                observe(route, name, seconds)
+            observe(route, 'total', total)
+        return response
@@ -0,0 +1,256 @@
+"""
+Protection for the Amadeus flight-offers call: a circuit breaker, a local
+token-bucket rate limiter and a per-call latency budget.
+
+Without it, a slow or failing Amadeus held every search for the full client
+timeout before it failed, and the workers stayed pinned for as long as the
+outage lasted. UpstreamGuard.call() now:
+
+* rejects the call at once (UpstreamUnavailable) while the breaker is open,
+  i.e. after `failure_threshold` consecutive failures, until `reset_timeout`
+  has passed. Then one probe call is let through (half-open): success closes
+  the breaker, failure opens it again for twice as long (up to
+  `max_reset_timeout`);
+* takes a token from a bucket refilled at the API quota, waiting at most
+  `max_wait` seconds for one, so bursts are smoothed locally instead of
+  being answered with 429s;
+* runs the call inside amadeus_client.call_budget(), so the token fetch and
+  the search together cannot take longer than `budget` seconds. Running out
+  of budget counts as a failure.
+
+Network errors, timeouts, 5xx and 429 answers count as failures; other 4xx
+answers mean Amadeus is up and count as successes. When a call is rejected
+or fails, OfferCache falls back to the last answer it holds for the query.
+All of the state is per worker process.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+from amadeus import ResponseError
+from django.conf import settings
+
+from .amadeus_client import Counters, call_budget
+from .async_amadeus import UpstreamError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class UpstreamUnavailable(Exception):
+    """The call was not attempted: the breaker is open or the rate limit left no room within the budget."""
+
+    def __init__(self, reason, retry_after=None):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"Amadeus unavailable: {reason}")
+
+
+def is_upstream_failure(error):
+    """True for errors that say Amadeus is unhealthy rather than that the request was wrong."""
+    if isinstance(error, ResponseError):
+        status = error.response.status_code if error.response is not None else None
+    elif isinstance(error, UpstreamError):
+        status = error.status_code
+    else:
+        return isinstance(error, (OSError, TimeoutError, asyncio.TimeoutError))
+    return not status or status >= 500 or status == 429
+
+
+class CircuitBreaker:
+    """Thread-safe closed / open / half-open breaker counting consecutive failures."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, max_reset_timeout=300, half_open_calls=1,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_for = reset_timeout
+        self.probes = 0
+        self.counters = Counters('opened', 'closed', 'rejected')
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Returns True when a call may go ahead; it must then be followed by record()."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.open_for:
+                    self.counters.incr('rejected')
+                    return False
+                self.state = HALF_OPEN
+                self.probes = 0
+            if self.state == HALF_OPEN:
+                if self.probes >= self.half_open_calls:
+                    self.counters.incr('rejected')
+                    return False
+                self.probes += 1
+            return True
+
+    def record(self, failed):
+        """Reports the outcome of an allowed call: True (failure), False (success) or None (abandoned)."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probes = max(0, self.probes - 1)
+                if failed is None:
+                    return
+                if failed:
+                    self._open(min(self.open_for * 2, self.max_reset_timeout))
+                else:
+                    self._close()
+            elif failed:
+                self.failures += 1
+                if self.state == CLOSED and self.failures >= self.failure_threshold:
+                    self._open(self.reset_timeout)
+            elif failed is not None:
+                self.failures = 0
+
+    def retry_after(self):
+        """Seconds until the next probe is let through (0 unless open)."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0
+            return max(0.0, self.opened_at + self.open_for - self.clock())
+
+    def _open(self, open_for):
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.open_for = open_for
+        self.counters.incr('opened')
+        logger.warning("Amadeus circuit breaker opened for %.0fs", open_for)
+
+    def _close(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.open_for = self.reset_timeout
+        self.counters.incr('closed')
+        logger.info("Amadeus circuit breaker closed")
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=0.0):
+        """
+        Takes a token and returns the seconds to wait before using it (0 when
+        one was available), or None without taking one if that wait would
+        exceed `max_wait`.
+        """
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self.tokens -= 1  # may go negative: later callers queue behind the reservation
+            return wait
+
+
+class UpstreamGuard:
+    """Breaker, rate limiter and budget around one upstream operation."""
+
+    def __init__(self, breaker, bucket=None, budget=10.0, max_wait=0.5):
+        self.breaker = breaker
+        self.bucket = bucket
+        self.budget = budget
+        self.max_wait = max_wait
+        self.counters = Counters('calls', 'failures', 'rate_limited', 'waited')
+
+    def _admit(self):
+        """Returns the seconds to wait for a rate-limit token, or raises UpstreamUnavailable."""
+        if not self.breaker.allow():
+            raise UpstreamUnavailable('circuit open', self.breaker.retry_after())
+        wait = self.bucket.reserve(min(self.max_wait, self.budget)) if self.bucket else 0
+        if wait is None:
+            self.breaker.record(None)
+            self.counters.incr('rate_limited')
+            raise UpstreamUnavailable('rate limited', 1 / self.bucket.rate)
+        if wait:
+            self.counters.incr('waited')
+        self.counters.incr('calls')
+        return wait
+
+    def _record(self, failed):
+        if failed:
+            self.counters.incr('failures')
+        self.breaker.record(failed)
+
+    def call(self, fetch):
+        """Runs `fetch()` under the guard; raises UpstreamUnavailable when it is not allowed to run."""
+        wait = self._admit()
+        failed = None  # stays None when interrupted: neither a success nor a failure
+        try:
+            with call_budget(self.budget - wait):
+                if wait:
+                    time.sleep(wait)
+                result = fetch()
+            failed = False
+            return result
+        except Exception as error:
+            failed = is_upstream_failure(error)
+            raise
+        finally:
+            self._record(failed)
+
+    async def acall(self, fetch):
+        """Async call(): `fetch` is a zero-argument coroutine function, cancelled when the budget runs out."""
+        wait = self._admit()
+        failed = None  # stays None when the request is cancelled
+        try:
+            if wait:
+                await asyncio.sleep(wait)
+            result = await asyncio.wait_for(fetch(), self.budget - wait)
+            failed = False
+            return result
+        except Exception as error:
+            failed = is_upstream_failure(error)
+            raise
+        finally:
+            self._record(failed)
+
+    def stats(self):
+        stats = self.counters.as_dict()
+        stats.update(self.breaker.counters.as_dict())
+        stats['state'] = self.breaker.state
+        return stats
+
+
+_guard = None
+_guard_lock = threading.Lock()
+
+
+def get_upstream_guard():
+    """Returns the process-wide guard for flight-offers calls, configured by the AMADEUS_BREAKER_* settings."""
+    global _guard
+    if _guard is None:
+        with _guard_lock:
+            if _guard is None:
+                rate = getattr(settings, 'AMADEUS_RATE_LIMIT', 10)
+                _guard = UpstreamGuard(
+                    CircuitBreaker(
+                        failure_threshold=getattr(settings, 'AMADEUS_BREAKER_THRESHOLD', 5),
+                        reset_timeout=getattr(settings, 'AMADEUS_BREAKER_RESET', 30),
+                        max_reset_timeout=getattr(settings, 'AMADEUS_BREAKER_MAX_RESET', 300),
+                    ),
+                    TokenBucket(rate, getattr(settings, 'AMADEUS_RATE_BURST', rate)) if rate else None,
+                    budget=getattr(settings, 'AMADEUS_CALL_BUDGET', 10),
+                    max_wait=getattr(settings, 'AMADEUS_RATE_LIMIT_WAIT', 0.5),
+                )
+    return _guard
@@ -1,10 +1,11 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('about/', views.about, name='about'),
-    path('results/', views.search_results, name='results'),
+    path('results/', views.async_search_results if settings.ASYNC_SEARCH else views.search_results, name='results'),
     path('contact/', views.contact, name='contact'),
     path('payment/', views.payment_page, name='payment'),
     path('register/', views.register_view, name='register'),
@@ -12,4 +13,7 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('api/search_airports/', views.search_airports, name='search_airports'),
     path('api/search_cities/', views.search_cities, name='search_cities'),
+    path('api/search_flights/', views.search_flights, name='search_flights'),
+    path('api/fare_calendar/', views.fare_calendar, name='fare_calendar'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
@@ -1,210 +1,473 @@
-import os
+import asyncio
+import json
+import logging
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
-from amadeus import Client, ResponseError
-from .models import UserContact, PaymentAttempt, Airport
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.views import redirect_to_login
+from django.views.decorators.cache import cache_control
+from amadeus import ResponseError
+from .models import UserContact, PaymentAttempt
 from .forms import CustomUserCreationForm, CustomAuthenticationForm
-from .utils import get_iata_code
-
-# Initialize Amadeus Client
-def get_amadeus_client():
-    return Client(
-        client_id=os.getenv("AMADEUS_CLIENT_ID"),
-        client_secret=os.getenv("AMADEUS_CLIENT_SECRET")
-    )
-
-def format_duration(iso_duration):
-    """Converts PT1H30M to 1 Hr 30 Min"""
-    import re
-    if not iso_duration:
-        return ""
-    
-    hours = 0
-    minutes = 0
-    
-    # Extract hours
-    h_match = re.search(r'(\d+)H', iso_duration)
-    if h_match:
-        hours = int(h_match.group(1))
-        
-    # Extract minutes
-    m_match = re.search(r'(\d+)M', iso_duration)
-    if m_match:
-        minutes = int(m_match.group(1))
-        
-    return f"{hours} Hrs {minutes} Min"
+from .catalog import catalog_for_page
+from .fare_history import fare_calendar as fare_calendar_rows
+from .timing import prometheus_text, stage
+from .autocomplete import airports_payload, cached_autocomplete, cities_payload, precomputed_response
+from .async_amadeus import UpstreamError
+from .upstream_guard import UpstreamUnavailable
+from .search import (
+    CLASS_MAPPING, OfferMerger, SearchTimeout, agather_offers, airport_pairs, aresolve_location, build_api_params,
+    gather_offers, is_multi_airport, iter_pair_searches, iter_parsed_offers, resolve_location, track_degraded,
+)
+from .offer_set import OfferFilters, aget_offer_set, get_offer_set
+
+logger = logging.getLogger(__name__)
+
+def query_with(request, **params):
+    """Returns '?<current query string>' with the given params replaced (None removes one)."""
+    query = request.GET.copy()
+    for key, value in params.items():
+        if value is None:
+            query.pop(key, None)
+        else:
+            query[key] = value
+    return f"?{query.urlencode()}"
 
 def home(request):
-    return render(request, 'flight_search_app/search.html')
+    return render(request, 'flight_search_app/search.html', {'airport_catalog': catalog_for_page()})
 
 def about(request):
     return render(request, 'flight_search_app/about.html')
 
+def _search_input(request):
+    """
+    Reads the search fields shared by the sync and async results views.
+    Returns (search, None), or (None, message) when a required field is
+    missing or a number is not one.
+    """
+    raw_origin = request.GET.get('origin') or request.GET.get('origin_label')
+    raw_destination = request.GET.get('destination') or request.GET.get('destination_label')
+    departure_date = request.GET.get('departure_date')
+    if not all([raw_origin, raw_destination, departure_date]):
+        return None, "Please fill in all required fields."
+    try:
+        adults = int(request.GET.get('adults', 1))
+        flex_days = max(0, min(int(request.GET.get('flex_days') or 0), settings.FLEX_SEARCH_MAX_DAYS))
+    except ValueError:
+        return None, "Adults and flexible days must be whole numbers."
+    return {
+        'raw_origin': raw_origin,
+        'raw_destination': raw_destination,
+        'departure_date': departure_date,
+        'adults': adults,
+        'flight_class': request.GET.get('flight_class', 'Economy'),
+        'sort_by': request.GET.get('sort_by', ''),
+        'search_mode': request.GET.get('search_mode', ''),
+        'flex_days': flex_days,
+        'filters': OfferFilters.from_query(request.GET),
+    }, None
+
+def _location_missing(request, raw_location):
+    messages.error(request, f"Could not find an airport for '{raw_location}'. Please try a major city name or IATA code.")
+    return redirect('home')
+
+def _search_error(request, error):
+    status_code = error.response.status_code if isinstance(error, ResponseError) else error.status_code
+    logger.warning("Amadeus error %s: %s", status_code, error)
+    if status_code == 400:
+        messages.error(request, "Invalid Request: Please use valid 3-letter IATA Airport Codes (e.g., KHI for Karachi, LHE for Lahore, LHR for London).")
+    else:
+        messages.error(request, f"Error searching flights: {error}")
+
+def _search_timeout(request, error):
+    logger.warning("%s", error)
+    messages.error(request, "The search took too long to answer. Please try again.")
+
+def _upstream_unavailable(request, error):
+    logger.warning("Search skipped: %s", error)
+    messages.error(request, "Flight search is temporarily unavailable. Please try again in a minute.")
+
+def _no_pair_answered(request, pair_statuses):
+    """City mode: every airport pair timed out (or some failed and the rest timed out)."""
+    if 'ok' not in pair_statuses.values():
+        logger.warning("No airport pair answered: %s", pair_statuses)
+        messages.error(request, "None of the airports of these cities answered in time. Please try again in a moment.")
+
+def _results_context(request, search, origin, destination, page, calendar, pair_statuses, stale=False):
+    for entry in calendar:
+        entry['url'] = query_with(request, departure_date=entry['date'], cursor=None)
+    return {
+        'flights': page.flights if page else [],
+        'origin': origin,
+        'destination': destination,
+        'adults': search['adults'],
+        'flight_class': search['flight_class'],
+        'sort_by': search['sort_by'],
+        'flex_days': search['flex_days'],
+        'calendar': calendar,
+        'search_mode': search['search_mode'],
+        'pairs_searched': sum(1 for status in pair_statuses.values() if status == 'ok'),
+        'stale': stale,  # served from the last known answer while Amadeus is unavailable
+        'total': page.total if page else 0,
+        'facets': page.facets if page else {},
+        'next_url': query_with(request, cursor=page.next_cursor) if page and page.next_cursor else None,
+        'prev_url': query_with(request, cursor=page.prev_cursor) if page and page.prev_cursor else None,
+        'filters': search['filters'],
+        # Search parameters carried through the filter form and page links
+        'search_params': [(k, v) for k, v in request.GET.items() if k not in OfferFilters.PARAMS and k != 'cursor']
+    }
+
 @login_required(login_url='login')
 def search_results(request):
     if request.method == 'GET':
-        raw_origin = request.GET.get('origin') or request.GET.get('origin_label')
-        raw_destination = request.GET.get('destination') or request.GET.get('destination_label')
-        departure_date = request.GET.get('departure_date')
-        adults = int(request.GET.get('adults', 1))
-        flight_class = request.GET.get('flight_class', 'Economy')
-        sort_by = request.GET.get('sort_by', '')
-
-        if not all([raw_origin, raw_destination, departure_date]):
-            messages.error(request, "Please fill in all required fields.")
+        search, error = _search_input(request)
+        if error:
+            messages.error(request, error)
             return redirect('home')
 
-        # Convert inputs to IATA codes
-        origin = get_iata_code(raw_origin)
-        destination = get_iata_code(raw_destination)
+        # Convert inputs to IATA codes (city mode: every airport of each city)
+        city_mode = search['search_mode'] == 'city'
+        with stage('resolve'):
+            origin, origin_codes = resolve_location(search['raw_origin'], city_mode)
+            destination, destination_codes = resolve_location(search['raw_destination'], city_mode)
 
         if not origin:
-            messages.error(request, f"Could not find an airport for '{raw_origin}'. Please try a major city name or IATA code.")
-            return redirect('home')
-            
+            return _location_missing(request, search['raw_origin'])
         if not destination:
-            messages.error(request, f"Could not find an airport for '{raw_destination}'. Please try a major city name or IATA code.")
-            return redirect('home')
+            return _location_missing(request, search['raw_destination'])
 
-        # Map UI class names to Amadeus API values
-        class_mapping = {
-            'Economy': 'ECONOMY',
-            'Business': 'BUSINESS',
-            'First Class': 'FIRST'
-        }
-        travel_class = class_mapping.get(flight_class, 'ECONOMY')
-
-        amadeus = get_amadeus_client()
-        flights = []
+        calendar = []
+        pair_statuses = {}
+        page = None
+        degraded = []
 
         try:
-            # Build API parameters
-            api_params = {
-                'originLocationCode': origin,
-                'destinationLocationCode': destination,
-                'departureDate': departure_date,
-                'adults': adults,
-                'travelClass': travel_class,
-                'max': 10
-            }
-            
-            response = amadeus.shopping.flight_offers_search.get(**api_params)
-            
-            for offer in response.data:
-                # We only process the first itinerary (one-way logic for now)
-                itinerary = offer['itineraries'][0]
-                segments = itinerary['segments']
-                
-                # First Segment (Take off)
-                first_segment = segments[0]
-                # Last Segment (Landing)
-                last_segment = segments[-1]
-                
-                stops_count = len(segments) - 1
-                stop_info = "NON-STOP" if stops_count == 0 else f"{stops_count} STOP{'S' if stops_count > 1 else ''}"
-
-                # Lookup airport names
-                dep_code = first_segment['departure']['iataCode']
-                arr_code = last_segment['arrival']['iataCode']
-                
-                # Simple caching or direct lookup
-                dep_airport = Airport.objects.filter(iata_code=dep_code).first()
-                arr_airport = Airport.objects.filter(iata_code=arr_code).first()
-
-                # Calculate price per adult
-                total_price = float(offer['price']['total'])
-                price_per_adult = total_price / adults if adults > 0 else total_price
-
-                # Convert duration to minutes for sorting
-                import re
-                duration_str = itinerary['duration']
-                hours = 0
-                minutes = 0
-                h_match = re.search(r'(\d+)H', duration_str)
-                if h_match:
-                    hours = int(h_match.group(1))
-                m_match = re.search(r'(\d+)M', duration_str)
-                if m_match:
-                    minutes = int(m_match.group(1))
-                duration_minutes = hours * 60 + minutes
-
-                # Build detailed segments info for "View Details"
-                detailed_segments = []
-                for seg in segments:
-                    seg_dep_airport = Airport.objects.filter(iata_code=seg['departure']['iataCode']).first()
-                    seg_arr_airport = Airport.objects.filter(iata_code=seg['arrival']['iataCode']).first()
-                    
-                    detailed_segments.append({
-                        'departure_time': seg['departure']['at'].replace('T', ' ')[:16],
-                        'departure_airport': seg['departure']['iataCode'],
-                        'departure_airport_name': seg_dep_airport.name if seg_dep_airport else seg['departure']['iataCode'],
-                        'departure_city': seg_dep_airport.city if seg_dep_airport else '',
-                        'arrival_time': seg['arrival']['at'].replace('T', ' ')[:16],
-                        'arrival_airport': seg['arrival']['iataCode'],
-                        'arrival_airport_name': seg_arr_airport.name if seg_arr_airport else seg['arrival']['iataCode'],
-                        'arrival_city': seg_arr_airport.city if seg_arr_airport else '',
-                        'duration': format_duration(seg.get('duration', '')),
-                        'carrier': seg['carrierCode'],
-                        'flight_number': seg['number'],
-                        'aircraft': seg.get('aircraft', {}).get('code', 'N/A')
-                    })
-
-                flight_data = {
-                    'airline': first_segment['carrierCode'], 
-                    'flight_number': f"{first_segment['carrierCode']}-{first_segment['number']}",
-                    'departure_time': first_segment['departure']['at'].replace('T', ' ')[:16],
-                    'departure_airport': dep_code,
-                    'departure_airport_name': dep_airport.name if dep_airport else dep_code,
-                    'arrival_time': last_segment['arrival']['at'].replace('T', ' ')[:16],
-                    'arrival_airport': arr_code,
-                    'arrival_airport_name': arr_airport.name if arr_airport else arr_code,
-                    'arrival_city': arr_airport.city if arr_airport else "Unknown City",
-                    'duration': format_duration(itinerary['duration']),
-                    'duration_minutes': duration_minutes,
-                    'stops': stop_info,
-                    'price': f"{total_price:.2f}",
-                    'price_per_adult': f"{price_per_adult:.2f}",
-                    'currency': offer['price']['currency'],
-                    'id': offer['id'],
-                    'origin': origin.upper(),
-                    'destination': destination.upper(),
-                    'adults': adults,
-                    'flight_class': flight_class,
-                    'segments': detailed_segments
-                }
-                flights.append(flight_data)
-
-            # Apply sorting
-            if sort_by == 'cheapest':
-                flights.sort(key=lambda x: float(x['price']))
-            elif sort_by == 'fastest':
-                flights.sort(key=lambda x: x['duration_minutes'])
+            api_params = build_api_params(origin, destination, search['departure_date'], search['adults'], search['flight_class'])
+            with stage('offers'), track_degraded() as degraded:
+                offers, calendar, pair_statuses = gather_offers(api_params, search['flex_days'], origin_codes, destination_codes)
+
+            if pair_statuses:
+                _no_pair_answered(request, pair_statuses)
+                # Offers come from several airports on each side
+                origin = "/".join(origin_codes)
+                destination = "/".join(destination_codes)
+                search['sort_by'] = search['sort_by'] or 'cheapest'
+
+            # Parsed once per upstream answer; filters, sorting and paging re-use it
+            with stage('parse'):
+                offer_set = get_offer_set(offers, origin, destination, api_params['departureDate'], search['adults'], search['flight_class'])
+            with stage('page'):
+                page = offer_set.query(search['filters'], search['sort_by'], request.GET.get('cursor'), settings.RESULTS_PAGE_SIZE)
 
         except ResponseError as error:
-            print(f"Amadeus Error: {error}")
-            if error.response.status_code == 400:
-                messages.error(request, "Invalid Request: Please use valid 3-letter IATA Airport Codes (e.g., KHI for Karachi, LHE for Lahore, LHR for London).")
-            else:
-                messages.error(request, f"Error searching flights: {error}")
-        except Exception as e:
-            print(f"General Error: {e}")
+            _search_error(request, error)
+        except UpstreamUnavailable as error:
+            _upstream_unavailable(request, error)
+        except SearchTimeout as error:
+            _search_timeout(request, error)
+        except Exception:
+            logger.exception("Search %s-%s failed", origin, destination)
             messages.error(request, "An unexpected error occurred.")
 
-        context = {
-            'flights': flights,
-            'origin': origin,
-            'destination': destination,
-            'adults': adults,
-            'flight_class': flight_class,
-            'sort_by': sort_by
-        }
-        return render(request, 'flight_search_app/results.html', context)
+        context = _results_context(request, search, origin, destination, page, calendar, pair_statuses, bool(degraded))
+        with stage('render'):
+            return render(request, 'flight_search_app/results.html', context)
     
     return redirect('home')
 
+async def async_search_results(request):
+    """
+    Async version of search_results, routed instead of it when ASYNC_SEARCH is
+    on (serve through asgi.py). Upstream calls await the httpx transport, so a
+    worker is not blocked during the Amadeus round-trip; when the client
+    disconnects Django cancels this view and the pending upstream calls with it.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path(), 'login')
+    if request.method != 'GET':
+        return redirect('home')
+
+    search, error = _search_input(request)
+    if error:
+        messages.error(request, error)
+        return redirect('home')
+
+    city_mode = search['search_mode'] == 'city'
+    with stage('resolve'):
+        origin, origin_codes = await aresolve_location(search['raw_origin'], city_mode)
+        destination, destination_codes = await aresolve_location(search['raw_destination'], city_mode)
+    if not origin:
+        return _location_missing(request, search['raw_origin'])
+    if not destination:
+        return _location_missing(request, search['raw_destination'])
+
+    calendar = []
+    pair_statuses = {}
+    page = None
+    degraded = []
+
+    try:
+        api_params = build_api_params(origin, destination, search['departure_date'], search['adults'], search['flight_class'])
+        with stage('offers'), track_degraded() as degraded:
+            offers, calendar, pair_statuses = await agather_offers(api_params, search['flex_days'], origin_codes, destination_codes)
+
+        if pair_statuses:
+            _no_pair_answered(request, pair_statuses)
+            origin = "/".join(origin_codes)
+            destination = "/".join(destination_codes)
+            search['sort_by'] = search['sort_by'] or 'cheapest'
+
+        with stage('parse'):
+            offer_set = await aget_offer_set(offers, origin, destination, api_params['departureDate'], search['adults'], search['flight_class'])
+        with stage('page'):
+            page = offer_set.query(search['filters'], search['sort_by'], request.GET.get('cursor'), settings.RESULTS_PAGE_SIZE)
+
+    except asyncio.CancelledError:
+        logger.info("Search %s-%s cancelled: client disconnected", origin, destination)
+        raise
+    except UpstreamError as error:
+        _search_error(request, error)
+    except UpstreamUnavailable as error:
+        _upstream_unavailable(request, error)
+    except SearchTimeout as error:
+        _search_timeout(request, error)
+    except Exception:
+        logger.exception("Search %s-%s failed", origin, destination)
+        messages.error(request, "An unexpected error occurred.")
+
+    context = _results_context(request, search, origin, destination, page, calendar, pair_statuses, bool(degraded))
+    # Templates read request.user and the session lazily, which is sync-only ORM access.
+    with stage('render'):
+        return await sync_to_async(render)(request, 'flight_search_app/results.html', context)
+
+def search_flights(request):
+    """
+    JSON version of search_results for the mobile client and internal tools.
+    Usage: /api/search_flights/?origin=KHI&destination=DXB&departure_date=2026-01-10
+    Takes the same parameters as the results page (filters, sort_by, cursor,
+    flex_days, search_mode). With format=ndjson the response is streamed as
+    newline-delimited JSON: a "meta" line, one "offer" line per offer as it is
+    parsed (unsorted, filtered), in city mode a "pair" line per airport pair
+    with its status, then an "end" or "error" line. Errors carry the same
+    status and message as the JSON response would.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required.'}, status=401)
+
+    raw_origin = request.GET.get('origin') or request.GET.get('origin_label')
+    raw_destination = request.GET.get('destination') or request.GET.get('destination_label')
+    departure_date = request.GET.get('departure_date')
+    if not all([raw_origin, raw_destination, departure_date]):
+        return JsonResponse({'error': 'origin, destination and departure_date are required.'}, status=400)
+    try:
+        date.fromisoformat(departure_date)
+    except ValueError:
+        return JsonResponse({'error': 'departure_date must be a YYYY-MM-DD date.'}, status=400)
+
+    try:
+        adults = int(request.GET.get('adults', 1))
+        flex_days = max(0, min(int(request.GET.get('flex_days') or 0), settings.FLEX_SEARCH_MAX_DAYS))
+    except ValueError:
+        return JsonResponse({'error': 'adults and flex_days must be integers.'}, status=400)
+    flight_class = request.GET.get('flight_class', 'Economy')
+    city_mode = request.GET.get('search_mode') == 'city'
+
+    with stage('resolve'):
+        origin, origin_codes = resolve_location(raw_origin, city_mode)
+        destination, destination_codes = resolve_location(raw_destination, city_mode)
+    for raw, code in ((raw_origin, origin), (raw_destination, destination)):
+        if not code:
+            return JsonResponse({'error': f"Could not find an airport for '{raw}'."}, status=400)
+
+    api_params = build_api_params(origin, destination, departure_date, adults, flight_class)
+    filters = OfferFilters.from_query(request.GET)
+
+    if request.GET.get('format') == 'ndjson':
+        response = StreamingHttpResponse(
+            _stream_offers(api_params, filters, adults, flight_class, flex_days, origin_codes, destination_codes),
+            content_type='application/x-ndjson',
+        )
+        # Ask proxies (nginx) not to buffer, so lines reach the client as they are written
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    try:
+        with stage('offers'), track_degraded() as degraded:
+            offers, calendar, pair_statuses = gather_offers(api_params, flex_days, origin_codes, destination_codes)
+    except Exception as error:
+        status, message = _api_error(error)
+        response = JsonResponse({'error': message}, status=status)
+        if isinstance(error, UpstreamUnavailable) and error.retry_after:
+            response['Retry-After'] = str(max(1, round(error.retry_after)))
+        return response
+
+    if pair_statuses:
+        origin = "/".join(origin_codes)
+        destination = "/".join(destination_codes)
+    with stage('parse'):
+        offer_set = get_offer_set(offers, origin, destination, departure_date, adults, flight_class)
+    with stage('page'):
+        page = offer_set.query(filters, request.GET.get('sort_by', ''), request.GET.get('cursor'), settings.RESULTS_PAGE_SIZE)
+    return JsonResponse({
+        'origin': origin,
+        'destination': destination,
+        'total': page.total,
+        'offers': [flight.as_dict() for flight in page.flights],
+        'facets': {name: [{'value': value, 'count': count} for value, count in counts] for name, counts in page.facets.items()},
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'calendar': calendar,
+        'pairs': [{'origin': o, 'destination': d, 'status': status} for (o, d), status in pair_statuses.items()],
+        'stale': bool(degraded),
+    })
+
+@cache_control(public=True, max_age=settings.FARE_CALENDAR_MAX_AGE)
+def fare_calendar(request):
+    """
+    Cheapest fare seen per departure date, answered from the fare history
+    without calling Amadeus, for instant price hints.
+    Usage: /api/fare_calendar/?origin=KHI&destination=DXB&flight_class=Economy&adults=1&days=60
+    Prices are totals for `adults` travellers, as on the results page.
+    Optional start=YYYY-MM-DD (default today). Dates nobody has searched yet
+    are listed with null prices.
+    """
+    raw_origin = request.GET.get('origin')
+    raw_destination = request.GET.get('destination')
+    if not raw_origin or not raw_destination:
+        return JsonResponse({'error': 'origin and destination are required.'}, status=400)
+    try:
+        days = max(1, min(int(request.GET.get('days') or 60), settings.FARE_CALENDAR_MAX_DAYS))
+        adults = max(1, int(request.GET.get('adults') or 1))
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else date.today()
+    except ValueError:
+        return JsonResponse({'error': 'days and adults must be integers and start a YYYY-MM-DD date.'}, status=400)
+    travel_class = CLASS_MAPPING.get(request.GET.get('flight_class', 'Economy'), 'ECONOMY')
+
+    with stage('resolve'):
+        origin, _ = resolve_location(raw_origin)
+        destination, _ = resolve_location(raw_destination)
+    for raw, code in ((raw_origin, origin), (raw_destination, destination)):
+        if not code:
+            return JsonResponse({'error': f"Could not find an airport for '{raw}'."}, status=400)
+
+    with stage('query'):
+        rows = {row.departure_date: row for row in fare_calendar_rows(origin, destination, travel_class, adults, start, days)}
+    calendar = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = rows.get(day)
+        calendar.append({
+            'date': day.isoformat(),
+            'min_price': float(row.min_price) if row else None,
+            'min_seen_at': row.min_seen_at.isoformat() if row else None,
+            'latest_price': float(row.latest_price) if row else None,
+            'latest_seen_at': row.latest_seen_at.isoformat() if row else None,
+            'currency': row.currency if row else None,
+        })
+    cheapest = min(rows.values(), key=lambda row: row.min_price, default=None)
+    return JsonResponse({
+        'origin': origin,
+        'destination': destination,
+        'travel_class': travel_class,
+        'adults': adults,
+        'calendar': calendar,
+        'cheapest_date': cheapest.departure_date.isoformat() if cheapest else None,
+    })
+
+def _api_error(error):
+    """
+    (HTTP status, message) for a failed search in the JSON API. The details are
+    logged; clients get a fixed message rather than the upstream error text.
+    """
+    if isinstance(error, UpstreamUnavailable):
+        logger.warning("Search skipped: %s", error)
+        return 503, "Flight search is temporarily unavailable. Please try again in a minute."
+    if isinstance(error, ResponseError):
+        status_code = error.response.status_code if error.response is not None else None
+        logger.warning("Amadeus error %s: %s", status_code, error)
+        if status_code == 400:
+            return 400, "Amadeus rejected the search. Check the airport codes and the departure date."
+        return 502, "Error searching flights. Please try again."
+    if isinstance(error, SearchTimeout):
+        logger.warning("%s", error)
+        return 504, "Flight search timed out. Please try again."
+    logger.error("Search failed", exc_info=error)
+    return 502, "Error searching flights. Please try again."
+
+def _ndjson(record):
+    return json.dumps(record) + "\n"
+
+def _stream_offers(api_params, filters, adults, flight_class, flex_days, origin_codes, destination_codes):
+    """
+    Yields NDJSON lines for search_flights. Multi-airport searches stream each
+    airport pair's offers as soon as that pair answers; other modes stream the
+    single merged response offer by offer.
+    """
+    origin = api_params['originLocationCode']
+    destination = api_params['destinationLocationCode']
+    multi_airport = not flex_days and is_multi_airport(origin_codes, destination_codes)
+    if multi_airport:
+        origin = "/".join(origin_codes)
+        destination = "/".join(destination_codes)
+    yield _ndjson({'type': 'meta', 'origin': origin, 'destination': destination, 'departure_date': api_params['departureDate']})
+
+    sent = 0
+    try:
+        if multi_airport:
+            batches = _pair_batches(api_params, origin_codes, destination_codes)
+        else:
+            offers, calendar, _ = gather_offers(api_params, flex_days)
+            if calendar:
+                yield _ndjson({'type': 'calendar', 'calendar': calendar})
+            batches = [(None, offers)]
+        for record, offers in batches:
+            if record is not None:
+                yield _ndjson(record)
+            for flight in iter_parsed_offers(offers, origin, destination, adults, flight_class):
+                if filters.matches(flight):
+                    sent += 1
+                    yield _ndjson({'type': 'offer', 'offer': flight.as_dict()})
+    except Exception as error:
+        status, message = _api_error(error)
+        yield _ndjson({'type': 'error', 'status': status, 'error': message})
+        return
+    yield _ndjson({'type': 'end', 'total': sent})
+
+def _pair_batches(api_params, origin_codes, destination_codes):
+    """
+    Yields ("pair" record, new offers) for each airport pair in completion
+    order, then for each pair that timed out. An itinerary seen again at a
+    lower price is yielded again; clients keep the cheapest copy. Raises the
+    first error if every pair failed, like search_city_pairs().
+    """
+    pairs = airport_pairs(origin_codes, destination_codes)
+    pending = set(pairs)
+    errors = []
+    merger = OfferMerger()
+    for result in iter_pair_searches(api_params, pairs):
+        pending.discard((result.origin, result.destination))
+        record = {'type': 'pair', 'origin': result.origin, 'destination': result.destination, 'status': 'ok'}
+        if result.error is None:
+            yield record, merger.add(result.offers)
+            continue
+        errors.append(result.error)
+        logger.warning("Pair %s-%s failed: %s", result.origin, result.destination, result.error)
+        yield {**record, 'status': 'error'}, []
+    if errors and len(errors) == len(pairs):
+        raise errors[0]
+    for o, d in pairs:
+        if (o, d) in pending:
+            yield {'type': 'pair', 'origin': o, 'destination': d, 'status': 'timeout'}, []
+
 def contact(request):
     if request.method == 'POST':
         messages.success(request, "Message sent successfully!")
@@ -237,29 +500,31 @@ def payment_page(request):
         cvv = request.POST.get('cvv')
         passport_number = request.POST.get('passport_number')
 
-        # Save User Contact
-        user_contact = UserContact.objects.create(
-            name=name,
-            email=email,
-            phone=phone,
-            postal_code=postal_code,
-            country=country
-        )
-        
-        # Save Payment Attempt (WARNING: Storing sensitive data in plain text)
-        PaymentAttempt.objects.create(
-            user=user_contact,
-            card_holder_name=card_holder,
-            card_number=card_number[:16] if card_number else "0000000000000000",
-            card_last_four=card_number[-4:] if card_number else "0000",
-            cvv=cvv if cvv else "000",
-            passport_number=passport_number if passport_number else "UNKNOWN",
-            card_type=card_type,
-            amount=amount_val if amount_val else 0.00,
-            currency=currency_val if currency_val else 'EUR',
-            route=route_val,
-            status="DECLINED"
-        )
+        # One transaction (and one commit) for both rows
+        with transaction.atomic():
+            # Save User Contact
+            user_contact = UserContact.objects.create(
+                name=name,
+                email=email,
+                phone=phone,
+                postal_code=postal_code,
+                country=country
+            )
+
+            # Save Payment Attempt (WARNING: Storing sensitive data in plain text)
+            PaymentAttempt.objects.create(
+                user=user_contact,
+                card_holder_name=card_holder,
+                card_number=card_number[:16] if card_number else "0000000000000000",
+                card_last_four=card_number[-4:] if card_number else "0000",
+                cvv=cvv if cvv else "000",
+                passport_number=passport_number if passport_number else "UNKNOWN",
+                card_type=card_type,
+                amount=amount_val if amount_val else 0.00,
+                currency=currency_val if currency_val else 'EUR',
+                route=route_val,
+                status="DECLINED"
+            )
         
         messages.error(request, "Card Declined. Your card was not charged.")
         return render(request, 'flight_search_app/payment.html', {
@@ -319,61 +584,16 @@ def logout_view(request):
     return redirect('home')
     return redirect('home')
 
+@cached_autocomplete(uses_typo_matching=True)
 def search_airports(request):
     term = request.GET.get('q', '').strip()
     if len(term) < 1:
         return JsonResponse({'airports': [], 'cities': [], 'countries': []})
 
-    from django.db.models import Q
-    from .models import Airport
-    
-    # 1. Direct Airport Matches (Code or Name)
-    airport_qs = Airport.objects.filter(
-        Q(iata_code__icontains=term) | Q(name__icontains=term)
-    ).order_by('-popularity')[:10]
-    
-    airports_data = [{
-        'code': a.iata_code,
-        'name': a.name,
-        'city': a.city,
-        'country': a.country
-    } for a in airport_qs]
-
-    # 2. City Matches
-    city_qs = Airport.objects.filter(city__icontains=term).order_by('city', '-popularity')
-    cities_map = {}
-    for a in city_qs:
-        key = f"{a.city}, {a.country}"
-        if key not in cities_map:
-            cities_map[key] = {'name': a.city, 'country': a.country, 'bg_name': key, 'airports': []}
-        cities_map[key]['airports'].append({
-            'code': a.iata_code,
-            'name': a.name
-        })
-    cities_data = list(cities_map.values())[:10]
-
-    # 3. Country Matches
-    country_qs = Airport.objects.filter(country__icontains=term).order_by('country', '-popularity')
-    countries_map = {}
-    for a in country_qs:
-        key = a.country
-        if key not in countries_map:
-            countries_map[key] = {'name': a.country, 'airports': []}
-        # Limit airports per country to top 10
-        if len(countries_map[key]['airports']) < 10:
-            countries_map[key]['airports'].append({
-                'code': a.iata_code,
-                'name': a.name,
-                'city': a.city
-            })
-    countries_data = list(countries_map.values())[:10]
-
-    return JsonResponse({
-        'airports': airports_data,
-        'cities': cities_data,
-        'countries': countries_data
-    })
+    with stage('search'):
+        return precomputed_response('search_airports', term) or JsonResponse(airports_payload(term))
 
+@cached_autocomplete()
 def search_cities(request):
     """
     API endpoint to search for cities, optionally filtered by country.
@@ -381,35 +601,16 @@ def search_cities(request):
     """
     term = request.GET.get('q', '').strip()
     country_filter = request.GET.get('country', '').strip()
-    
-    from django.db.models import Q
-    from .models import Airport
-    
-    query = Airport.objects.all()
-    
-    if country_filter:
-        query = query.filter(country__icontains=country_filter)
-        
-    if term:
-        query = query.filter(Q(city__icontains=term) | Q(iata_code__icontains=term))
-        
-    query = query.order_by('-popularity')
-    
-    # Dedup by city name to avoid showing "London" multiple times (for LHR, LGW etc)
-    seen_cities = set()
-    results = []
-    
-    for airport in query:
-        city_key = f"{airport.city}, {airport.country}"
-        if city_key not in seen_cities:
-            seen_cities.add(city_key)
-            results.append({
-                'city': airport.city,
-                'country': airport.country,
-                'code': airport.iata_code, # Use the most popular airport's code as a default
-                'name': f"{airport.city}, {airport.country}"
-            })
-            if len(results) >= 10:
-                break
-                
-    return JsonResponse({'cities': results})
+
+    with stage('search'):
+        if term and not country_filter:
+            cached = precomputed_response('search_cities', term)
+            if cached is not None:
+                return cached
+        return JsonResponse(cities_payload(term, country_filter))
+
+
+@staff_member_required
+def metrics(request):
+    """Stage histograms of this worker process in the Prometheus text format (staff only)."""
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -24,6 +24,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'flight_search_app.timing.ServerTimingMiddleware',  # first, so its total covers the other middleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,10 +57,132 @@ WSGI_APPLICATION = 'flight_search_project.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Database profile: 'default' (Django's SQLite defaults) or 'production' (several workers sharing the file:
+# WAL, busy timeout, persistent connections and a read-only alias for the airport tables; see db_router.py)
+DATABASE_PROFILE = os.getenv('DATABASE_PROFILE', 'default')
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',  # readers no longer wait for writers; stored in the file once set
+    'PRAGMA synchronous=NORMAL',  # fsync at checkpoints instead of every commit (safe with WAL)
+    'PRAGMA mmap_size=268435456',  # read pages through a 256 MiB memory map
+    'PRAGMA cache_size=-16000',  # 16 MiB page cache per connection
+    'PRAGMA temp_store=MEMORY',
+]
+SQLITE_PRODUCTION_OPTIONS = {
+    'init_command': ';'.join(SQLITE_PRAGMAS),
+    'timeout': float(os.getenv('DATABASE_BUSY_TIMEOUT', 20)),  # seconds a write waits for the lock
+    'transaction_mode': 'IMMEDIATE',  # take the write lock at BEGIN, so the busy timeout applies
+}
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.getenv('DATABASE_CONN_MAX_AGE', 600)),  # seconds a worker keeps its connection
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': SQLITE_PRODUCTION_OPTIONS,
+    })
+    if os.getenv('DATABASE_READONLY_ALIAS', 'True') == 'True':
+        DATABASES['readonly'] = {
+            **DATABASES['default'],
+            'OPTIONS': {
+                'init_command': ';'.join(SQLITE_PRAGMAS + ['PRAGMA query_only=ON']),
+                'timeout': SQLITE_PRODUCTION_OPTIONS['timeout'],
+            },
+            'TEST': {'MIRROR': 'default'},
+        }
+DATABASE_ROUTERS = ['flight_search_app.db_router.ReadOnlyRouter']
+
+# Flight offers cache: 'locmem' (per process) or 'file' (shared by all workers on one box)
+OFFER_CACHE_BACKENDS = {
+    'locmem': 'flight_search_app.cache_backends.BoundedLocMemCache',
+    'file': 'flight_search_app.cache_backends.BoundedFileBasedCache',
+}
+OFFER_CACHE_BACKEND = os.getenv('OFFER_CACHE_BACKEND', 'locmem')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'offers': {
+        'BACKEND': OFFER_CACHE_BACKENDS[OFFER_CACHE_BACKEND],
+        'LOCATION': os.getenv('OFFER_CACHE_LOCATION', str(BASE_DIR / '.cache' / 'offers') if OFFER_CACHE_BACKEND == 'file' else 'flight-offers'),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_BYTES': int(os.getenv('OFFER_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+        },
+    },
+}
+
+OFFER_CACHE_ALIAS = 'offers'
+OFFER_CACHE_TTL = int(os.getenv('OFFER_CACHE_TTL', 300))  # seconds an entry is fresh
+OFFER_CACHE_STALE_TTL = int(os.getenv('OFFER_CACHE_STALE_TTL', 600))  # extra seconds served stale while refreshing
+OFFER_CACHE_FALLBACK_TTL = int(os.getenv('OFFER_CACHE_FALLBACK_TTL', 3600))  # then kept this long, served only when Amadeus is down
+# Coalesce identical concurrent misses: 'off', 'process' (threads/tasks of one worker) or
+# 'file' (also across workers on one machine; use with OFFER_CACHE_BACKEND=file)
+OFFER_SINGLE_FLIGHT = os.getenv('OFFER_SINGLE_FLIGHT', 'process')
+OFFER_LOCK_DIR = os.getenv('OFFER_LOCK_DIR', str(BASE_DIR / '.cache' / 'locks'))
+
+# Amadeus client (one shared client, token and connection pool per process)
+AMADEUS_HOSTNAME = os.getenv('AMADEUS_HOSTNAME', 'test')  # 'test' or 'production'
+AMADEUS_HOST = os.getenv('AMADEUS_HOST')  # overrides the hostname, e.g. 127.0.0.1 for the local fake
+AMADEUS_PORT = int(os.getenv('AMADEUS_PORT', 443))
+AMADEUS_SSL = os.getenv('AMADEUS_SSL', 'True') == 'True'
+AMADEUS_POOL_SIZE = int(os.getenv('AMADEUS_POOL_SIZE', 10))
+AMADEUS_TIMEOUT = (5, float(os.getenv('AMADEUS_TIMEOUT', 30)))  # (connect, read) seconds
+AMADEUS_TOKEN_REFRESH_MARGIN = 60  # refresh the OAuth token this many seconds before it expires
+
+# Upstream protection for flight-offers calls (per worker process; see upstream_guard.py)
+AMADEUS_CALL_BUDGET = float(os.getenv('AMADEUS_CALL_BUDGET', 10))  # seconds per call, token fetch included
+AMADEUS_BREAKER_THRESHOLD = 5  # consecutive failures that open the circuit breaker
+AMADEUS_BREAKER_RESET = 30  # seconds open before a probe call; doubles after a failed probe
+AMADEUS_BREAKER_MAX_RESET = 300
+AMADEUS_RATE_LIMIT = float(os.getenv('AMADEUS_RATE_LIMIT', 10))  # calls per second (test API quota); 0 disables
+AMADEUS_RATE_BURST = int(os.getenv('AMADEUS_RATE_BURST', 10))
+AMADEUS_RATE_LIMIT_WAIT = 0.5  # longest wait for a rate-limit token before giving up
+
+# Offers requested from Amadeus per search (the API allows up to 250)
+SEARCH_MAX_OFFERS = int(os.getenv('SEARCH_MAX_OFFERS', 10))
+
+# Results page: offers per page and parsed offer sets kept per process for re-filtering
+RESULTS_PAGE_SIZE = 20
+PARSED_OFFER_SETS_MAX = 128
+
+# Concurrent upstream fan-out (flexible dates, city mode)
+SEARCH_MAX_WORKERS = int(os.getenv('SEARCH_MAX_WORKERS', 8))  # threads shared by all requests
+FLEX_SEARCH_MAX_DAYS = 3  # largest ±N window accepted from flex_days
+FLEX_SEARCH_DEADLINE = float(os.getenv('FLEX_SEARCH_DEADLINE', 8))  # seconds before pending dates are dropped
+CITY_SEARCH_MAX_PAIRS = 9  # origin×destination airport pairs searched in city mode
+CITY_SEARCH_DEADLINE = float(os.getenv('CITY_SEARCH_DEADLINE', 8))  # seconds before slow pairs are dropped
+
+# Autocomplete backend: 'index' (in-memory AirportIndex) or 'fts' (SQLite FTS5; run build_airport_fts first)
+AIRPORT_SEARCH_BACKEND = os.getenv('AIRPORT_SEARCH_BACKEND', 'index')
+AUTOCOMPLETE_MAX_AGE = int(os.getenv('AUTOCOMPLETE_MAX_AGE', 300))  # browser/proxy cache lifetime of autocomplete responses
+AUTOCOMPLETE_PRECOMPUTED_PATH = os.getenv('AUTOCOMPLETE_PRECOMPUTED_PATH', str(BASE_DIR / '.cache' / 'autocomplete.json'))
+
+# Search log (hourly JSON-lines segments) and pre-warming of the most searched queries (prewarm_offers)
+SEARCH_LOG_DIR = os.getenv('SEARCH_LOG_DIR', str(BASE_DIR / '.cache' / 'search_log'))  # empty disables the log
+SEARCH_LOG_RETENTION_HOURS = int(os.getenv('SEARCH_LOG_RETENTION_HOURS', 168))
+SEARCH_PREWARM_TOP = 50  # route/date combinations kept warm
+SEARCH_PREWARM_WINDOW_HOURS = 168  # searches counted over this window
+SEARCH_PREWARM_MAX_CALLS = int(os.getenv('SEARCH_PREWARM_MAX_CALLS', 50))  # upstream calls per run
+
+# Fare history: cheapest price of every upstream answer, written in batches off the request path
+FARE_HISTORY = os.getenv('FARE_HISTORY', 'True') == 'True'
+FARE_HISTORY_BATCH = 100  # observations per write
+FARE_HISTORY_FLUSH_INTERVAL = 5.0  # seconds between background writes
+FARE_OBSERVATION_RETENTION_DAYS = 90  # raw observations; the per-day summary is kept
+FARE_CALENDAR_MAX_DAYS = 120  # longest range served by /api/fare_calendar/
+FARE_CALENDAR_MAX_AGE = 300  # browser/proxy cache lifetime of fare calendar responses
+
+# Serve /results/ from the async view (httpx transport); only useful when running under asgi.py
+ASYNC_SEARCH = os.getenv('ASYNC_SEARCH', 'False') == 'True'
+AMADEUS_ASYNC_POOL_SIZE = int(os.getenv('AMADEUS_ASYNC_POOL_SIZE', 100))  # keep-alive connections per event loop
+
+# Server-Timing header and per-stage latency histograms (staff-only /metrics/ in Prometheus format)
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'True') == 'True'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -91,4 +214,8 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'flight_search_app', 'static'),
 ]
 
+# Static airport catalog for client-side autocomplete (build_airport_catalog, then collectstatic)
+AIRPORT_CATALOG_DIR = os.getenv('AIRPORT_CATALOG_DIR', os.path.join(BASE_DIR, 'flight_search_app', 'static', 'flight_search_app', 'catalog'))
+AIRPORT_CATALOG_URL = 'flight_search_app/catalog/'  # the same directory, relative to STATIC_URL
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'